@@ -78,6 +78,10 @@ class FileLockToolException(ExceptionBase):
     pass
 
 
+class RWLockToolException(ExceptionBase):
+    pass
+
+
 class RPCAlreadyExistException(ExceptionBase):
     pass
 
@@ -1,5 +1,6 @@
 from flask import Response, request
 from flask_login import login_required
+import itertools
 import threading
 import time
 from pslx.micro_service.pubsub.subscriber import Subscriber
@@ -48,10 +49,9 @@ class FrontendDedicatedLoggingOp(StreamingOperator):
             total_entries = self._pslx_dedicated_logging_storage.get_num_entries()
             if total_entries > self._logging_storage_capacity:
                 try:
-                    all_data = self._pslx_dedicated_logging_storage.read_all()
-                    all_sorted_keys = sorted(list(all_data.keys()))
-                    for i in range(total_entries - self._logging_storage_capacity):
-                        key_to_delete = all_sorted_keys[i]
+                    keys_to_delete = list(itertools.islice(self._pslx_dedicated_logging_storage.iter_keys(),
+                                                           total_entries - self._logging_storage_capacity))
+                    for key_to_delete in keys_to_delete:
                         self._pslx_dedicated_logging_storage.delete(key=key_to_delete)
                 except Exception as _:
                     pass
@@ -123,18 +123,17 @@ def realtime_logging():
                 time.sleep(TimeSleepObj.ONE_TENTH_SECOND)
                 continue
 
-            all_data = pslx_dedicated_logging_storage.read_all()
-            all_sorted_keys = sorted(list(all_data.keys()))
-            if all_sorted_keys[-1] == last_checked_key:
+            if pslx_dedicated_logging_storage.last_key() == last_checked_key:
                 time.sleep(TimeSleepObj.ONE_TENTH_SECOND)
                 continue
-            last_checked_key = all_sorted_keys[-1]
+            last_checked_key = pslx_dedicated_logging_storage.last_key()
+            all_data = pslx_dedicated_logging_storage.read_key_range()
 
             pslx_dedicated_logging_list = []
-            for key in all_sorted_keys:
+            for any_message in all_data.values():
                 val = ProtoUtil.any_to_message(
                     message_type=LoggingMessageRequest,
-                    any_message=all_data[key]
+                    any_message=any_message
                 )
                 if ProtoUtil.get_name_by_value(enum_type=DiskLoggerLevel, value=val.level) in log_levels:
                     message = val.message
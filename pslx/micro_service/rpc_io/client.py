@@ -75,13 +75,16 @@ class FixedSizeStorageRPC(RPCIOClient):
 class ProtoTableStorageRPC(RPCIOClient):
     STORAGE_TYPE = StorageType.PROTO_TABLE_STORAGE
 
+    def _set_request_path(self, request, file_or_dir_path):
+        request.file_name = file_or_dir_path
+
     def read(self, file_or_dir_path, params=None, is_test=False, root_certificate=None):
         if 'message_type' in params:
             assert 'proto_module' in params
         request = RPCIORequest()
         request.is_test = is_test
         request.type = self.STORAGE_TYPE
-        request.file_name = file_or_dir_path
+        self._set_request_path(request=request, file_or_dir_path=file_or_dir_path)
         if 'message_type' in params:
             self.RESPONSE_MESSAGE_TYPE = params['message_type']
             request.params['message_type'] = ProtoUtil.infer_str_from_message_type(
@@ -98,6 +101,13 @@ class ProtoTableStorageRPC(RPCIOClient):
         return response
 
 
+class ShardedProtoTableStorageRPC(ProtoTableStorageRPC):
+    STORAGE_TYPE = StorageType.SHARDED_PROTO_TABLE_STORAGE
+
+    def _set_request_path(self, request, file_or_dir_path):
+        request.dir_name = file_or_dir_path
+
+
 class PartitionerStorageRPC(RPCIOClient):
     STORAGE_TYPE = StorageType.PARTITIONER_STORAGE
 
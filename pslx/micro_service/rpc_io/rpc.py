@@ -5,6 +5,7 @@ from pslx.schema.rpc_pb2 import RPCIORequest, RPCIOResponse
 from pslx.storage.default_storage import DefaultStorage
 from pslx.storage.fixed_size_storage import FixedSizeStorage
 from pslx.storage.proto_table_storage import ProtoTableStorage
+from pslx.storage.sharded_proto_table_storage import ShardedProtoTableStorage
 import pslx.storage.partitioner_storage as partitioner
 from pslx.tool.logging_tool import LoggingTool
 from pslx.tool.lru_cache_tool import LRUCacheTool
@@ -34,6 +35,7 @@ class RPCIO(RPCBase):
             StorageType.FIXED_SIZE_STORAGE: self._fixed_size_storage_impl,
             StorageType.PROTO_TABLE_STORAGE: self._proto_table_storage_impl,
             StorageType.PARTITIONER_STORAGE: self._partitioner_storage_impl,
+            StorageType.SHARDED_PROTO_TABLE_STORAGE: self._sharded_proto_table_storage_impl,
         }
         self._logger = LoggingTool(
             name='PSLX_RPC_IO_RPC',
@@ -106,8 +108,8 @@ class RPCIO(RPCBase):
         response.list_data.CopyFrom(rpc_list_data)
         return response
 
-    def _proto_table_storage_impl(self, request):
-        self._logger.info("Getting request of proto table storage read.")
+    def _proto_table_read_impl(self, request, lru_key, make_storage):
+        # shared by the proto table storage and the sharded proto table storage, which are read the same way.
         read_params = dict(request.params)
         if 'proto_module' in read_params:
             read_params['message_type'] = ProtoUtil.infer_message_type_from_str(
@@ -119,12 +121,10 @@ class RPCIO(RPCBase):
                 message_type_str=read_params['message_type']
             )
 
-        lru_key = (request.type, request.file_name)
         storage = self._lru_cache_tool.get(key=lru_key)
         if not storage:
             self.sys_log("Did not find the storage in cache. Making a new one...")
-            storage = ProtoTableStorage()
-            storage.initialize_from_file(file_name=request.file_name)
+            storage = make_storage()
             self._lru_cache_tool.set(
                 key=lru_key,
                 value=storage
@@ -135,6 +135,34 @@ class RPCIO(RPCBase):
         read_params.pop('proto_module', None)
         return storage.read(params=read_params)
 
+    def _proto_table_storage_impl(self, request):
+        self._logger.info("Getting request of proto table storage read.")
+
+        def _make_storage():
+            storage = ProtoTableStorage()
+            storage.initialize_from_file(file_name=request.file_name)
+            return storage
+
+        return self._proto_table_read_impl(
+            request=request,
+            lru_key=(request.type, request.file_name),
+            make_storage=_make_storage
+        )
+
+    def _sharded_proto_table_storage_impl(self, request):
+        self._logger.info("Getting request of sharded proto table storage read.")
+
+        def _make_storage():
+            storage = ShardedProtoTableStorage()
+            storage.initialize_from_dir(dir_name=request.dir_name)
+            return storage
+
+        return self._proto_table_read_impl(
+            request=request,
+            lru_key=(request.type, request.dir_name),
+            make_storage=_make_storage
+        )
+
     def _partitioner_storage_impl(self, request):
         self._logger.info("Getting request of partitioner storage read.")
         read_params = dict(request.params)
@@ -198,8 +226,7 @@ class RPCIO(RPCBase):
                             base_name=base_name
                         )
                     )
-                data = proto_storage.read_all()
-                for key, val in data.items():
+                for key, val in proto_storage.iter_items():
                     rpc_list_data = RPCIOResponse.RPCListData()
                     rpc_data = rpc_list_data.data.add()
                     rpc_data.proto_data.CopyFrom(val)
@@ -241,23 +268,26 @@ class RPCIO(RPCBase):
                     time_str=read_params['end_time']
                 )
 
-            data = storage.read_range(params=read_params)
-            if data:
-                for key, val in data.items():
-                    rpc_list_data = RPCIOResponse.RPCListData()
-                    if is_proto_table:
-                        for proto_key, any_message in val.items():
-                            rpc_data = rpc_list_data.data.add()
-                            rpc_data.string_data = proto_key
+            # the partitions are added to the response one at a time instead of reading the whole range first.
+            for key, val in storage.iter_range(
+                start_time=read_params.pop('start_time'),
+                end_time=read_params.pop('end_time'),
+                params=read_params
+            ):
+                rpc_list_data = RPCIOResponse.RPCListData()
+                if is_proto_table:
+                    for proto_key, any_message in val.items():
+                        rpc_data = rpc_list_data.data.add()
+                        rpc_data.string_data = proto_key
 
-                            rpc_data = rpc_list_data.data.add()
-                            rpc_data.proto_data.CopyFrom(any_message)
-                    else:
-                        for entry in val:
-                            rpc_data = rpc_list_data.data.add()
-                            rpc_data.string_data = entry
+                        rpc_data = rpc_list_data.data.add()
+                        rpc_data.proto_data.CopyFrom(any_message)
+                else:
+                    for entry in val:
+                        rpc_data = rpc_list_data.data.add()
+                        rpc_data.string_data = entry
 
-                    response.dict_data[key].CopyFrom(rpc_list_data)
+                response.dict_data[key].CopyFrom(rpc_list_data)
 
         return response
 
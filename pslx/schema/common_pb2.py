@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: common.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'common.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x63ommon.proto\x12\x04pslx\"\x90\x01\n\x0b\x43redentials\x12\x11\n\tuser_name\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12-\n\x06others\x18\x03 \x03(\x0b\x32\x1d.pslx.Credentials.OthersEntry\x1a-\n\x0bOthersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"G\n\x08\x46ileInfo\x12\x11\n\tfile_path\x18\x01 \x01(\t\x12\x11\n\tfile_size\x18\x02 \x01(\t\x12\x15\n\rmodified_time\x18\x03 \x01(\t\"\xae\x05\n\x0e\x46rontendConfig\x12 \n\x18sqlalchemy_database_path\x18\x06 \x01(\t\x12\x43\n\x18\x63ontainer_backend_config\x18\x07 \x01(\x0b\x32!.pslx.FrontendConfig.ServerConfig\x12>\n\x13proto_viewer_config\x18\x08 \x03(\x0b\x32!.pslx.FrontendConfig.ServerConfig\x12=\n\x12\x66ile_viewer_config\x18\t \x03(\x0b\x32!.pslx.FrontendConfig.ServerConfig\x12\x43\n\x18instant_messaging_config\x18\n \x03(\x0b\x32!.pslx.FrontendConfig.ServerConfig\x12\x38\n\rrpc_io_config\x18\x0b \x03(\x0b\x32!.pslx.FrontendConfig.ServerConfig\x12\x37\n\x0c\x65mail_config\x18\x0c \x03(\x0b\x32!.pslx.FrontendConfig.ServerConfig\x12%\n\ncredential\x18\r \x01(\x0b\x32\x11.pslx.Credentials\x12\x45\n\x14logging_queue_config\x18\x0e \x01(\x0b\x32\'.pslx.FrontendConfig.MessageQueueConfig\x1a\x41\n\x0cServerConfig\x12\x12\n\nserver_url\x18\x01 \x01(\t\x12\x1d\n\x15root_certificate_path\x18\x02 \x01(\t\x1aM\n\x12MessageQueueConfig\x12\x10\n\x08\x65xchange\x18\x03 \x01(\t\x12\r\n\x05topic\x18\x04 \x01(\t\x12\x16\n\x0e\x63onnection_str\x18\x05 \x01(\tb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'common_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_CREDENTIALS_OTHERSENTRY']._loaded_options = None
+  _globals['_CREDENTIALS_OTHERSENTRY']._serialized_options = b'8\001'
+  _globals['_CREDENTIALS']._serialized_start=23
+  _globals['_CREDENTIALS']._serialized_end=167
+  _globals['_CREDENTIALS_OTHERSENTRY']._serialized_start=122
+  _globals['_CREDENTIALS_OTHERSENTRY']._serialized_end=167
+  _globals['_FILEINFO']._serialized_start=169
+  _globals['_FILEINFO']._serialized_end=240
+  _globals['_FRONTENDCONFIG']._serialized_start=243
+  _globals['_FRONTENDCONFIG']._serialized_end=929
+  _globals['_FRONTENDCONFIG_SERVERCONFIG']._serialized_start=785
+  _globals['_FRONTENDCONFIG_SERVERCONFIG']._serialized_end=850
+  _globals['_FRONTENDCONFIG_MESSAGEQUEUECONFIG']._serialized_start=852
+  _globals['_FRONTENDCONFIG_MESSAGEQUEUECONFIG']._serialized_end=929
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: enums.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'enums.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x65nums.proto\x12\x04pslx*\x1e\n\x08ModeType\x12\x08\n\x04TEST\x10\x00\x12\x08\n\x04PROD\x10\x01*#\n\tSortOrder\x12\t\n\x05ORDER\x10\x00\x12\x0b\n\x07REVERSE\x10\x01*6\n\rDataModelType\x12\x0b\n\x07\x44\x45\x46\x41ULT\x10\x00\x12\t\n\x05\x42\x41TCH\x10\x01\x12\r\n\tSTREAMING\x10\x02*<\n\x14InstantMessagingType\x12\t\n\x05SLACK\x10\x00\x12\x0e\n\nROCKETCHAT\x10\x01\x12\t\n\x05TEAMS\x10\x02*J\n\x0f\x44iskLoggerLevel\x12\x08\n\x04INFO\x10\x00\x12\t\n\x05\x44\x45\x42UG\x10\x01\x12\x0b\n\x07WARNING\x10\x02\x12\n\n\x06NOTSET\x10\x03\x12\t\n\x05\x45RROR\x10\x04*\x8d\x01\n\x0bStorageType\x12\x13\n\x0f\x44\x45\x46\x41ULT_STORAGE\x10\x00\x12\x17\n\x13PARTITIONER_STORAGE\x10\x01\x12\x16\n\x12\x46IXED_SIZE_STORAGE\x10\x02\x12\x17\n\x13PROTO_TABLE_STORAGE\x10\x03\x12\x1f\n\x1bSHARDED_PROTO_TABLE_STORAGE\x10\x04*:\n\x0cReadRuleType\x12\x17\n\x13READ_FROM_BEGINNING\x10\x00\x12\x11\n\rREAD_FROM_END\x10\x01*=\n\rWriteRuleType\x12\x18\n\x14WRITE_FROM_BEGINNING\x10\x00\x12\x12\n\x0eWRITE_FROM_END\x10\x01*V\n\x16PartitionerStorageType\x12\n\n\x06YEARLY\x10\x00\x12\x0b\n\x07MONTHLY\x10\x01\x12\t\n\x05\x44\x41ILY\x10\x02\x12\n\n\x06HOURLY\x10\x03\x12\x0c\n\x08MINUTELY\x10\x04*G\n\x06Status\x12\x08\n\x04IDLE\x10\x00\x12\x0b\n\x07WAITING\x10\x01\x12\x0b\n\x07RUNNING\x10\x02\x12\r\n\tSUCCEEDED\x10\x03\x12\n\n\x06\x46\x41ILED\x10\x04*\x1d\n\x06Signal\x12\t\n\x05START\x10\x00\x12\x08\n\x04STOP\x10\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'enums_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_MODETYPE']._serialized_start=21
+  _globals['_MODETYPE']._serialized_end=51
+  _globals['_SORTORDER']._serialized_start=53
+  _globals['_SORTORDER']._serialized_end=88
+  _globals['_DATAMODELTYPE']._serialized_start=90
+  _globals['_DATAMODELTYPE']._serialized_end=144
+  _globals['_INSTANTMESSAGINGTYPE']._serialized_start=146
+  _globals['_INSTANTMESSAGINGTYPE']._serialized_end=206
+  _globals['_DISKLOGGERLEVEL']._serialized_start=208
+  _globals['_DISKLOGGERLEVEL']._serialized_end=282
+  _globals['_STORAGETYPE']._serialized_start=285
+  _globals['_STORAGETYPE']._serialized_end=426
+  _globals['_READRULETYPE']._serialized_start=428
+  _globals['_READRULETYPE']._serialized_end=486
+  _globals['_WRITERULETYPE']._serialized_start=488
+  _globals['_WRITERULETYPE']._serialized_end=549
+  _globals['_PARTITIONERSTORAGETYPE']._serialized_start=551
+  _globals['_PARTITIONERSTORAGETYPE']._serialized_end=637
+  _globals['_STATUS']._serialized_start=639
+  _globals['_STATUS']._serialized_end=710
+  _globals['_SIGNAL']._serialized_start=712
+  _globals['_SIGNAL']._serialized_end=741
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: rpc.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'rpc.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from google.protobuf import any_pb2 as google_dot_protobuf_dot_any__pb2
+import pslx.schema.enums_pb2 as enums__pb2
+import pslx.schema.common_pb2 as common__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\trpc.proto\x12\x04pslx\x1a\x19google/protobuf/any.proto\x1a\x0b\x65nums.proto\x1a\x0c\x63ommon.proto\"\x94\x01\n\x11GenericRPCRequest\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x0c\n\x04uuid\x18\x02 \x01(\t\x12*\n\x0crequest_data\x18\x03 \x01(\x0b\x32\x14.google.protobuf.Any\x12\x14\n\x0cmessage_type\x18\x04 \x01(\t\x12\x1c\n\x06status\x18\x05 \x01(\x0e\x32\x0c.pslx.Status\":\n\x14HealthCheckerRequest\x12\x12\n\nserver_url\x18\x01 \x01(\t\x12\x0e\n\x06secure\x18\x02 \x01(\x08\"d\n\x15HealthCheckerResponse\x12\x12\n\nserver_url\x18\x01 \x01(\t\x12#\n\rserver_status\x18\x02 \x01(\x0e\x32\x0c.pslx.Status\x12\x12\n\nserver_qps\x18\x03 \x01(\x02\"\x9e\x01\n\x12GenericRPCResponse\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x14\n\x0crequest_uuid\x18\x02 \x01(\t\x12+\n\rresponse_data\x18\x03 \x01(\x0b\x32\x14.google.protobuf.Any\x12\x14\n\x0cmessage_type\x18\x04 \x01(\t\x12\x1c\n\x06status\x18\x05 \x01(\x0e\x32\x0c.pslx.Status\"\x9b\x01\n\x1dGenericRPCRequestResponsePair\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x34\n\x13generic_rpc_request\x18\x02 \x01(\x0b\x32\x17.pslx.GenericRPCRequest\x12\x36\n\x14generic_rpc_response\x18\x03 \x01(\x0b\x32\x18.pslx.GenericRPCResponse\"\x93\x01\n\x1aInstantMessagingRPCRequest\x12\x0f\n\x07is_test\x18\x01 \x01(\x08\x12(\n\x04type\x18\x02 \x01(\x0e\x32\x1a.pslx.InstantMessagingType\x12\x14\n\x0c\x63hannel_name\x18\x03 \x01(\t\x12\x13\n\x0bwebhook_url\x18\x04 \x01(\t\x12\x0f\n\x07message\x18\x05 \x01(\t\"Y\n\x0f\x45mailPRCRequest\x12\x0f\n\x07is_test\x18\x01 \x01(\x08\x12\x12\n\nfrom_email\x18\x02 \x01(\t\x12\x10\n\x08to_email\x18\x03 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x04 \x01(\t\"\xd0\x01\n\x0cRPCIORequest\x12\x0f\n\x07is_test\x18\x01 \x01(\x08\x12\x1f\n\x04type\x18\x02 \x01(\x0e\x32\x11.pslx.StorageType\x12\x13\n\tfile_name\x18\x03 \x01(\tH\x00\x12\x12\n\x08\x64ir_name\x18\x04 \x01(\tH\x00\x12.\n\x06params\x18\x05 \x03(\x0b\x32\x1e.pslx.RPCIORequest.ParamsEntry\x1a-\n\x0bParamsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x42\x06\n\x04path\"\xdf\x02\n\rRPCIOResponse\x12\x32\n\tlist_data\x18\x04 \x01(\x0b\x32\x1f.pslx.RPCIOResponse.RPCListData\x12\x34\n\tdict_data\x18\x05 \x03(\x0b\x32!.pslx.RPCIOResponse.DictDataEntry\x1aX\n\x07RPCData\x12\x15\n\x0bstring_data\x18\x01 \x01(\tH\x00\x12*\n\nproto_data\x18\x02 \x01(\x0b\x32\x14.google.protobuf.AnyH\x00\x42\n\n\x08raw_data\x1a\x38\n\x0bRPCListData\x12)\n\x04\x64\x61ta\x18\x03 \x03(\x0b\x32\x1b.pslx.RPCIOResponse.RPCData\x1aP\n\rDictDataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12.\n\x05value\x18\x02 \x01(\x0b\x32\x1f.pslx.RPCIOResponse.RPCListData:\x02\x38\x01\"\\\n\x15ProtoViewerRPCRequest\x12\x17\n\x0fproto_file_path\x18\x01 \x01(\t\x12\x14\n\x0cmessage_type\x18\x02 \x01(\t\x12\x14\n\x0cproto_module\x18\x03 \x01(\t\"R\n\x16ProtoViewerRPCResponse\x12\x15\n\rproto_content\x18\x01 \x01(\t\x12!\n\tfile_info\x18\x02 \x01(\x0b\x32\x0e.pslx.FileInfo\")\n\x14\x46ileViewerRPCRequest\x12\x11\n\tfile_path\x18\x01 \x01(\t\"e\n\x15\x46ileViewerRPCResponse\x12\"\n\nfiles_info\x18\x01 \x03(\x0b\x32\x0e.pslx.FileInfo\x12(\n\x10\x64irectories_info\x18\x02 \x03(\x0b\x32\x0e.pslx.FileInfo\"N\n\x15LoggingMessageRequest\x12\x0f\n\x07message\x18\x01 \x01(\t\x12$\n\x05level\x18\x02 \x01(\x0e\x32\x15.pslx.DiskLoggerLevel2\xa1\x01\n\x11GenericRPCService\x12\x42\n\x0bSendRequest\x12\x17.pslx.GenericRPCRequest\x1a\x18.pslx.GenericRPCResponse\"\x00\x12H\n\x0b\x43heckHealth\x12\x1a.pslx.HealthCheckerRequest\x1a\x1b.pslx.HealthCheckerResponse\"\x00\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'rpc_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_RPCIOREQUEST_PARAMSENTRY']._loaded_options = None
+  _globals['_RPCIOREQUEST_PARAMSENTRY']._serialized_options = b'8\001'
+  _globals['_RPCIORESPONSE_DICTDATAENTRY']._loaded_options = None
+  _globals['_RPCIORESPONSE_DICTDATAENTRY']._serialized_options = b'8\001'
+  _globals['_GENERICRPCREQUEST']._serialized_start=74
+  _globals['_GENERICRPCREQUEST']._serialized_end=222
+  _globals['_HEALTHCHECKERREQUEST']._serialized_start=224
+  _globals['_HEALTHCHECKERREQUEST']._serialized_end=282
+  _globals['_HEALTHCHECKERRESPONSE']._serialized_start=284
+  _globals['_HEALTHCHECKERRESPONSE']._serialized_end=384
+  _globals['_GENERICRPCRESPONSE']._serialized_start=387
+  _globals['_GENERICRPCRESPONSE']._serialized_end=545
+  _globals['_GENERICRPCREQUESTRESPONSEPAIR']._serialized_start=548
+  _globals['_GENERICRPCREQUESTRESPONSEPAIR']._serialized_end=703
+  _globals['_INSTANTMESSAGINGRPCREQUEST']._serialized_start=706
+  _globals['_INSTANTMESSAGINGRPCREQUEST']._serialized_end=853
+  _globals['_EMAILPRCREQUEST']._serialized_start=855
+  _globals['_EMAILPRCREQUEST']._serialized_end=944
+  _globals['_RPCIOREQUEST']._serialized_start=947
+  _globals['_RPCIOREQUEST']._serialized_end=1155
+  _globals['_RPCIOREQUEST_PARAMSENTRY']._serialized_start=1102
+  _globals['_RPCIOREQUEST_PARAMSENTRY']._serialized_end=1147
+  _globals['_RPCIORESPONSE']._serialized_start=1158
+  _globals['_RPCIORESPONSE']._serialized_end=1509
+  _globals['_RPCIORESPONSE_RPCDATA']._serialized_start=1281
+  _globals['_RPCIORESPONSE_RPCDATA']._serialized_end=1369
+  _globals['_RPCIORESPONSE_RPCLISTDATA']._serialized_start=1371
+  _globals['_RPCIORESPONSE_RPCLISTDATA']._serialized_end=1427
+  _globals['_RPCIORESPONSE_DICTDATAENTRY']._serialized_start=1429
+  _globals['_RPCIORESPONSE_DICTDATAENTRY']._serialized_end=1509
+  _globals['_PROTOVIEWERRPCREQUEST']._serialized_start=1511
+  _globals['_PROTOVIEWERRPCREQUEST']._serialized_end=1603
+  _globals['_PROTOVIEWERRPCRESPONSE']._serialized_start=1605
+  _globals['_PROTOVIEWERRPCRESPONSE']._serialized_end=1687
+  _globals['_FILEVIEWERRPCREQUEST']._serialized_start=1689
+  _globals['_FILEVIEWERRPCREQUEST']._serialized_end=1730
+  _globals['_FILEVIEWERRPCRESPONSE']._serialized_start=1732
+  _globals['_FILEVIEWERRPCRESPONSE']._serialized_end=1833
+  _globals['_LOGGINGMESSAGEREQUEST']._serialized_start=1835
+  _globals['_LOGGINGMESSAGEREQUEST']._serialized_end=1913
+  _globals['_GENERICRPCSERVICE']._serialized_start=1916
+  _globals['_GENERICRPCSERVICE']._serialized_end=2077
+# @@protoc_insertion_point(module_scope)
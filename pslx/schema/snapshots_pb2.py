@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: snapshots.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'snapshots.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from google.protobuf import any_pb2 as google_dot_protobuf_dot_any__pb2
+import pslx.schema.enums_pb2 as enums__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fsnapshots.proto\x12\x04pslx\x1a\x19google/protobuf/any.proto\x1a\x0b\x65nums.proto\"P\n\x0cNodeSnapshot\x12\x11\n\tnode_name\x18\x01 \x01(\t\x12\x16\n\x0e\x63hildren_names\x18\x02 \x03(\t\x12\x15\n\rparents_names\x18\x03 \x03(\t\"\xfc\x01\n\x10OperatorSnapshot\x12\x15\n\roperator_name\x18\x01 \x01(\t\x12\'\n\ndata_model\x18\x02 \x01(\x0e\x32\x13.pslx.DataModelType\x12\x1c\n\x06status\x18\x03 \x01(\x0e\x32\x0c.pslx.Status\x12)\n\rnode_snapshot\x18\x04 \x01(\x0b\x32\x12.pslx.NodeSnapshot\x12\x12\n\nstart_time\x18\x05 \x01(\t\x12\x10\n\x08\x65nd_time\x18\x06 \x01(\t\x12%\n\x07\x63ontent\x18\x07 \x01(\x0b\x32\x14.google.protobuf.Any\x12\x12\n\nclass_name\x18\x08 \x01(\t\"\x82\x04\n\x11\x43ontainerSnapshot\x12\x16\n\x0e\x63ontainer_name\x18\x01 \x01(\t\x12O\n\x15operator_snapshot_map\x18\x02 \x03(\x0b\x32\x30.pslx.ContainerSnapshot.OperatorSnapshotMapEntry\x12\x16\n\x0eis_initialized\x18\x03 \x01(\x08\x12\x1c\n\x06status\x18\x04 \x01(\x0e\x32\x0c.pslx.Status\x12\x12\n\nstart_time\x18\x05 \x01(\t\x12\x10\n\x08\x65nd_time\x18\x06 \x01(\t\x12\x12\n\nclass_name\x18\x07 \x01(\t\x12\x1c\n\x04mode\x18\x08 \x01(\x0e\x32\x0e.pslx.ModeType\x12\'\n\ndata_model\x18\t \x01(\x0e\x32\x13.pslx.DataModelType\x12\x0f\n\x07log_dir\x18\n \x01(\t\x12\x37\n\x08\x63ounters\x18\x0b \x03(\x0b\x32%.pslx.ContainerSnapshot.CountersEntry\x1aR\n\x18OperatorSnapshotMapEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.pslx.OperatorSnapshot:\x02\x38\x01\x1a/\n\rCountersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x05:\x02\x38\x01\"x\n\x14OperatorContentPlain\x12\x14\n\nstring_val\x18\x01 \x01(\tH\x00\x12\x11\n\x07int_val\x18\x02 \x01(\x05H\x00\x12\x13\n\tfloat_val\x18\x03 \x01(\x02H\x00\x12\x12\n\x08\x62ool_val\x18\x04 \x01(\x08H\x00\x42\x0e\n\x0cplan_content\"G\n\x13OperatorContentList\x12\x30\n\x0clist_content\x18\x01 \x03(\x0b\x32\x1a.pslx.OperatorContentPlain\"\xa7\x01\n\x13OperatorContentDict\x12@\n\x0c\x64ict_content\x18\x01 \x03(\x0b\x32*.pslx.OperatorContentDict.DictContentEntry\x1aN\n\x10\x44ictContentEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12)\n\x05value\x18\x02 \x01(\x0b\x32\x1a.pslx.OperatorContentPlain:\x02\x38\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'snapshots_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_CONTAINERSNAPSHOT_OPERATORSNAPSHOTMAPENTRY']._loaded_options = None
+  _globals['_CONTAINERSNAPSHOT_OPERATORSNAPSHOTMAPENTRY']._serialized_options = b'8\001'
+  _globals['_CONTAINERSNAPSHOT_COUNTERSENTRY']._loaded_options = None
+  _globals['_CONTAINERSNAPSHOT_COUNTERSENTRY']._serialized_options = b'8\001'
+  _globals['_OPERATORCONTENTDICT_DICTCONTENTENTRY']._loaded_options = None
+  _globals['_OPERATORCONTENTDICT_DICTCONTENTENTRY']._serialized_options = b'8\001'
+  _globals['_NODESNAPSHOT']._serialized_start=65
+  _globals['_NODESNAPSHOT']._serialized_end=145
+  _globals['_OPERATORSNAPSHOT']._serialized_start=148
+  _globals['_OPERATORSNAPSHOT']._serialized_end=400
+  _globals['_CONTAINERSNAPSHOT']._serialized_start=403
+  _globals['_CONTAINERSNAPSHOT']._serialized_end=917
+  _globals['_CONTAINERSNAPSHOT_OPERATORSNAPSHOTMAPENTRY']._serialized_start=786
+  _globals['_CONTAINERSNAPSHOT_OPERATORSNAPSHOTMAPENTRY']._serialized_end=868
+  _globals['_CONTAINERSNAPSHOT_COUNTERSENTRY']._serialized_start=870
+  _globals['_CONTAINERSNAPSHOT_COUNTERSENTRY']._serialized_end=917
+  _globals['_OPERATORCONTENTPLAIN']._serialized_start=919
+  _globals['_OPERATORCONTENTPLAIN']._serialized_end=1039
+  _globals['_OPERATORCONTENTLIST']._serialized_start=1041
+  _globals['_OPERATORCONTENTLIST']._serialized_end=1112
+  _globals['_OPERATORCONTENTDICT']._serialized_start=1115
+  _globals['_OPERATORCONTENTDICT']._serialized_end=1282
+  _globals['_OPERATORCONTENTDICT_DICTCONTENTENTRY']._serialized_start=1204
+  _globals['_OPERATORCONTENTDICT_DICTCONTENTENTRY']._serialized_end=1282
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: storage.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'storage.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from google.protobuf import any_pb2 as google_dot_protobuf_dot_any__pb2
+import pslx.schema.enums_pb2 as enums__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rstorage.proto\x12\x04pslx\x1a\x19google/protobuf/any.proto\x1a\x0b\x65nums.proto\"\xe2\x01\n\nProtoTable\x12\x12\n\ntable_name\x18\x01 \x01(\t\x12\x12\n\ntable_path\x18\x02 \x01(\t\x12\x14\n\x0c\x63reated_time\x18\x03 \x01(\t\x12(\n\x04\x64\x61ta\x18\x04 \x03(\x0b\x32\x1a.pslx.ProtoTable.DataEntry\x12\x14\n\x0cupdated_time\x18\x05 \x01(\t\x12\x13\n\x0bsorted_keys\x18\x06 \x03(\t\x1a\x41\n\tDataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12#\n\x05value\x18\x02 \x01(\x0b\x32\x14.google.protobuf.Any:\x02\x38\x01\"[\n\x13ProtoTableLogRecord\x12\x0b\n\x03key\x18\x01 \x01(\t\x12#\n\x05value\x18\x02 \x01(\x0b\x32\x14.google.protobuf.Any\x12\x12\n\nis_deleted\x18\x03 \x01(\x08\"X\n\x15ProtoTableIndexRecord\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x03\x12\x0e\n\x06length\x18\x03 \x01(\x03\x12\x12\n\nis_deleted\x18\x04 \x01(\x08\"\xed\x04\n\x15\x43ontainerBackendValue\x12\x16\n\x0e\x63ontainer_name\x18\x01 \x01(\t\x12K\n\x11operator_info_map\x18\x02 \x03(\x0b\x32\x30.pslx.ContainerBackendValue.OperatorInfoMapEntry\x12&\n\x10\x63ontainer_status\x18\x03 \x01(\x0e\x32\x0c.pslx.Status\x12\x1c\n\x04mode\x18\x04 \x01(\x0e\x32\x0e.pslx.ModeType\x12\'\n\ndata_model\x18\x05 \x01(\x0e\x32\x13.pslx.DataModelType\x12\x14\n\x0cupdated_time\x18\x06 \x01(\t\x12\x12\n\nstart_time\x18\x07 \x01(\t\x12\x10\n\x08\x65nd_time\x18\x08 \x01(\t\x12\x0f\n\x07log_dir\x18\t \x01(\t\x12;\n\x08\x63ounters\x18\n \x03(\x0b\x32).pslx.ContainerBackendValue.CountersEntry\x1a\x63\n\x0cOperatorInfo\x12\x0f\n\x07parents\x18\x02 \x03(\t\x12\x12\n\nstart_time\x18\x03 \x01(\t\x12\x10\n\x08\x65nd_time\x18\x04 \x01(\t\x12\x1c\n\x06status\x18\x05 \x01(\x0e\x32\x0c.pslx.Status\x1a`\n\x14OperatorInfoMapEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x37\n\x05value\x18\x02 \x01(\x0b\x32(.pslx.ContainerBackendValue.OperatorInfo:\x02\x38\x01\x1a/\n\rCountersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x05:\x02\x38\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'storage_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_PROTOTABLE_DATAENTRY']._loaded_options = None
+  _globals['_PROTOTABLE_DATAENTRY']._serialized_options = b'8\001'
+  _globals['_CONTAINERBACKENDVALUE_OPERATORINFOMAPENTRY']._loaded_options = None
+  _globals['_CONTAINERBACKENDVALUE_OPERATORINFOMAPENTRY']._serialized_options = b'8\001'
+  _globals['_CONTAINERBACKENDVALUE_COUNTERSENTRY']._loaded_options = None
+  _globals['_CONTAINERBACKENDVALUE_COUNTERSENTRY']._serialized_options = b'8\001'
+  _globals['_PROTOTABLE']._serialized_start=64
+  _globals['_PROTOTABLE']._serialized_end=290
+  _globals['_PROTOTABLE_DATAENTRY']._serialized_start=225
+  _globals['_PROTOTABLE_DATAENTRY']._serialized_end=290
+  _globals['_PROTOTABLELOGRECORD']._serialized_start=292
+  _globals['_PROTOTABLELOGRECORD']._serialized_end=383
+  _globals['_PROTOTABLEINDEXRECORD']._serialized_start=385
+  _globals['_PROTOTABLEINDEXRECORD']._serialized_end=473
+  _globals['_CONTAINERBACKENDVALUE']._serialized_start=476
+  _globals['_CONTAINERBACKENDVALUE']._serialized_end=1097
+  _globals['_CONTAINERBACKENDVALUE_OPERATORINFO']._serialized_start=851
+  _globals['_CONTAINERBACKENDVALUE_OPERATORINFO']._serialized_end=950
+  _globals['_CONTAINERBACKENDVALUE_OPERATORINFOMAPENTRY']._serialized_start=952
+  _globals['_CONTAINERBACKENDVALUE_OPERATORINFOMAPENTRY']._serialized_end=1048
+  _globals['_CONTAINERBACKENDVALUE_COUNTERSENTRY']._serialized_start=1050
+  _globals['_CONTAINERBACKENDVALUE_COUNTERSENTRY']._serialized_end=1097
+# @@protoc_insertion_point(module_scope)
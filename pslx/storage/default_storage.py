@@ -1,7 +1,12 @@
+import asyncio
+import itertools
+import os
+import struct
+import threading
 import time
 
 from pslx.core.exception import StoragePastLineException, StorageReadException, StorageWriteException
-from pslx.schema.enums_pb2 import StorageType, ReadRuleType, WriteRuleType, Status
+from pslx.schema.enums_pb2 import StorageType, ReadRuleType, WriteRuleType
 from pslx.schema.enums_pb2 import ModeType
 from pslx.storage.storage_base import StorageBase
 from pslx.tool.filelock_tool import FileLockTool
@@ -12,6 +17,15 @@ from pslx.util.timezone_util import TimeSleepObj
 
 class DefaultStorage(StorageBase):
     STORAGE_TYPE = StorageType.DEFAULT_STORAGE
+    LINE_INDEX_HEADER = b'PSLX_LINE_INDEX\n'
+    LINE_INDEX_HEAD_SIZE = 64
+    LINE_INDEX_META_FORMAT = '>QH64s'
+    LINE_INDEX_OFFSET_FORMAT = '>Q'
+    LINE_INDEX_CHUNK_SIZE = 1024 * 1024
+    LINE_INDEX_THRESHOLD = 1024 * 1024
+    REVERSE_READ_BLOCK_SIZE = 64 * 1024
+    REVERSED_LAYOUT_HEADER = b'PSLX_REVERSED_LAYOUT\n'
+    FSYNC_POLICIES = ['none', 'per_batch', 'per_interval']
 
     def __init__(self, logger=None):
         super().__init__(logger=logger)
@@ -21,6 +35,10 @@ class DefaultStorage(StorageBase):
             'write_rule_type': WriteRuleType.WRITE_FROM_END,
         }
         self._last_read_line = 0
+        self._last_fsync_time = 0
+        self._follow_offset = 0
+        self._line_index_lock = threading.Lock()
+        self._reset_line_index()
 
     def initialize_from_dir(self, dir_name):
         self.sys_log("Initialize_from_dir function is not implemented for storage type "
@@ -34,6 +52,7 @@ class DefaultStorage(StorageBase):
         self._logger.info("Initialize from file " + file_name + '.')
         self._file_name = FileUtil.create_file_if_not_exist(file_name=file_name)
         self._last_read_line = 0
+        self._reset_line_index()
 
     def get_file_name(self):
         return self._file_name
@@ -54,6 +73,330 @@ class DefaultStorage(StorageBase):
     def start_from_first_line(self):
         self._last_read_line = 0
 
+    def _get_line_index_file_name(self):
+        return FileUtil.get_sidecar_file_name(file_name=self._file_name, suffix='lineidx')
+
+    def _reset_line_index(self):
+        # _line_ends holds the end offset (after the newline) of each complete line of the file, the first bytes of
+        # the file and its inode are kept to detect the file being replaced or rewritten.
+        self._line_ends = []
+        self._line_index_inode = None
+        self._line_index_head = b''
+        self._num_persisted_line_ends = 0
+
+    def _load_line_index(self, file_stat):
+        line_index_file_name = self._get_line_index_file_name()
+        if not FileUtil.does_file_exist(line_index_file_name):
+            return
+        with open(line_index_file_name, 'rb') as infile:
+            content = infile.read()
+        meta_start = len(self.LINE_INDEX_HEADER)
+        offsets_start = meta_start + struct.calcsize(self.LINE_INDEX_META_FORMAT)
+        if not content.startswith(self.LINE_INDEX_HEADER) or len(content) < offsets_start:
+            return
+        inode, head_size, head = struct.unpack_from(self.LINE_INDEX_META_FORMAT, content, meta_start)
+        if inode != file_stat.st_ino:
+            return
+        num_line_ends = (len(content) - offsets_start) // struct.calcsize(self.LINE_INDEX_OFFSET_FORMAT)
+        line_ends = list(struct.unpack_from('>' + str(num_line_ends) + 'Q', content, offsets_start))
+        if any(line_ends[index] >= line_ends[index + 1] for index in range(num_line_ends - 1)) or \
+                (line_ends and line_ends[0] <= 0):
+            self.sys_log("The line index of file [" + self._file_name + "] is corrupted.")
+            return
+        self._line_ends = line_ends
+        self._line_index_inode = inode
+        self._line_index_head = head[:head_size]
+        self._num_persisted_line_ends = num_line_ends
+
+    def _get_num_saved_line_ends(self):
+        # the number of offsets in the sidecar, or None if the sidecar is not the one of the current index.
+        line_index_file_name = self._get_line_index_file_name()
+        meta_start = len(self.LINE_INDEX_HEADER)
+        offsets_start = meta_start + struct.calcsize(self.LINE_INDEX_META_FORMAT)
+        try:
+            with open(line_index_file_name, 'rb') as infile:
+                content = infile.read(offsets_start)
+                file_size = os.fstat(infile.fileno()).st_size
+        except FileNotFoundError:
+            return None
+        if not content.startswith(self.LINE_INDEX_HEADER) or len(content) < offsets_start or \
+                (file_size - offsets_start) % struct.calcsize(self.LINE_INDEX_OFFSET_FORMAT) != 0:
+            return None
+        inode, head_size, head = struct.unpack_from(self.LINE_INDEX_META_FORMAT, content, meta_start)
+        if inode != self._line_index_inode or head[:head_size] != self._line_index_head:
+            return None
+        return (file_size - offsets_start) // struct.calcsize(self.LINE_INDEX_OFFSET_FORMAT)
+
+    def _save_line_index(self):
+        # called with the file lock held, so the sidecar is not changed by others in the meantime. The new offsets are
+        # only appended if the sidecar still has the offsets this storage saved or loaded, otherwise another storage
+        # has saved to it since, and it is rewritten.
+        line_index_file_name = self._get_line_index_file_name()
+        new_line_ends = self._line_ends[self._num_persisted_line_ends:]
+        if self._num_persisted_line_ends > 0 and self._get_num_saved_line_ends() != self._num_persisted_line_ends:
+            self.sys_log("The line index of file [" + self._file_name + "] is saved by others. Rewriting it.")
+            self._num_persisted_line_ends = 0
+        if self._num_persisted_line_ends > 0:
+            with open(line_index_file_name, 'ab') as outfile:
+                outfile.write(struct.pack('>' + str(len(new_line_ends)) + 'Q', *new_line_ends))
+        else:
+            tmp_file_name = FileUtil.get_sidecar_file_name(file_name=line_index_file_name, suffix='tmp')
+            with open(tmp_file_name, 'wb') as outfile:
+                outfile.write(self.LINE_INDEX_HEADER)
+                outfile.write(struct.pack(self.LINE_INDEX_META_FORMAT, self._line_index_inode,
+                                          len(self._line_index_head), self._line_index_head))
+                outfile.write(struct.pack('>' + str(len(self._line_ends)) + 'Q', *self._line_ends))
+            os.replace(tmp_file_name, line_index_file_name)
+        self._num_persisted_line_ends = len(self._line_ends)
+
+    def _update_line_index(self, infile):
+        file_stat = os.fstat(infile.fileno())
+        is_persisted = file_stat.st_size >= self._config.get('line_index_threshold', self.LINE_INDEX_THRESHOLD)
+        if self._line_index_inode is None and is_persisted:
+            self._load_line_index(file_stat=file_stat)
+
+        indexed_size = self._line_ends[-1] if self._line_ends else 0
+        head = infile.read(self.LINE_INDEX_HEAD_SIZE)
+        is_valid = self._line_index_inode == file_stat.st_ino and file_stat.st_size >= indexed_size and \
+            head[:len(self._line_index_head)] == self._line_index_head
+        if is_valid and indexed_size > 0:
+            infile.seek(indexed_size - 1)
+            is_valid = infile.read(1) == b'\n'
+        if not is_valid:
+            self.sys_log("Rebuilding the line index of file [" + self._file_name + "].")
+            self._reset_line_index()
+            self._line_index_inode = file_stat.st_ino
+            indexed_size = 0
+
+        if file_stat.st_size > indexed_size:
+            infile.seek(indexed_size)
+            chunk_start = indexed_size
+            while True:
+                chunk = infile.read(self.LINE_INDEX_CHUNK_SIZE)
+                if not chunk:
+                    break
+                pos = chunk.find(b'\n')
+                while pos != -1:
+                    self._line_ends.append(chunk_start + pos + 1)
+                    pos = chunk.find(b'\n', pos + 1)
+                chunk_start += len(chunk)
+            if len(self._line_index_head) < self.LINE_INDEX_HEAD_SIZE and self._line_ends:
+                self._line_index_head = head[:min(self.LINE_INDEX_HEAD_SIZE, self._line_ends[-1])]
+                # the head is part of the sidecar header.
+                self._num_persisted_line_ends = 0
+
+        if is_persisted and self._num_persisted_line_ends != len(self._line_ends):
+            self._save_line_index()
+
+        # a last line without the trailing newline is also counted.
+        indexed_size = self._line_ends[-1] if self._line_ends else 0
+        return len(self._line_ends) + (1 if file_stat.st_size > indexed_size else 0), file_stat.st_size
+
+    def _read_lines_with_index(self, num_line):
+        with open(self._file_name, 'rb') as infile:
+            with self._line_index_lock:
+                num_lines, file_size = self._update_line_index(infile=infile)
+                if num_line <= 0:
+                    return num_lines, []
+                new_line_number = self._last_read_line + num_line
+                if new_line_number > num_lines:
+                    return num_lines, None
+                start = self._line_ends[self._last_read_line - 1] if self._last_read_line > 0 else 0
+                end = self._line_ends[new_line_number - 1] if new_line_number <= len(self._line_ends) else file_size
+            infile.seek(start)
+            lines = infile.read(end - start).split(b'\n')
+            if lines and not lines[-1]:
+                lines.pop()
+            return num_lines, [line.decode().strip() for line in lines]
+
+    def _iter_lines_from_end(self, infile):
+        # Yield the lines from the last one to the first one by reading blocks backward from the end of the file. A
+        # trailing newline at the end of the file does not make an extra empty line, the same as readlines().
+        infile.seek(0, os.SEEK_END)
+        position = infile.tell()
+        remainder = b''
+        is_last_segment = True
+        while position > 0:
+            read_size = min(self.REVERSE_READ_BLOCK_SIZE, position)
+            position -= read_size
+            infile.seek(position)
+            segments = (infile.read(read_size) + remainder).split(b'\n')
+            remainder = segments[0]
+            for segment in reversed(segments[1:]):
+                if segment or not is_last_segment:
+                    yield segment
+                is_last_segment = False
+        if remainder or not is_last_segment:
+            yield remainder
+
+    def _read_lines_from_end(self, num_line):
+        with open(self._file_name, 'rb') as infile:
+            lines = list(itertools.islice(self._iter_lines_from_end(infile=infile), self._last_read_line + num_line))
+        if len(lines) < self._last_read_line + num_line:
+            return len(lines), None
+        return len(lines), [line.decode().strip() for line in lines[self._last_read_line:]]
+
+    def _read_followed_lines(self, state):
+        # only complete lines are returned, and a partial last line stays in the buffer until its newline is written.
+        content = state['buffer'] + state['file'].read()
+        end = content.rfind(b'\n') + 1
+        state['buffer'] = content[end:]
+        result = []
+        for line in content[:end].split(b'\n')[:-1]:
+            state['offset'] += len(line) + 1
+            result.append((state['offset'], line))
+        return result
+
+    def _poll_followed_lines(self, state):
+        file_stat = os.stat(self._file_name) if FileUtil.does_file_exist(self._file_name) else None
+        result = []
+        if state['file'] is not None and (file_stat is None or file_stat.st_ino != state['inode']):
+            self.sys_log("File [" + self._file_name + "] is rotated.")
+            self._logger.info("File [" + self._file_name + "] is rotated.")
+            # finish the lines left in the old file before switching to the new one.
+            result += self._read_followed_lines(state=state)
+            state['file'].close()
+            state['file'], state['inode'], state['offset'], state['buffer'] = None, None, 0, b''
+
+        if file_stat is None:
+            return result
+        if state['file'] is None:
+            state['file'] = open(self._file_name, 'rb')
+            state['inode'] = os.fstat(state['file'].fileno()).st_ino
+        if os.fstat(state['file'].fileno()).st_size < state['offset'] + len(state['buffer']):
+            self.sys_log("File [" + self._file_name + "] is truncated, following from the beginning.")
+            self._logger.info("File [" + self._file_name + "] is truncated, following from the beginning.")
+            state['offset'], state['buffer'] = 0, b''
+        state['file'].seek(state['offset'] + len(state['buffer']))
+        result += self._read_followed_lines(state=state)
+        return result
+
+    def get_follow_offset(self):
+        return self._follow_offset
+
+    def follow(self, poll_interval=TimeSleepObj.ONE_SECOND, from_offset=0):
+        # Yield the lines appended to the file, in the order they are written, forever. The byte offset after the last
+        # yielded line is kept in get_follow_offset(), so that a new follower can resume from it.
+        state = {
+            'file': None,
+            'inode': None,
+            'offset': from_offset,
+            'buffer': b'',
+        }
+        self._follow_offset = from_offset
+        try:
+            while True:
+                lines = self._poll_followed_lines(state=state)
+                for offset, line in lines:
+                    self._follow_offset = offset
+                    yield line.decode().strip()
+                if not lines:
+                    time.sleep(poll_interval)
+        finally:
+            if state['file'] is not None:
+                state['file'].close()
+
+    async def afollow(self, poll_interval=TimeSleepObj.ONE_SECOND, from_offset=0):
+        state = {
+            'file': None,
+            'inode': None,
+            'offset': from_offset,
+            'buffer': b'',
+        }
+        self._follow_offset = from_offset
+        try:
+            while True:
+                lines = await self._run_in_executor(self._poll_followed_lines, state=state)
+                for offset, line in lines:
+                    self._follow_offset = offset
+                    yield line.decode().strip()
+                if not lines:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            if state['file'] is not None:
+                state['file'].close()
+
+    def _get_reversed_layout_file_name(self):
+        return FileUtil.get_sidecar_file_name(file_name=self._file_name, suffix='reversed')
+
+    def is_reversed_layout(self):
+        # In the reversed layout the lines are physically stored from the last one to the first one, so that
+        # WRITE_FROM_BEGINNING only appends to the file. The marker records the inode of the file it belongs to, so a
+        # marker left behind by an interrupted migration is ignored.
+        reversed_layout_file_name = self._get_reversed_layout_file_name()
+        if not FileUtil.does_file_exist(reversed_layout_file_name) or not FileUtil.does_file_exist(self._file_name):
+            return False
+        with open(reversed_layout_file_name, 'rb') as infile:
+            content = infile.read()
+        return content == self.REVERSED_LAYOUT_HEADER + struct.pack('>Q', os.stat(self._file_name).st_ino)
+
+    def _migrate_layout(self, is_reversed):
+        self.sys_log("Migrating file [" + self._file_name + "] to the " + ('reversed' if is_reversed else 'default') +
+                     " layout.")
+        self._logger.info("Migrating file [" + self._file_name + "] to the " +
+                          ('reversed' if is_reversed else 'default') + " layout.")
+        reversed_layout_file_name = self._get_reversed_layout_file_name()
+        tmp_file_name = FileUtil.get_sidecar_file_name(file_name=self._file_name, suffix='tmp')
+        with open(FileUtil.create_file_if_not_exist(file_name=self._file_name), 'rb') as infile:
+            with open(tmp_file_name, 'wb') as outfile:
+                for line in self._iter_lines_from_end(infile=infile):
+                    outfile.write(line + b'\n')
+                outfile.flush()
+                os.fsync(outfile.fileno())
+                inode = os.fstat(outfile.fileno()).st_ino
+        if is_reversed:
+            # the marker points to the new file, and only becomes valid once the new file replaces the old one.
+            with open(reversed_layout_file_name, 'wb') as outfile:
+                outfile.write(self.REVERSED_LAYOUT_HEADER + struct.pack('>Q', inode))
+        os.replace(tmp_file_name, self._file_name)
+        if not is_reversed:
+            FileUtil.remove_file(reversed_layout_file_name)
+        with self._line_index_lock:
+            self._reset_line_index()
+
+    def migrate_layout(self, is_reversed=True):
+        with self._write_lock():
+            with FileLockTool(self._file_name, read_mode=False):
+                if self.is_reversed_layout() != is_reversed:
+                    self._migrate_layout(is_reversed=is_reversed)
+
+    def _sync_file(self, outfile):
+        # per_interval syncs at most once every fsync_interval seconds, and only when a write happens.
+        fsync_policy = self._config.get('fsync_policy', 'none')
+        assert fsync_policy in self.FSYNC_POLICIES
+        if fsync_policy == 'none':
+            return
+        if fsync_policy == 'per_interval' and \
+                time.monotonic() - self._last_fsync_time < self._config.get('fsync_interval', TimeSleepObj.ONE_SECOND):
+            return
+        outfile.flush()
+        os.fsync(outfile.fileno())
+        self._last_fsync_time = time.monotonic()
+
+    @staticmethod
+    def _join_rows(rows, delimiter):
+        return [row if isinstance(row, str) else delimiter.join([str(val) for val in row]) for row in rows]
+
+    def _write_lines(self, lines_to_write):
+        # needs to be called with the file lock held. The lines are written one after another, so lines written from
+        # the beginning end up in the reverse order in the storage.
+        is_write_from_end = self._config['write_rule_type'] == WriteRuleType.WRITE_FROM_END
+        if not is_write_from_end and self._config.get('reversed_layout', False) and not self.is_reversed_layout():
+            self._migrate_layout(is_reversed=True)
+
+        if is_write_from_end != self.is_reversed_layout():
+            with open(FileUtil.create_file_if_not_exist(file_name=self._file_name), 'a') as outfile:
+                outfile.write(''.join([line + '\n' for line in lines_to_write]))
+                self._sync_file(outfile=outfile)
+        else:
+            with open(FileUtil.create_file_if_not_exist(file_name=self._file_name), 'r+') as outfile:
+                file_data = outfile.read()
+                outfile.seek(0, 0)
+                outfile.write(''.join([line + '\n' for line in reversed(lines_to_write)]) + file_data)
+                self._sync_file(outfile=outfile)
+            with self._line_index_lock:
+                self._reset_line_index()
+
     def read(self, params=None):
         if not params:
             params = {
@@ -68,37 +411,38 @@ class DefaultStorage(StorageBase):
                                      " will be omitted since it is not useful as an input argument in this function.")
                 self.sys_log(param + " will be omitted since it is not useful as an input argument in this function.")
 
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
-
-        self._reader_status = Status.RUNNING
-
-        with FileLockTool(self._file_name, read_mode=True):
-            with open(self._file_name, 'r') as infile:
-                lines = infile.readlines()
-                if 'read_rule_type' in self._config and self._config['read_rule_type'] == ReadRuleType.READ_FROM_END:
-                    lines = lines[::-1]
+        with self._read_lock():
+            with FileLockTool(self._file_name, read_mode=True):
+                is_read_from_end = 'read_rule_type' in self._config and \
+                    self._config['read_rule_type'] == ReadRuleType.READ_FROM_END
+                if self.is_reversed_layout():
+                    is_read_from_end = not is_read_from_end
                 if params['num_line'] < 0:
-                    self._reader_status = Status.IDLE
+                    with open(self._file_name, 'r') as infile:
+                        lines = infile.readlines()
+                    if is_read_from_end:
+                        lines = lines[::-1]
                     return [line.strip() for line in lines]
+                elif is_read_from_end:
+                    # only the tail of the file is read.
+                    num_lines, result = self._read_lines_from_end(num_line=params['num_line'])
+                else:
+                    # only the requested lines are read, with the help of the line index.
+                    num_lines, result = self._read_lines_with_index(num_line=params['num_line'])
 
                 new_line_number = self._last_read_line + params['num_line']
-                if new_line_number > len(lines):
+                if result is None:
                     self.sys_log(str(new_line_number) + " exceeds the file limit. [" + self.get_file_name() +
-                                 "] only has " + str(len(lines)) + " lines.")
+                                 "] only has " + str(num_lines) + " lines.")
                     self._logger.error(str(new_line_number) + " exceeds the file limit. [" + self.get_file_name() +
-                                       "] only has " + str(len(lines)) + " lines.")
+                                       "] only has " + str(num_lines) + " lines.")
                     raise StoragePastLineException(
                         str(new_line_number) + " exceeds the file limit. [" + self.get_file_name() +
-                        "] only has " + str(len(lines)) + " lines.")
+                        "] only has " + str(num_lines) + " lines.")
                 else:
                     try:
-                        result = lines[self._last_read_line:new_line_number]
                         assert len(result) == params['num_line']
-                        result = [line.strip() for line in result]
                         self._last_read_line = new_line_number
-                        self._reader_status = Status.IDLE
                         return result
                     except Exception as err:
                         self.sys_log("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
@@ -123,30 +467,27 @@ class DefaultStorage(StorageBase):
                                      " will be omitted since it is not useful as an input argument in this function.")
                 self.sys_log(param + " will be omitted since it is not useful as an input argument in this function.")
 
-        while self._reader_status != Status.IDLE:
-            self.sys_log("Waiting for reader to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
-
-        self._writer_status = Status.RUNNING
-        if not isinstance(data, str):
-            self.sys_log("Data is not str instance, joining them with preset delimiter.")
-            data_to_write = params['delimiter'].join([str(val) for val in data])
-        else:
-            data_to_write = data
-        try:
-            if self._config['write_rule_type'] == WriteRuleType.WRITE_FROM_END:
-                with FileLockTool(self._file_name, read_mode=False):
-                    with open(FileUtil.create_file_if_not_exist(file_name=self._file_name), 'a') as outfile:
-                        outfile.write(data_to_write + '\n')
+        with self._write_lock():
+            if not isinstance(data, str):
+                self.sys_log("Data is not str instance, joining them with preset delimiter.")
+                data_to_write = params['delimiter'].join([str(val) for val in data])
             else:
+                data_to_write = data
+            try:
+                with FileLockTool(self._file_name, read_mode=False):
+                    self._write_lines(lines_to_write=[data_to_write])
+            except Exception as err:
+                self.sys_log("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+                self._logger.error("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+
+    def write_many(self, rows, delimiter=','):
+        with self._write_lock():
+            lines_to_write = self._join_rows(rows=rows, delimiter=delimiter)
+            try:
                 with FileLockTool(self._file_name, read_mode=False):
-                    with open(FileUtil.create_file_if_not_exist(file_name=self._file_name), 'r+') as outfile:
-                        file_data = outfile.read()
-                        outfile.seek(0, 0)
-                        outfile.write(data_to_write + '\n' + file_data)
-
-            self._writer_status = Status.IDLE
-        except Exception as err:
-            self.sys_log("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
-            self._logger.error("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
-            raise StorageWriteException("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+                    self._write_lines(lines_to_write=lines_to_write)
+            except Exception as err:
+                self.sys_log("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+                self._logger.error("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
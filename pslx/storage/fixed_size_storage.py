@@ -1,15 +1,21 @@
-import time
+import itertools
+import os
+import struct
 
-from pslx.core.exception import StorageExceedsFixedSizeException, StorageWriteException
-from pslx.schema.enums_pb2 import StorageType, Status, WriteRuleType
+from pslx.core.exception import StorageExceedsFixedSizeException, StorageReadException, StorageWriteException
+from pslx.schema.enums_pb2 import StorageType, WriteRuleType
 from pslx.storage.default_storage import DefaultStorage
 from pslx.tool.filelock_tool import FileLockTool
 from pslx.util.file_util import FileUtil
-from pslx.util.timezone_util import TimeSleepObj
 
 
 class FixedSizeStorage(DefaultStorage):
     STORAGE_TYPE = StorageType.FIXED_SIZE_STORAGE
+    RING_BUFFER_HEADER = b'PSLX_RING_BUFFER'
+    RING_BUFFER_META_FORMAT = '>16sIIQQQQ'
+    RING_BUFFER_META_SIZE = 64
+    RING_BUFFER_SLOT_SIZE = 256
+    RING_BUFFER_LENGTH_FORMAT = '>I'
 
     def __init__(self, logger=None, fixed_size=-1):
         super().__init__(logger=logger)
@@ -19,12 +25,176 @@ class FixedSizeStorage(DefaultStorage):
             'write_rule_type': WriteRuleType.WRITE_FROM_END,
         }
         self._stored_data = None
+        self._ring_buffer_records = None
+        self._ring_buffer_cache_key = None
+
+    def _read_first_lines(self, num_line):
+        with open(self._file_name, 'rb') as infile:
+            if self.is_reversed_layout():
+                lines = list(itertools.islice(self._iter_lines_from_end(infile=infile), num_line))
+            else:
+                lines = infile.readlines()[:num_line]
+        return [line.decode().strip() for line in lines]
 
     def _pre_load_data(self):
         if not self._stored_data and self._fixed_size > 0:
-            with open(self._file_name, 'r') as infile:
-                lines = infile.readlines()
-                self._stored_data = [line.strip() for line in lines[:self._fixed_size]]
+            self._stored_data = self._read_first_lines(num_line=self._fixed_size)
+
+    def _is_ring_buffer(self):
+        return self._config.get('ring_buffer', False)
+
+    def _read_ring_buffer_meta(self, fd):
+        content = os.pread(fd, struct.calcsize(self.RING_BUFFER_META_FORMAT), 0)
+        if len(content) < struct.calcsize(self.RING_BUFFER_META_FORMAT):
+            return None
+        header, capacity, slot_size, head, tail, count, generation = struct.unpack(
+            self.RING_BUFFER_META_FORMAT, content)
+        if header != self.RING_BUFFER_HEADER:
+            return None
+        return {
+            'capacity': capacity,
+            'slot_size': slot_size,
+            'head': head,
+            'tail': tail,
+            'count': count,
+            'generation': generation,
+        }
+
+    def _write_ring_buffer_meta(self, fd, meta):
+        os.pwrite(fd, struct.pack(self.RING_BUFFER_META_FORMAT, self.RING_BUFFER_HEADER, meta['capacity'],
+                                  meta['slot_size'], meta['head'], meta['tail'], meta['count'],
+                                  meta['generation']), 0)
+
+    def _get_ring_buffer_slot_offset(self, meta, index):
+        return self.RING_BUFFER_META_SIZE + index * meta['slot_size']
+
+    def _get_ring_buffer_slot_size(self):
+        # the slot size of an existing ring buffer never changes, otherwise it is the one the file is migrated with.
+        with open(self._file_name, 'rb') as infile:
+            meta = self._read_ring_buffer_meta(fd=infile.fileno())
+        if meta is not None:
+            return meta['slot_size']
+        return self._config.get('ring_buffer_slot_size', self.RING_BUFFER_SLOT_SIZE)
+
+    def _check_ring_buffer_records(self, lines_to_write):
+        slot_size = self._get_ring_buffer_slot_size()
+        for line in lines_to_write:
+            record_size = len(line.encode()) + struct.calcsize(self.RING_BUFFER_LENGTH_FORMAT)
+            if record_size > slot_size:
+                self.sys_log("Record of " + str(record_size) + " bytes exceeds the ring buffer slot size " +
+                             str(slot_size) + " of file [" + self._file_name + "].")
+                self._logger.error("Record of " + str(record_size) + " bytes exceeds the ring buffer slot size " +
+                                   str(slot_size) + " of file [" + self._file_name + "].")
+                raise StorageWriteException("Record of " + str(record_size) + " bytes exceeds the ring buffer slot "
+                                            "size " + str(slot_size) + " of file [" + self._file_name + "]. Please "
+                                            "set a larger ring_buffer_slot_size for a new file.")
+
+    def _pack_ring_buffer_records(self, meta, lines_to_write):
+        records = []
+        for line in lines_to_write:
+            data = line.encode()
+            assert len(data) + struct.calcsize(self.RING_BUFFER_LENGTH_FORMAT) <= meta['slot_size']
+            records.append(struct.pack(self.RING_BUFFER_LENGTH_FORMAT, len(data)) + data)
+        return records
+
+    def _migrate_to_ring_buffer(self):
+        # the existing lines are converted to records in the order they were written, and only the latest ones that
+        # fit in the ring buffer are kept.
+        assert self._fixed_size > 0
+        self.sys_log("Migrating file [" + self._file_name + "] to the ring buffer.")
+        self._logger.info("Migrating file [" + self._file_name + "] to the ring buffer.")
+        with open(self._file_name, 'r') as infile:
+            lines = [line.strip() for line in infile.readlines()]
+        if (self._config['write_rule_type'] != WriteRuleType.WRITE_FROM_END) != self.is_reversed_layout():
+            lines = lines[::-1]
+        lines = lines[-self._fixed_size:]
+        meta = {
+            'capacity': self._fixed_size,
+            # the slots are made large enough for the existing lines.
+            'slot_size': max([self._config.get('ring_buffer_slot_size', self.RING_BUFFER_SLOT_SIZE)] +
+                             [len(line.encode()) + struct.calcsize(self.RING_BUFFER_LENGTH_FORMAT)
+                              for line in lines]),
+            'head': 0,
+            'tail': 0,
+            'count': 0,
+            'generation': 0,
+        }
+        records = self._pack_ring_buffer_records(meta=meta, lines_to_write=lines)
+        meta['count'] = len(records)
+        meta['head'] = len(records) % meta['capacity']
+        tmp_file_name = FileUtil.get_sidecar_file_name(file_name=self._file_name, suffix='tmp')
+        with open(tmp_file_name, 'wb') as outfile:
+            outfile.truncate(self._get_ring_buffer_slot_offset(meta=meta, index=meta['capacity']))
+            for index, record in enumerate(records):
+                os.pwrite(outfile.fileno(), record, self._get_ring_buffer_slot_offset(meta=meta, index=index))
+            self._write_ring_buffer_meta(fd=outfile.fileno(), meta=meta)
+            os.fsync(outfile.fileno())
+        os.replace(tmp_file_name, self._file_name)
+        FileUtil.remove_file(self._get_reversed_layout_file_name())
+
+    def _open_ring_buffer(self):
+        # needs to be called with the file lock held. Only the writes migrate the file to the ring buffer.
+        outfile = open(self._file_name, 'r+b')
+        meta = self._read_ring_buffer_meta(fd=outfile.fileno())
+        if meta is None:
+            outfile.close()
+            self._migrate_to_ring_buffer()
+            outfile = open(self._file_name, 'r+b')
+            meta = self._read_ring_buffer_meta(fd=outfile.fileno())
+        if meta['capacity'] != self._fixed_size:
+            self.sys_log("Using the existing capacity " + str(meta['capacity']) + " of the ring buffer [" +
+                         self._file_name + "] instead of " + str(self._fixed_size) + '.')
+            self._fixed_size = meta['capacity']
+        return outfile, meta
+
+    def _write_ring_buffer(self, lines_to_write):
+        with FileLockTool(self._file_name, read_mode=False):
+            outfile, meta = self._open_ring_buffer()
+            with outfile:
+                records = self._pack_ring_buffer_records(meta=meta, lines_to_write=lines_to_write[-meta['capacity']:])
+                num_overwritten = max(0, meta['count'] + len(records) - meta['capacity'])
+                if num_overwritten > 0:
+                    # drop the oldest records from the header before their slots are overwritten, so that a crash in
+                    # the middle never leaves the header pointing to a partially written slot.
+                    meta['tail'] = (meta['tail'] + num_overwritten) % meta['capacity']
+                    meta['count'] -= num_overwritten
+                    self._write_ring_buffer_meta(fd=outfile.fileno(), meta=meta)
+                for record in records:
+                    os.pwrite(outfile.fileno(), record,
+                              self._get_ring_buffer_slot_offset(meta=meta, index=meta['head']))
+                    meta['head'] = (meta['head'] + 1) % meta['capacity']
+                meta['count'] += len(records)
+                meta['generation'] += 1
+                self._write_ring_buffer_meta(fd=outfile.fileno(), meta=meta)
+                self._sync_file(outfile=outfile)
+
+    def _read_ring_buffer(self, num_line):
+        # the records are returned in the same order as the first lines of the text file: the latest records first
+        # for WRITE_FROM_BEGINNING, and the oldest kept records first for WRITE_FROM_END. The generation in the header
+        # changes with every write from any process, and the cached records are only used if it has not changed.
+        # Returns None if the file is not migrated to the ring buffer yet.
+        with FileLockTool(self._file_name, read_mode=True):
+            with open(self._file_name, 'rb') as infile:
+                meta = self._read_ring_buffer_meta(fd=infile.fileno())
+                if meta is None:
+                    return None
+                cache_key = (meta['generation'], self._config['write_rule_type'])
+                num_records = min(num_line, meta['count'])
+                if cache_key != self._ring_buffer_cache_key or len(self._ring_buffer_records) < num_records:
+                    self._ring_buffer_records = []
+                    for i in range(num_records):
+                        if self._config['write_rule_type'] == WriteRuleType.WRITE_FROM_END:
+                            index = (meta['tail'] + i) % meta['capacity']
+                        else:
+                            index = (meta['head'] - 1 - i) % meta['capacity']
+                        content = os.pread(infile.fileno(), meta['slot_size'],
+                                           self._get_ring_buffer_slot_offset(meta=meta, index=index))
+                        length = struct.unpack_from(self.RING_BUFFER_LENGTH_FORMAT, content)[0]
+                        self._ring_buffer_records.append(
+                            content[struct.calcsize(self.RING_BUFFER_LENGTH_FORMAT):
+                                    struct.calcsize(self.RING_BUFFER_LENGTH_FORMAT) + length].decode())
+                    self._ring_buffer_cache_key = cache_key
+        return self._ring_buffer_records[:num_line]
 
     def read(self, params=None):
         if not params:
@@ -44,35 +214,48 @@ class FixedSizeStorage(DefaultStorage):
                                      " will be omitted since it is not useful as an input argument in this function.")
                 self.sys_log(param + " will be omitted since it is not useful as an input argument in this function.")
 
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+        with self._read_lock():
+            if self._is_ring_buffer():
+                if params['num_line'] > self._fixed_size > 0:
+                    self._logger.error("Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
+                                       str(self._fixed_size) + '!')
+                    self.sys_log("Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
+                                 str(self._fixed_size) + '!')
+                    raise StorageExceedsFixedSizeException(
+                        "Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
+                        str(self._fixed_size) + '!')
+                try:
+                    result = self._read_ring_buffer(num_line=params['num_line'])
+                    if result is None:
+                        # the file is still a text file until it is written to.
+                        result = self._read_first_lines(num_line=params['num_line'])
+                    return result
+                except Exception as err:
+                    self.sys_log("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
+                    self._logger.error("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
+                    raise StorageReadException("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
 
-        self._reader_status = Status.RUNNING
+            self._pre_load_data()
 
-        self._pre_load_data()
-
-        if params['num_line'] <= self._fixed_size:
-            self._reader_status = Status.IDLE
-            return self._stored_data[:params['num_line']]
-        else:
-            if params['force_load']:
-                self.start_from_first_line()
-                self._stored_data = super(FixedSizeStorage, self).read(
-                    params={
-                        'num_line': params['num_line']
-                    }
-                )
-                self._reader_status = Status.IDLE
-                return self._stored_data
+            if params['num_line'] <= self._fixed_size:
+                return self._stored_data[:params['num_line']]
             else:
-                self._logger.error("Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
-                                   str(self._fixed_size) + '!')
-                self.sys_log("Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
-                             str(self._fixed_size) + '!')
-                raise StorageExceedsFixedSizeException(
-                    "Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
-                    str(self._fixed_size) + '!')
+                if params['force_load']:
+                    self.start_from_first_line()
+                    self._stored_data = super(FixedSizeStorage, self).read(
+                        params={
+                            'num_line': params['num_line']
+                        }
+                    )
+                    return self._stored_data
+                else:
+                    self._logger.error("Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
+                                       str(self._fixed_size) + '!')
+                    self.sys_log("Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
+                                 str(self._fixed_size) + '!')
+                    raise StorageExceedsFixedSizeException(
+                        "Failed to read size of " + str(params['num_line']) + ' . Exceeds ' +
+                        str(self._fixed_size) + '!')
 
     def write(self, data, params=None):
         if not isinstance(data, str):
@@ -91,37 +274,48 @@ class FixedSizeStorage(DefaultStorage):
                                      " will be omitted since it is not useful as an input argument in this function.")
                 self.sys_log(param + " will be omitted since it is not useful as an input argument in this function.")
 
-        while self._reader_status != Status.IDLE:
-            self.sys_log("Waiting for reader to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
-
-        self._writer_status = Status.RUNNING
-        self._pre_load_data()
+        with self._write_lock():
+            if not self._is_ring_buffer():
+                self._pre_load_data()
 
-        if not isinstance(data, str):
-            self.sys_log("Data is not str instance, joining them with preset delimiter.")
-            self._logger.error("Data is not str instance, joining them with preset delimiter.")
-            data_to_write = params['delimiter'].join([str(val) for val in data])
-        else:
-            data_to_write = data
-
-        try:
-            if self._config['write_rule_type'] == WriteRuleType.WRITE_FROM_END:
-                with FileLockTool(self._file_name, read_mode=False):
-                    with open(FileUtil.create_file_if_not_exist(file_name=self._file_name), 'a') as outfile:
-                        outfile.write(data_to_write + '\n')
+            if not isinstance(data, str):
+                self.sys_log("Data is not str instance, joining them with preset delimiter.")
+                self._logger.error("Data is not str instance, joining them with preset delimiter.")
+                data_to_write = params['delimiter'].join([str(val) for val in data])
             else:
-                with FileLockTool(self._file_name, read_mode=False):
-                    with open(FileUtil.create_file_if_not_exist(file_name=self._file_name), 'r+') as outfile:
-                        file_data = outfile.read()
-                        outfile.seek(0, 0)
-                        outfile.write(data_to_write + '\n' + file_data)
+                data_to_write = data
 
-                self._stored_data = [data_to_write] + self._stored_data[:-1]
+            if self._is_ring_buffer():
+                self._check_ring_buffer_records(lines_to_write=[data_to_write])
+            try:
+                if self._is_ring_buffer():
+                    self._write_ring_buffer(lines_to_write=[data_to_write])
+                    return
+                with FileLockTool(self._file_name, read_mode=False):
+                    self._write_lines(lines_to_write=[data_to_write])
+                if self._config['write_rule_type'] != WriteRuleType.WRITE_FROM_END:
+                    self._stored_data = [data_to_write] + self._stored_data[:-1]
 
-            self._writer_status = Status.IDLE
+            except Exception as err:
+                self.sys_log("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+                self._logger.error("Write to file [" + self._file_name + "] got exception " + str(err) + '.')
+                raise StorageWriteException("Write to file [" + self._file_name + "] got exception " + str(err) + '.')
 
-        except Exception as err:
-            self.sys_log("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
-            self._logger.error("Write to file [" + self._file_name + "] got exception " + str(err) + '.')
-            raise StorageWriteException("Write to file [" + self._file_name + "] got exception " + str(err) + '.')
+    def write_many(self, rows, delimiter=','):
+        with self._write_lock():
+            if self._is_ring_buffer():
+                lines_to_write = self._join_rows(rows=rows, delimiter=delimiter)
+                self._check_ring_buffer_records(lines_to_write=lines_to_write)
+                try:
+                    self._write_ring_buffer(lines_to_write=lines_to_write)
+                except Exception as err:
+                    self.sys_log("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
+                    self._logger.error("Write to file [" + self._file_name + "] got exception " + str(err) + '.')
+                    raise StorageWriteException("Write to file [" + self._file_name + "] got exception " +
+                                                str(err) + '.')
+                return
+            self._pre_load_data()
+            super().write_many(rows=rows, delimiter=delimiter)
+            if self._config['write_rule_type'] != WriteRuleType.WRITE_FROM_END and self._stored_data is not None:
+                lines_to_write = self._join_rows(rows=rows, delimiter=delimiter)
+                self._stored_data = (lines_to_write[::-1] + self._stored_data)[:len(self._stored_data)]
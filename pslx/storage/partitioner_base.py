@@ -1,17 +1,23 @@
+import bisect
+from concurrent import futures
 import datetime
-import time
+import functools
+import os
+import threading
+import zlib
 
 from pslx.core.exception import StorageReadException, StorageWriteException
 from pslx.core.node_base import OrderedNodeBase
 from pslx.core.tree_base import TreeBase
-from pslx.schema.enums_pb2 import StorageType, PartitionerStorageType, SortOrder, Status
+from pslx.schema.enums_pb2 import StorageType, PartitionerStorageType, SortOrder
 from pslx.storage.default_storage import DefaultStorage
 from pslx.storage.proto_table_storage import ProtoTableStorage
 from pslx.storage.storage_base import StorageBase
+from pslx.tool.filelock_tool import FileLockTool
 from pslx.util.env_util import EnvUtil
 from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
-from pslx.util.timezone_util import TimeSleepObj, TimezoneUtil
+from pslx.util.timezone_util import TimezoneUtil
 
 
 class PartitionerBase(StorageBase):
@@ -24,12 +30,30 @@ class PartitionerBase(StorageBase):
         PartitionerStorageType.HOURLY: 4,
         PartitionerStorageType.MINUTELY: 5,
     }
+    PARTITION_MANIFEST_HEADER = 'PSLX_PARTITION_MANIFEST'
+    PARTITION_MANIFEST_FILE_NAME = '.manifest'
+    PARTITION_COMPACTION_FILE_NAME = '.compaction'
+    PARTITION_COMPACTION_TMP_SUFFIX = 'compacting'
+    PARTITION_COMPACTED_FILE_NAME = '.compacted'
+    PARTITION_COMPACTED_HEADER = 'PSLX_PARTITION_COMPACTED'
+    PARTITION_SUMMARY_HEADER = 'PSLX_PARTITION_SUMMARY'
 
     def __init__(self, logger=None, max_capacity=EnvUtil.get_pslx_env_variable('PSLX_INTERNAL_CACHE')):
         super().__init__(logger=logger)
         self._file_tree = None
         self._max_capacity = int(max_capacity)
         self._underlying_storage = DefaultStorage(logger=logger)
+        self._manifest_generation = None
+        self._partitions = set()
+        self._leaf_partitions = []
+        self._partition_children = {}
+        self._write_partition_boundaries = {}
+        self._write_partition_dir = None
+        self._partition_summaries = {}
+        self._unsaved_summary_file_names = set()
+        self._compacted_partitions = []
+        self._compaction_thread = None
+        self._compaction_lock = threading.Lock()
 
     def get_partitioner_type(self):
         return self.PARTITIONER_TYPE
@@ -56,7 +80,9 @@ class PartitionerBase(StorageBase):
                 return
 
             node_name = node.get_node_name()
-            for child_node_name in sorted(FileUtil.list_dirs_in_dir(dir_name=node_name), reverse=from_scratch):
+            partition = node_name[len(dir_name):].rstrip('/')
+            for child_node_name in sorted([dir_name + child_partition + '/' for child_partition in
+                                           self._partition_children.get(partition, [])], reverse=from_scratch):
                 if from_scratch and self._file_tree.get_num_nodes() >= self._max_capacity > 0:
                     self.sys_log("Reach the max number of node: " + str(self._max_capacity) + '.')
                     return
@@ -92,22 +118,280 @@ class PartitionerBase(StorageBase):
 
                 _recursive_initialize_from_dir(node=child_node, max_recursion=max_recursion - 1)
 
-        from_scratch = False
+        from_scratch, is_stale = False, False
         dir_name = FileUtil.normalize_dir_name(dir_name=dir_name)
         FileUtil.create_dir_if_not_exist(dir_name=dir_name)
-        if not self._file_tree or self.is_updated() or force:
+        if not self._file_tree or force:
+            from_scratch = True
+        elif self.is_updated():
+            # a partition was removed from the disk, so the manifest is rebuilt as well.
+            from_scratch, is_stale = True, True
+
+        manifest = self._get_partitions(dir_name=dir_name, rescan=force or is_stale)
+        if manifest is None and not from_scratch:
+            self.sys_log("The manifest of dir [" + dir_name + "] is not changed.")
+            return
+        # the partitions changed, so the partition cached for the writes needs to be found again.
+        self._write_partition_boundaries = {}
+        self._write_partition_dir = None
+        if manifest is not None:
+            self._manifest_generation, partitions = manifest
+            self._partitions = set(partitions)
+            self._leaf_partitions = [partition for partition in partitions if partition.count('/') ==
+                                     self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE] - 1]
+            self._partition_children = {}
+            for partition in partitions:
+                self._partition_children.setdefault(partition.rpartition('/')[0], []).append(partition)
+            # the partitions merged by compact() are marked explicitly, so that an empty directory left by others
+            # above the full depth is not taken as a compacted partition.
+            self._compacted_partitions = [
+                partition for partition in partitions
+                if partition.count('/') < self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE] - 1 and
+                partition not in self._partition_children and FileUtil.does_file_exist(
+                    self._get_compacted_file_name(dir_name=FileUtil.join_paths_to_dir(root_dir=dir_name,
+                                                                                      base_name=partition)))
+            ]
+
+        if from_scratch:
             root_node = OrderedNodeBase(
                 node_name=FileUtil.normalize_dir_name(dir_name=dir_name)
             )
             self._file_tree = TreeBase(root=root_node, max_dict_size=self._max_capacity)
-            from_scratch = True
 
         _recursive_initialize_from_dir(
             node=self._file_tree.get_root_node(),
             max_recursion=self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]
         )
 
+    def _get_manifest_file_name(self, dir_name):
+        # the manifest is a hidden file in the root directory, which is skipped when the directory is listed.
+        return FileUtil.join_paths_to_file(root_dir=dir_name, base_name=self.PARTITION_MANIFEST_FILE_NAME)
+
+    def _scan_partitions(self, dir_name):
+        self.sys_log("Scanning the partitions in dir [" + dir_name + "].")
+        partitions = []
+
+        def _recursive_scan(node_name, max_recursion):
+            if max_recursion == 0:
+                return
+            for child_node_name in FileUtil.list_dirs_in_dir(dir_name=node_name):
+                if not child_node_name.replace(node_name, '').replace('/', '').isdigit():
+                    continue
+                partitions.append(child_node_name.replace(dir_name, '', 1).rstrip('/'))
+                _recursive_scan(node_name=child_node_name, max_recursion=max_recursion - 1)
+
+        _recursive_scan(node_name=dir_name, max_recursion=self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE])
+        return sorted(partitions)
+
+    def _read_manifest_head(self, infile):
+        if infile.readline().rstrip('\n') != self.PARTITION_MANIFEST_HEADER:
+            return None, None
+        try:
+            generation, checksum = [int(val) for val in infile.readline().split(',')]
+        except ValueError:
+            return None, None
+        return generation, checksum
+
+    def _load_manifest_generation(self, dir_name):
+        manifest_file_name = self._get_manifest_file_name(dir_name=dir_name)
+        if not FileUtil.does_file_exist(manifest_file_name):
+            return None
+        with open(manifest_file_name, 'r') as infile:
+            return self._read_manifest_head(infile=infile)[0]
+
+    def _load_manifest(self, dir_name):
+        manifest_file_name = self._get_manifest_file_name(dir_name=dir_name)
+        if not FileUtil.does_file_exist(manifest_file_name):
+            return None
+        with open(manifest_file_name, 'r') as infile:
+            generation, checksum = self._read_manifest_head(infile=infile)
+            if generation is None:
+                return None
+            partitions = infile.read().split()
+        if zlib.crc32('\n'.join(partitions).encode()) != checksum:
+            self.sys_log("Checksum mismatch in the manifest of dir [" + dir_name + "].")
+            self._logger.warning("Checksum mismatch in the manifest of dir [" + dir_name + "].")
+            return None
+        return generation, partitions
+
+    def _save_manifest(self, dir_name, generation, partitions):
+        manifest_file_name = self._get_manifest_file_name(dir_name=dir_name)
+        tmp_file_name = manifest_file_name + '.tmp'
+        content = '\n'.join(partitions)
+        with open(tmp_file_name, 'w') as outfile:
+            outfile.write(self.PARTITION_MANIFEST_HEADER + '\n' + str(generation) + ',' +
+                          str(zlib.crc32(content.encode())) + '\n' + content + '\n')
+        os.replace(tmp_file_name, manifest_file_name)
+
+    def _is_manifest_valid(self, dir_name, partitions):
+        # the oldest and the latest partitions in the manifest need to exist, which catches partitions removed from
+        # the disk (e.g. by a ttl cleaner) or a root directory replaced by a copy. The partitions in the middle are not
+        # checked here to keep the loading cheap, and a missing one is found once it is read (see
+        # _refresh_removed_partitions).
+        if not partitions:
+            return True
+        oldest_leaf_index = 0
+        while oldest_leaf_index < len(partitions) - 1 and \
+                partitions[oldest_leaf_index + 1].startswith(partitions[oldest_leaf_index] + '/'):
+            oldest_leaf_index += 1
+        for leaf in [partitions[oldest_leaf_index], partitions[-1]]:
+            if not FileUtil.does_dir_exist(dir_name=FileUtil.join_paths_to_dir(root_dir=dir_name, base_name=leaf)):
+                return False
+        return True
+
+    def _update_manifest(self, dir_name, new_partitions=(), rescan=False):
+        try:
+            with FileLockTool(self._get_manifest_file_name(dir_name=dir_name), read_mode=False):
+                manifest = self._load_manifest(dir_name=dir_name)
+                generation = manifest[0] if manifest else 0
+                if manifest and not rescan:
+                    partitions = sorted(set(manifest[1]) | set(new_partitions))
+                else:
+                    partitions = sorted(set(self._scan_partitions(dir_name=dir_name)) | set(new_partitions))
+                self._save_manifest(dir_name=dir_name, generation=generation + 1, partitions=partitions)
+                return generation + 1, partitions
+        except OSError as err:
+            # the partitioner still works without the manifest, e.g. on a read only file system.
+            self.sys_log("Failed to update the manifest of dir [" + dir_name + "]: " + str(err) + '.')
+            self._logger.warning("Failed to update the manifest of dir [" + dir_name + "]: " + str(err) + '.')
+            return None, self._scan_partitions(dir_name=dir_name)
+
+    def _get_partitions(self, dir_name, rescan=False):
+        # returns None if the manifest is not changed since it was loaded last time, which only needs to read the first
+        # two lines of the manifest.
+        if not rescan and self._manifest_generation is not None and \
+                self._load_manifest_generation(dir_name=dir_name) == self._manifest_generation:
+            return None
+        manifest = None if rescan else self._load_manifest(dir_name=dir_name)
+        if manifest is not None and not self._is_manifest_valid(dir_name=dir_name, partitions=manifest[1]):
+            self.sys_log("The manifest of dir [" + dir_name + "] is stale.")
+            rescan = True
+            manifest = None
+        if manifest is None:
+            manifest = self._update_manifest(dir_name=dir_name, rescan=rescan)
+        return manifest
+
+    def _get_summary_file_name(self, file_name):
+        return FileUtil.get_sidecar_file_name(file_name=file_name, suffix='summary')
+
+    def _load_partition_summary(self, file_name):
+        # returns None if the summary does not exist or the file is changed after the summary was saved, which is found
+        # by the size and the modified time of the file.
+        try:
+            file_stat = os.stat(file_name)
+        except OSError:
+            return None
+        summary = self._partition_summaries.get(file_name, None)
+        if summary is None:
+            try:
+                with open(self._get_summary_file_name(file_name=file_name), 'r') as infile:
+                    lines = infile.read().split('\n')
+            except OSError:
+                return None
+            if len(lines) != 5 or lines[0] != self.PARTITION_SUMMARY_HEADER or lines[4]:
+                return None
+            try:
+                num_entries, byte_size, modified_time = [int(item) for item in lines[1].split(',')]
+            except ValueError:
+                return None
+            summary = {
+                'min_key': lines[2] if num_entries > 0 and lines[2] else None,
+                'max_key': lines[3] if num_entries > 0 and lines[3] else None,
+                'num_entries': num_entries,
+                'byte_size': byte_size,
+                'modified_time': modified_time,
+            }
+        if summary['byte_size'] != file_stat.st_size or summary['modified_time'] != file_stat.st_mtime_ns:
+            self._partition_summaries.pop(file_name, None)
+            return None
+        self._partition_summaries[file_name] = summary
+        return summary
+
+    def _set_partition_summary(self, file_name, num_entries, min_key=None, max_key=None):
+        file_stat = os.stat(file_name)
+        self._partition_summaries[file_name] = {
+            'min_key': min_key,
+            'max_key': max_key,
+            'num_entries': num_entries,
+            'byte_size': file_stat.st_size,
+            'modified_time': file_stat.st_mtime_ns,
+        }
+        self._unsaved_summary_file_names.add(file_name)
+
+    def _save_partition_summaries(self, skipped_file_name=None):
+        # The summary of the file being written is kept in memory, and it is saved once the writes move to another file,
+        # so the writes do not pay for saving the summary every time. A summary not saved is rebuilt when it is needed by
+        # another partitioner.
+        for file_name in sorted(self._unsaved_summary_file_names):
+            if file_name == skipped_file_name:
+                continue
+            self._unsaved_summary_file_names.discard(file_name)
+            summary = self._partition_summaries.get(file_name, None)
+            if summary is None:
+                continue
+            try:
+                # A partially written summary misses the last line break and is taken as missing.
+                with open(self._get_summary_file_name(file_name=file_name), 'w') as outfile:
+                    outfile.write(self.PARTITION_SUMMARY_HEADER + '\n' + str(summary['num_entries']) + ',' +
+                                  str(summary['byte_size']) + ',' + str(summary['modified_time']) + '\n' +
+                                  (summary['min_key'] or '') + '\n' + (summary['max_key'] or '') + '\n')
+            except OSError as err:
+                # the partitioner still works without the summary, which only saves reading the files.
+                self.sys_log("Failed to save the summary of file [" + file_name + "]: " + str(err) + '.')
+
+    def _update_partition_summary(self, file_name, old_summary=None, num_new_lines=0):
+        # called after the underlying storage is written. The proto tables know their keys in memory, and the number of
+        # lines of the text files is counted incrementally from the summary before the write if it is still valid.
+        storage_type = self._underlying_storage.get_storage_type()
+        if storage_type not in [StorageType.PROTO_TABLE_STORAGE, StorageType.DEFAULT_STORAGE]:
+            return
+        try:
+            if storage_type == StorageType.PROTO_TABLE_STORAGE:
+                self._set_partition_summary(
+                    file_name=file_name,
+                    num_entries=self._underlying_storage.get_num_entries(),
+                    min_key=self._underlying_storage.first_key(),
+                    max_key=self._underlying_storage.last_key()
+                )
+            elif old_summary is not None:
+                self._set_partition_summary(file_name=file_name,
+                                            num_entries=old_summary['num_entries'] + num_new_lines)
+            else:
+                self._set_partition_summary(file_name=file_name, num_entries=self._count_lines(file_name=file_name))
+        except OSError as err:
+            self._partition_summaries.pop(file_name, None)
+            self.sys_log("Failed to update the summary of file [" + file_name + "]: " + str(err) + '.')
+        self._save_partition_summaries(skipped_file_name=file_name)
+
+    @staticmethod
+    def _count_lines(file_name):
+        num_lines, last_block = 0, b''
+        with open(file_name, 'rb') as infile:
+            for block in iter(functools.partial(infile.read, 64 * 1024), b''):
+                num_lines += block.count(b'\n')
+                last_block = block
+        if last_block and not last_block.endswith(b'\n'):
+            num_lines += 1
+        return num_lines
+
+    def _get_partition_summary(self, file_name):
+        summary = self._load_partition_summary(file_name=file_name)
+        if summary is None:
+            self.sys_log("Building the summary of file [" + file_name + "].")
+            if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+                storage = ProtoTableStorage()
+                storage.initialize_from_file(file_name=file_name)
+                self._set_partition_summary(file_name=file_name, num_entries=storage.get_num_entries(),
+                                            min_key=storage.first_key(), max_key=storage.last_key())
+            else:
+                self._set_partition_summary(file_name=file_name, num_entries=self._count_lines(file_name=file_name))
+            summary = self._partition_summaries[file_name]
+        if file_name in self._unsaved_summary_file_names:
+            self._save_partition_summaries()
+        return summary
+
     def set_config(self, config):
+        super().set_config(config=config)
         self._underlying_storage.set_config(config=config)
 
     def get_dir_name(self):
@@ -122,6 +406,10 @@ class PartitionerBase(StorageBase):
         else:
             return self._file_tree.get_num_nodes()
 
+    def _is_dir_empty(self, dir_name):
+        # the hidden files, e.g. the manifest in the root directory, are not counted.
+        return not FileUtil.list_dirs_in_dir(dir_name=dir_name) and not FileUtil.list_files_in_dir(dir_name=dir_name)
+
     def is_empty(self):
         if self.is_updated():
             self.sys_log("Tree updated, need force rebuilding the tree.")
@@ -130,11 +418,17 @@ class PartitionerBase(StorageBase):
 
         leftmost_leaf_name, rightmost_leaf_name = (self._file_tree.get_leftmost_leaf(),
                                                    self._file_tree.get_rightmost_leaf())
-        if FileUtil.is_dir_empty(dir_name=leftmost_leaf_name) and FileUtil.is_dir_empty(dir_name=rightmost_leaf_name):
+        if self._is_dir_empty(dir_name=leftmost_leaf_name) and self._is_dir_empty(dir_name=rightmost_leaf_name):
             return True
         else:
             return False
 
+    def _refresh_removed_partitions(self):
+        # a partition in the manifest was removed from the disk by others, so the directories are scanned again.
+        self.sys_log("Partitions in dir [" + self.get_dir_name() + "] are removed. Rescanning the partitions.")
+        self._logger.info("Partitions in dir [" + self.get_dir_name() + "] are removed. Rescanning the partitions.")
+        self.initialize_from_dir(dir_name=self.get_dir_name(), force=True)
+
     def is_updated(self):
         rightmost_leaf_name = self._file_tree.get_rightmost_leaf()
         if not FileUtil.does_dir_exist(dir_name=rightmost_leaf_name):
@@ -257,6 +551,46 @@ class PartitionerBase(StorageBase):
         else:
             return None
 
+    def _seek_partition(self, timestamp, is_floor):
+        self.initialize_from_dir(dir_name=self.get_dir_name())
+        dir_name = self._seek_partition_in_manifest(timestamp=timestamp, is_floor=is_floor)
+        if dir_name is not None and not FileUtil.does_dir_exist(dir_name=dir_name):
+            self._refresh_removed_partitions()
+            dir_name = self._seek_partition_in_manifest(timestamp=timestamp, is_floor=is_floor)
+        return dir_name
+
+    def _seek_partition_in_manifest(self, timestamp, is_floor):
+        partition = '/'.join(FileUtil.parse_timestamp_to_dir(
+            timestamp=self._get_partition_start_time(timestamp=timestamp)).split('/')[
+                             :self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]])
+        # a compacted partition holding the timestamp is both the floor and the ceiling. Otherwise the nearest ones
+        # are found by binary search in the sorted partitions, where a compacted partition sorts by its start.
+        compacted_partition = self._get_compacted_partition(partition=partition)
+        if compacted_partition is not None:
+            candidates = [compacted_partition]
+        elif is_floor:
+            candidates = [partitions[bisect.bisect_right(partitions, partition) - 1]
+                          for partitions in [self._leaf_partitions, self._compacted_partitions]
+                          if partitions and partitions[0] <= partition]
+        else:
+            candidates = [partitions[bisect.bisect_left(partitions, partition)]
+                          for partitions in [self._leaf_partitions, self._compacted_partitions]
+                          if partitions and partitions[-1] >= partition]
+        if not candidates:
+            return None
+        return FileUtil.join_paths_to_dir(
+            root_dir=self._file_tree.get_root_name(),
+            base_name=max(candidates) if is_floor else min(candidates)
+        )
+
+    def seek_floor(self, timestamp):
+        with self._read_lock():
+            return self._seek_partition(timestamp=timestamp, is_floor=True)
+
+    def seek_ceiling(self, timestamp):
+        with self._read_lock():
+            return self._seek_partition(timestamp=timestamp, is_floor=False)
+
     def _reinitialize_underlying_storage(self, file_base_name):
         file_name = FileUtil.join_paths_to_file(root_dir=self.get_latest_dir(), base_name=file_base_name)
         if not FileUtil.does_file_exist(file_name):
@@ -275,116 +609,571 @@ class PartitionerBase(StorageBase):
         if params and 'reinitialize_underlying_storage' in params:
             self._reinitialize_underlying_storage(file_base_name=file_base_name)
 
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+        with self._read_lock():
+            self.sys_log("Read from the latest partition.")
+            latest_dir = self.get_latest_dir()
+            if not latest_dir:
+                self.sys_log("Current partitioner is empty, cannot read anything.")
+                return []
 
-        self._reader_status = Status.RUNNING
-        self.sys_log("Read from the latest partition.")
-        latest_dir = self.get_latest_dir()
-        if not latest_dir:
-            self.sys_log("Current partitioner is empty, cannot read anything.")
-            return []
+            file_name = FileUtil.join_paths_to_file(root_dir=latest_dir, base_name=file_base_name)
+            if not FileUtil.does_file_exist(file_name):
+                self.sys_log("The file [" + file_name + "] to read does not exist.")
+                raise StorageReadException("The file [" + file_name + "] to read does not exist.")
 
-        file_name = FileUtil.join_paths_to_file(root_dir=latest_dir, base_name=file_base_name)
-        if not FileUtil.does_file_exist(file_name):
-            self.sys_log("The file [" + file_name + "] to read does not exist.")
-            raise StorageReadException("The file [" + file_name + "] to read does not exist.")
+            if file_name != self._underlying_storage.get_file_name():
+                self.sys_log("Sync to the latest file to " + file_name)
+                self._underlying_storage.initialize_from_file(file_name=file_name)
+            try:
+                result = self._underlying_storage.read(params=params)
+                return result
+            except Exception as err:
+                self.sys_log("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                raise StorageReadException("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+
+    def _read_partition_file(self, file_name, start_key=None, end_key=None, start_partition=None,
+                             end_partition=None):
+        # a compacted file is filtered to the entries coming from the partitions in [start_partition, end_partition],
+        # so that reading a compacted partition returns the same as reading the partitions it merged.
+        content = self._read_partition_file_content(file_name=file_name, start_key=start_key, end_key=end_key)
+        if start_partition is not None and self._get_file_partition(file_name=file_name).count('/') < \
+                self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE] - 1:
+            content = self._filter_compacted_content(file_name=file_name, content=content,
+                                                     start_partition=start_partition, end_partition=end_partition)
+        return content
+
+    def _read_partition_file_content(self, file_name, start_key=None, end_key=None):
+        if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+            if start_key is not None or end_key is not None:
+                # the file is not opened if the keys in its summary are all outside of [start_key, end_key].
+                summary = self._load_partition_summary(file_name=file_name)
+                if summary is not None and (summary['num_entries'] == 0 or
+                                            (end_key is not None and summary['min_key'] > end_key) or
+                                            (start_key is not None and summary['max_key'] < start_key)):
+                    return {}
+            storage = ProtoTableStorage()
+            storage.initialize_from_file(file_name=file_name)
+            # the entries are streamed from the table, but the content of the file is returned as a whole. Only
+            # iter_range bounds the memory, to the largest file in the range.
+            return dict(storage.iter_items(start_key=start_key, end_key=end_key))
+        else:
+            storage = DefaultStorage()
+            storage.initialize_from_file(file_name=file_name)
+            return storage.read(params={
+                'num_line': -1
+            })
+
+    def _get_partition_start_time(self, timestamp, partitioner_type=None):
+        if partitioner_type is None:
+            partitioner_type = self.PARTITIONER_TYPE
+        if partitioner_type == PartitionerStorageType.YEARLY:
+            timestamp = timestamp.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0,
+                                          tzinfo=None)
+        elif partitioner_type == PartitionerStorageType.MONTHLY:
+            timestamp = timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        elif partitioner_type == PartitionerStorageType.DAILY:
+            timestamp = timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        elif partitioner_type == PartitionerStorageType.HOURLY:
+            timestamp = timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        else:
+            timestamp = timestamp.replace(second=0, microsecond=0, tzinfo=None)
+        return timestamp
+
+    def _get_partition_end_time(self, start_time, partitioner_type=None):
+        # the start time of the next partition, which is the exclusive end of the partition starting at start_time.
+        if partitioner_type is None:
+            partitioner_type = self.PARTITIONER_TYPE
+        if partitioner_type == PartitionerStorageType.YEARLY:
+            return start_time.replace(year=start_time.year + 1)
+        elif partitioner_type == PartitionerStorageType.MONTHLY:
+            if start_time.month == 12:
+                return start_time.replace(year=start_time.year + 1, month=1)
+            return start_time.replace(month=start_time.month + 1)
+        elif partitioner_type == PartitionerStorageType.DAILY:
+            return start_time + datetime.timedelta(days=1)
+        elif partitioner_type == PartitionerStorageType.HOURLY:
+            return start_time + datetime.timedelta(hours=1)
+        else:
+            return start_time + datetime.timedelta(minutes=1)
+
+    def _get_compacted_partition(self, partition):
+        # the compacted partition holding the given full depth partition, or None if it is not compacted.
+        partition_list = partition.split('/')
+        for index in range(1, len(partition_list)):
+            compacted_partition = '/'.join(partition_list[:index])
+            compacted_index = bisect.bisect_left(self._compacted_partitions, compacted_partition)
+            if compacted_index < len(self._compacted_partitions) and \
+                    self._compacted_partitions[compacted_index] == compacted_partition:
+                return compacted_partition
+        return None
+
+    def _get_full_depth_partition(self, timestamp):
+        return '/'.join(FileUtil.parse_timestamp_to_dir(timestamp=self._get_partition_start_time(
+            timestamp=timestamp)).split('/')[:self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]])
 
-        if file_name != self._underlying_storage.get_file_name():
-            self.sys_log("Sync to the latest file to " + file_name)
-            self._underlying_storage.initialize_from_file(file_name=file_name)
+    def _get_compacted_file_name(self, dir_name):
+        # the marker of a compacted partition, which also records the partition each merged entry comes from.
+        return FileUtil.join_paths_to_file(root_dir=dir_name, base_name=self.PARTITION_COMPACTED_FILE_NAME)
+
+    def _load_compacted_entries(self, dir_name):
+        # returns the (partition, base name, value) of the merged entries in a compacted directory, where the value
+        # is the number of lines for the text files and the key for the proto tables. The entries are in the order
+        # they are written to the compacted files.
         try:
-            result = self._underlying_storage.read(params=params)
-            self._reader_status = Status.IDLE
-            return result
-        except Exception as err:
-            self.sys_log("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
-            self._logger.error("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
-            raise StorageReadException("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            with open(self._get_compacted_file_name(dir_name=dir_name), 'r') as infile:
+                lines = infile.read().split('\n')
+        except OSError:
+            return []
+        if not lines or lines[0] != self.PARTITION_COMPACTED_HEADER:
+            return []
+        entries = []
+        for line in lines[1:]:
+            if line:
+                partition, base_name, value = line.split('\t', 2)
+                entries.append((partition, base_name, value.encode('ascii').decode('unicode_escape')))
+        return entries
 
-    def read_range(self, params):
+    def _save_compacted_entries(self, file_name, entries):
+        # the values are escaped, so that a key with tabs or newlines still takes a single line.
+        tmp_file_name = file_name + '.tmp'
+        with open(tmp_file_name, 'w') as outfile:
+            outfile.write(self.PARTITION_COMPACTED_HEADER + '\n' + ''.join(
+                partition + '\t' + base_name + '\t' + str(value).encode('unicode_escape').decode('ascii') + '\n'
+                for partition, base_name, value in entries))
+        os.replace(tmp_file_name, file_name)
+
+    def _get_file_partition(self, file_name):
+        return FileUtil.normalize_dir_name(dir_name=FileUtil.dir_name(file_name=file_name))[
+            len(self._file_tree.get_root_name()):].rstrip('/')
 
-        def _reformat_time(timestamp):
-            if self.PARTITIONER_TYPE == PartitionerStorageType.YEARLY:
-                timestamp = timestamp.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0,
-                                              tzinfo=None)
-            elif self.PARTITIONER_TYPE == PartitionerStorageType.MONTHLY:
-                timestamp = timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
-            elif self.PARTITIONER_TYPE == PartitionerStorageType.DAILY:
-                timestamp = timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
-            elif self.PARTITIONER_TYPE == PartitionerStorageType.HOURLY:
-                timestamp = timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    def _add_compacted_entries(self, dir_name, base_name, partition_records):
+        # the records written to a compacted file are recorded in its marker with their own partitions.
+        entries = []
+        for partition, records in partition_records:
+            if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+                entries += [(partition, base_name, key) for key, _ in records]
             else:
-                timestamp = timestamp.replace(second=0, microsecond=0, tzinfo=None)
-            return timestamp
+                entries.append((partition, base_name, len(records)))
+        compacted_file_name = self._get_compacted_file_name(dir_name=dir_name)
+        with FileLockTool(compacted_file_name, read_mode=False):
+            self._save_compacted_entries(file_name=compacted_file_name,
+                                         entries=self._load_compacted_entries(dir_name=dir_name) + entries)
 
-        assert 'start_time' in params and 'end_time' in params and params['start_time'] <= params['end_time']
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    @classmethod
+    def _is_partition_in_range(cls, partition, start_partition, end_partition):
+        # a coarser partition is in the range if it overlaps with the range.
+        return start_partition[:len(partition)] <= partition <= end_partition[:len(partition)]
 
-        self._reader_status = Status.RUNNING
+    def _filter_compacted_content(self, file_name, content, start_partition, end_partition):
+        # only the entries of a compacted file coming from the partitions in the range are kept. The entries not
+        # recorded in the marker are taken as coming from the compacted partition itself.
+        base_name = FileUtil.base_name(file_name=file_name)
+        entries = [(partition, value) for partition, entry_base_name, value in
+                   self._load_compacted_entries(dir_name=FileUtil.dir_name(file_name=file_name))
+                   if entry_base_name == base_name]
+        dir_partition = self._get_file_partition(file_name=file_name)
+        if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+            key_partitions = dict((value, partition) for partition, value in entries)
+            return {key: val for key, val in content.items() if self._is_partition_in_range(
+                partition=key_partitions.get(key, dir_partition), start_partition=start_partition,
+                end_partition=end_partition)}
+        result, offset = [], 0
+        for partition, value in entries + [(dir_partition, str(len(content)))]:
+            num_lines = int(value)
+            if self._is_partition_in_range(partition=partition, start_partition=start_partition,
+                                           end_partition=end_partition):
+                result += content[offset:offset + num_lines]
+            offset += num_lines
+        return result
 
+    def _get_range_file_names(self, start_time, end_time):
         oldest_dir, latest_dir = self.get_oldest_dir(), self.get_latest_dir()
         if not latest_dir or not oldest_dir:
             if self.is_empty():
                 self._logger.warning("Current partitioner [" + self.get_dir_name() +
                                      "] is empty, cannot read anything.")
                 self.sys_log("Current partitioner [" + self.get_dir_name() + "] is empty, cannot read anything.")
-                return {}
+                return []
 
         oldest_dir = oldest_dir.replace(self._file_tree.get_root_name(), '')
         latest_dir = latest_dir.replace(self._file_tree.get_root_name(), '')
 
         oldest_timestamp = FileUtil.parse_dir_to_timestamp(dir_name=oldest_dir)
         latest_timestamp = FileUtil.parse_dir_to_timestamp(dir_name=latest_dir)
-        start_time = max(_reformat_time(params['start_time']), oldest_timestamp)
-        end_time = min(_reformat_time(params['end_time']), latest_timestamp)
-        result = {}
-        try:
-            while start_time <= end_time:
-                dir_list = FileUtil.parse_timestamp_to_dir(timestamp=start_time).split('/')
-                dir_name = '/'.join(dir_list[:self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]])
-                dir_name = FileUtil.join_paths_to_dir(
-                    root_dir=self._file_tree.get_root_name(),
-                    base_name=dir_name
+        start_time = max(self._get_partition_start_time(timestamp=start_time), oldest_timestamp)
+        end_time = min(self._get_partition_start_time(timestamp=end_time), latest_timestamp)
+        # only the existing partitions within [start_time, end_time] are visited, found by binary search in the
+        # sorted partitions since the zero padded partition names sort the same way as their timestamps.
+        start_partition, end_partition = [
+            '/'.join(FileUtil.parse_timestamp_to_dir(timestamp=timestamp).split('/')[
+                     :self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]])
+            for timestamp in [start_time, end_time]
+        ]
+        partitions = self._leaf_partitions[bisect.bisect_left(self._leaf_partitions, start_partition):
+                                           bisect.bisect_right(self._leaf_partitions, end_partition)]
+        if self._compacted_partitions:
+            # a compacted partition sorts before the partitions it holds, so the one holding start_partition is found
+            # separately.
+            compacted_partitions = self._compacted_partitions[
+                bisect.bisect_left(self._compacted_partitions, start_partition):
+                bisect.bisect_right(self._compacted_partitions, end_partition)]
+            compacted_partition = self._get_compacted_partition(partition=start_partition)
+            if compacted_partition is not None:
+                compacted_partitions.append(compacted_partition)
+            partitions = sorted(set(partitions) | set(compacted_partitions))
+        file_names, is_stale = [], False
+        for partition in partitions:
+            dir_name = FileUtil.join_paths_to_dir(
+                root_dir=self._file_tree.get_root_name(),
+                base_name=partition
+            )
+            if FileUtil.does_dir_exist(dir_name=dir_name):
+                file_names += FileUtil.list_files_in_dir(dir_name=dir_name)
+            else:
+                is_stale = True
+        if is_stale:
+            self._refresh_removed_partitions()
+        return file_names
+
+    def read_range(self, params):
+        assert 'start_time' in params and 'end_time' in params and params['start_time'] <= params['end_time']
+        with self._read_lock():
+            try:
+                file_names = self._get_range_file_names(start_time=params['start_time'], end_time=params['end_time'])
+                read_file = functools.partial(
+                    self._read_partition_file,
+                    start_key=params.get('start_key', None),
+                    end_key=params.get('end_key', None),
+                    start_partition=self._get_full_depth_partition(timestamp=params['start_time']),
+                    end_partition=self._get_full_depth_partition(timestamp=params['end_time'])
                 )
-                if FileUtil.does_dir_exist(dir_name=dir_name):
-                    if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
-                        storage = ProtoTableStorage()
-                    else:
-                        storage = DefaultStorage()
-                    file_names = FileUtil.list_files_in_dir(dir_name=dir_name)
+                num_workers = int(params.get('num_workers', 1))
+                if num_workers > 1 and len(file_names) > 1:
+                    self.sys_log("Reading " + str(len(file_names)) + " files with " + str(num_workers) + " workers.")
+                    with futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+                        # map keeps the order of the files, so the result is the same as reading them one by one.
+                        contents = list(executor.map(read_file, file_names))
+                else:
+                    contents = [read_file(file_name) for file_name in file_names]
+                result = {}
+                for file_name, content in zip(file_names, contents):
+                    result[file_name] = content
+
+                return result
+            except Exception as err:
+                self.sys_log("Read range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
+                self._logger.error("Read range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
+                raise StorageReadException("Read range in dir [" + self.get_dir_name() + "] got exception " +
+                                           str(err) + '.')
+
+    def iter_range(self, start_time, end_time, order=SortOrder.ORDER, read_ahead=True, params=None):
+        # The files are listed under the read lock, but the lock is not held while the caller consumes the
+        # partitions, so that a slow consumer does not block the writers. At most the current partition and the
+        # one read ahead are kept in memory.
+        assert start_time <= end_time
+        if not params:
+            params = {}
+        with self._read_lock():
+            try:
+                file_names = self._get_range_file_names(start_time=start_time, end_time=end_time)
+            except Exception as err:
+                self.sys_log("Iterate range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
+                self._logger.error("Iterate range in dir [" + self.get_dir_name() + "] got exception " +
+                                   str(err) + '.')
+                raise StorageReadException("Iterate range in dir [" + self.get_dir_name() + "] got exception " +
+                                           str(err) + '.')
+        if order == SortOrder.REVERSE:
+            file_names.reverse()
+
+        def _read_file(file_name):
+            if not FileUtil.does_file_exist(file_name=file_name):
+                # the partition was removed after the files were listed.
+                return None
+            try:
+                return self._read_partition_file(
+                    file_name=file_name,
+                    start_key=params.get('start_key', None),
+                    end_key=params.get('end_key', None),
+                    start_partition=self._get_full_depth_partition(timestamp=start_time),
+                    end_partition=self._get_full_depth_partition(timestamp=end_time)
+                )
+            except Exception as err:
+                self.sys_log("Iterate range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
+                self._logger.error("Iterate range in dir [" + self.get_dir_name() + "] got exception " +
+                                   str(err) + '.')
+                raise StorageReadException("Iterate range in dir [" + self.get_dir_name() + "] got exception " +
+                                           str(err) + '.')
+
+        next_content = None
+        for index, file_name in enumerate(file_names):
+            if next_content is not None:
+                content = next_content.result()
+            else:
+                content = _read_file(file_name=file_name)
+            next_content = None
+            if read_ahead and index + 1 < len(file_names):
+                next_content = self._get_io_executor().submit(_read_file, file_name=file_names[index + 1])
+            if content is not None:
+                yield file_name, content
+
+    def get_range_summary(self, start_time, end_time):
+        # the summaries are read from the sidecar files, and the data files are only read if their summaries are
+        # missing or out of date.
+        assert start_time <= end_time
+        with self._read_lock():
+            try:
+                result = {}
+                for file_name in self._get_range_file_names(start_time=start_time, end_time=end_time):
+                    summary = self._get_partition_summary(file_name=file_name)
+                    result[file_name] = {
+                        'min_key': summary['min_key'],
+                        'max_key': summary['max_key'],
+                        'num_entries': summary['num_entries'],
+                        'byte_size': summary['byte_size'],
+                    }
+                return result
+            except Exception as err:
+                self.sys_log("Get range summary in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
+                self._logger.error("Get range summary in dir [" + self.get_dir_name() + "] got exception " +
+                                   str(err) + '.')
+                raise StorageReadException("Get range summary in dir [" + self.get_dir_name() + "] got exception " +
+                                           str(err) + '.')
+
+    def _get_compaction_file_name(self, dir_name):
+        # the journal of a compaction, a hidden file in the compacted directory listing the partitions to remove.
+        return FileUtil.join_paths_to_file(root_dir=dir_name, base_name=self.PARTITION_COMPACTION_FILE_NAME)
+
+    def _get_compaction_sources(self, partition):
+        # returns the partitions below the given partition, the files in them grouped by their base names in the order
+        # of the partitions, and the signatures of these files together with the files already in the partition.
+        root_dir = self._file_tree.get_root_name()
+        child_partitions, source_file_names, signatures = [], {}, {}
+        source_partitions = [partition]
+        while source_partitions:
+            source_partition = source_partitions.pop()
+            source_dir_name = FileUtil.join_paths_to_dir(root_dir=root_dir, base_name=source_partition)
+            if not FileUtil.does_dir_exist(dir_name=source_dir_name):
+                # the partition was removed from the disk after the manifest was loaded.
+                continue
+            if source_partition != partition:
+                child_partitions.append(source_partition)
+            for file_name in FileUtil.list_files_in_dir(dir_name=source_dir_name):
+                file_stat = os.stat(file_name)
+                signatures[file_name] = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+                if source_partition != partition:
+                    source_file_names.setdefault(FileUtil.base_name(file_name=file_name), []).append(file_name)
+            source_partitions += sorted(self._partition_children.get(source_partition, []), reverse=True)
+        return [child_partition for child_partition in child_partitions
+                if child_partition.rpartition('/')[0] == partition], source_file_names, signatures
+
+    def _merge_compaction_sources(self, partition, source_file_names):
+        # the files of the partitions are merged with the file already in the compacted directory into hidden temporary
+        # files, so that a failure in the middle leaves the partitions as they are. The marker of the merged entries
+        # is written the same way. Returns False if the proto tables share a key, since merging them would keep only
+        # one of the entries.
+        dir_name = FileUtil.join_paths_to_dir(root_dir=self._file_tree.get_root_name(), base_name=partition)
+        height = self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]
+        self._remove_compaction_tmp_files(partition=partition)
+        # the entries of the compacted files that are not merged again are kept in the marker.
+        entries = [entry for entry in self._load_compacted_entries(dir_name=dir_name)
+                   if entry[1] not in source_file_names]
+        try:
+            for base_name, file_names in source_file_names.items():
+                compacted_file_name = FileUtil.join_paths_to_file(root_dir=dir_name, base_name=base_name)
+                tmp_file_name = FileUtil.get_sidecar_file_name(file_name=compacted_file_name,
+                                                               suffix=self.PARTITION_COMPACTION_TMP_SUFFIX)
+                if FileUtil.does_file_exist(compacted_file_name):
+                    file_names = [compacted_file_name] + file_names
+                self.sys_log("Compacting " + str(len(file_names)) + " files to [" + compacted_file_name + "].")
+                if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+                    # the merged table is indexed, so that reading a few keys does not parse the whole table.
+                    compacted_storage = ProtoTableStorage()
+                    compacted_storage.set_config(config={
+                        'indexed': True,
+                    })
+                    compacted_storage.initialize_from_file(file_name=tmp_file_name)
+                    keys = set()
                     for file_name in file_names:
+                        storage = ProtoTableStorage()
                         storage.initialize_from_file(file_name=file_name)
-                        if storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
-                            result[file_name] = storage.read_all()
-                        else:
-                            result[file_name] = storage.read(params={
-                                'num_line': -1
-                            })
-
-                if self.PARTITIONER_TYPE == PartitionerStorageType.YEARLY:
-                    start_time = start_time.replace(year=start_time.year + 1, month=1, day=1)
-                elif self.PARTITIONER_TYPE == PartitionerStorageType.MONTHLY:
-                    if start_time.month == 12:
-                        start_time = start_time.replace(year=start_time.year + 1, month=1, day=1)
-                    else:
-                        start_time = start_time.replace(month=start_time.month + 1)
-                elif self.PARTITIONER_TYPE == PartitionerStorageType.DAILY:
-                    start_time += datetime.timedelta(days=1)
-                elif self.PARTITIONER_TYPE == PartitionerStorageType.HOURLY:
-                    start_time += datetime.timedelta(hours=1)
+                        data = storage.read_all()
+                        repeated_keys = keys & set(data.keys())
+                        if repeated_keys:
+                            self.sys_log("Key [" + min(repeated_keys) + "] of file [" + file_name + "] is repeated " +
+                                         "in partition [" + partition + "]. Skip compacting it.")
+                            self._logger.warning("Key [" + min(repeated_keys) + "] of file [" + file_name +
+                                                 "] is repeated in partition [" + partition +
+                                                 "]. Skip compacting it.")
+                            self._remove_compaction_tmp_files(partition=partition)
+                            return False
+                        keys |= set(data.keys())
+                        compacted_storage.write(data=data)
+                        file_partition = self._get_file_partition(file_name=file_name)
+                        key_partitions = {}
+                        if file_partition.count('/') < height - 1:
+                            key_partitions = dict(
+                                (value, entry_partition) for entry_partition, entry_base_name, value in
+                                self._load_compacted_entries(dir_name=FileUtil.dir_name(file_name=file_name))
+                                if entry_base_name == base_name)
+                        entries += [(key_partitions.get(key, file_partition), base_name, key) for key in sorted(data)]
                 else:
-                    start_time += datetime.timedelta(minutes=1)
+                    with open(tmp_file_name, 'wb') as outfile:
+                        for file_name in file_names:
+                            with open(file_name, 'rb') as infile:
+                                content = infile.read()
+                            outfile.write(content)
+                            num_lines = content.count(b'\n')
+                            if content and not content.endswith(b'\n'):
+                                outfile.write(b'\n')
+                                num_lines += 1
+                            file_partition = self._get_file_partition(file_name=file_name)
+                            if file_partition.count('/') < height - 1:
+                                # the lines of a compacted file keep the partitions recorded in its marker.
+                                for entry_partition, entry_base_name, value in self._load_compacted_entries(
+                                        dir_name=FileUtil.dir_name(file_name=file_name)):
+                                    if entry_base_name == base_name and num_lines > 0:
+                                        entries.append((entry_partition, base_name, min(int(value), num_lines)))
+                                        num_lines -= min(int(value), num_lines)
+                            if num_lines > 0:
+                                entries.append((file_partition, base_name, num_lines))
+            self._save_compacted_entries(
+                file_name=FileUtil.get_sidecar_file_name(file_name=self._get_compacted_file_name(dir_name=dir_name),
+                                                         suffix=self.PARTITION_COMPACTION_TMP_SUFFIX),
+                entries=entries
+            )
+        except Exception:
+            self._remove_compaction_tmp_files(partition=partition)
+            raise
+        return True
+
+    def _remove_compaction_tmp_files(self, partition):
+        # the temporary files left by a failed or skipped compaction are removed together with their index sidecars.
+        dir_name = FileUtil.join_paths_to_dir(root_dir=self._file_tree.get_root_name(), base_name=partition)
+        for item in os.listdir(dir_name):
+            if item.startswith('.') and item.endswith('.' + self.PARTITION_COMPACTION_TMP_SUFFIX):
+                tmp_file_name = FileUtil.join_paths_to_file(root_dir=dir_name, base_name=item)
+                FileUtil.remove_file(file_name=tmp_file_name)
+                FileUtil.remove_file(file_name=FileUtil.get_sidecar_file_name(file_name=tmp_file_name, suffix='idx'))
+
+    def _finish_compaction(self, partition, child_partitions=None):
+        # the journal is saved before the merged files replace the compacted files, and removed after the partitions
+        # below are removed, so that a compaction stopped in the middle is finished by the next one instead of merging
+        # the same partitions twice.
+        root_dir = self._file_tree.get_root_name()
+        dir_name = FileUtil.join_paths_to_dir(root_dir=root_dir, base_name=partition)
+        compaction_file_name = self._get_compaction_file_name(dir_name=dir_name)
+        if child_partitions is None:
+            self.sys_log("Finishing the compaction of partition [" + partition + "].")
+            with open(compaction_file_name, 'r') as infile:
+                child_partitions = infile.read().split()
+        else:
+            with open(compaction_file_name + '.tmp', 'w') as outfile:
+                outfile.write('\n'.join(child_partitions) + '\n')
+            os.replace(compaction_file_name + '.tmp', compaction_file_name)
+
+        tmp_suffix = '.' + self.PARTITION_COMPACTION_TMP_SUFFIX
+        for item in os.listdir(dir_name):
+            if item.startswith('.') and item.endswith(tmp_suffix):
+                tmp_file_name = FileUtil.join_paths_to_file(root_dir=dir_name, base_name=item)
+                compacted_file_name = FileUtil.join_paths_to_file(root_dir=dir_name,
+                                                                  base_name=item[1:-len(tmp_suffix)])
+                tmp_index_file_name = FileUtil.get_sidecar_file_name(file_name=tmp_file_name, suffix='idx')
+                os.replace(tmp_file_name, compacted_file_name)
+                if FileUtil.does_file_exist(tmp_index_file_name):
+                    os.replace(tmp_index_file_name,
+                               FileUtil.get_sidecar_file_name(file_name=compacted_file_name, suffix='idx'))
+        for child_partition in child_partitions:
+            FileUtil.remove_dir_recursively(dir_name=FileUtil.join_paths_to_dir(root_dir=root_dir,
+                                                                                base_name=child_partition))
+        FileUtil.remove_file(file_name=compaction_file_name)
+
+    def compact(self, partitioner_type=None, min_age=None):
+        if partitioner_type is None:
+            partitioner_type = self._config.get('compaction_partitioner_type', None)
+        if min_age is None:
+            min_age = self._config.get('compaction_min_age', datetime.timedelta(days=1))
+        assert partitioner_type is not None and self.PARTITIONER_TYPE_TO_HEIGHT_MAP[partitioner_type] < \
+            self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]
+        assert self._underlying_storage.get_storage_type() in [StorageType.PROTO_TABLE_STORAGE,
+                                                               StorageType.DEFAULT_STORAGE]
+
+        # The files are merged without holding the write lock. The partitions are only swapped for the merged files
+        # under the write lock afterwards, if none of the merged files was changed in the meantime.
+        with self._compaction_lock:
+            try:
+                with self._write_lock():
+                    root_dir = self._file_tree.get_root_name()
+                    self.initialize_from_dir(dir_name=root_dir)
+                    self._save_partition_summaries()
+                    if not self._leaf_partitions:
+                        return 0
+                    # the partitions are sealed once they end min_age before the latest partition, which does not
+                    # depend on the timezone the partitions are made in.
+                    end_time = FileUtil.parse_dir_to_timestamp(dir_name=self._leaf_partitions[-1]) - min_age
+                    height = self.PARTITIONER_TYPE_TO_HEIGHT_MAP[partitioner_type]
+                    num_finished, sources = 0, {}
+                    for partition in sorted(self._partitions):
+                        if partition.count('/') != height - 1:
+                            continue
+                        if FileUtil.does_file_exist(self._get_compaction_file_name(
+                                dir_name=FileUtil.join_paths_to_dir(root_dir=root_dir, base_name=partition))):
+                            self._finish_compaction(partition=partition)
+                            num_finished += 1
+                            continue
+                        if partition not in self._partition_children:
+                            continue
+                        start_time = FileUtil.parse_dir_to_timestamp(dir_name=partition)
+                        if self._get_partition_end_time(start_time=start_time, partitioner_type=partitioner_type) > \
+                                end_time:
+                            continue
+                        sources[partition] = self._get_compaction_sources(partition=partition)
+
+                merged_partitions = [partition for partition, (_, source_file_names, _) in sources.items()
+                                     if self._merge_compaction_sources(partition=partition,
+                                                                       source_file_names=source_file_names)]
+
+                with self._write_lock():
+                    self.initialize_from_dir(dir_name=root_dir)
+                    compacted_partitions = []
+                    for partition in merged_partitions:
+                        child_partitions, _, signatures = sources[partition]
+                        if self._get_compaction_sources(partition=partition)[2] != signatures:
+                            self.sys_log("Partition [" + partition + "] is written during the compaction. Skip it.")
+                            self._remove_compaction_tmp_files(partition=partition)
+                            continue
+                        self._finish_compaction(partition=partition, child_partitions=child_partitions)
+                        compacted_partitions.append(partition)
+
+                    if compacted_partitions or num_finished:
+                        self._logger.info("Compacted " + str(len(compacted_partitions)) + " partitions in dir [" +
+                                          root_dir + '].')
+                        self._update_manifest(dir_name=root_dir, rescan=True)
+                        self.initialize_from_dir(dir_name=root_dir, force=True)
+                    return len(compacted_partitions)
+            except Exception as err:
+                self.sys_log("Compact dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Compact dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Compact dir [" + self.get_dir_name() + "] got exception: " +
+                                            str(err) + '.')
 
-            self._reader_status = Status.IDLE
-            return result
+    def _compact_in_background(self):
+        # nobody joins the background thread, so the exceptions are logged here instead of being raised.
+        try:
+            self.compact()
         except Exception as err:
-            self.sys_log("Read range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
-            self._logger.error("Read range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
-            raise StorageReadException("Read range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
+            self.sys_log("Background compaction of dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            self._logger.error("Background compaction of dir [" + self.get_dir_name() + "] got exception: " +
+                               str(err) + '.')
+
+    def _maybe_compact(self):
+        if self._config.get('compaction_partitioner_type', None) is None:
+            return
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+        self.sys_log("Starting background compaction of dir [" + self.get_dir_name() + "].")
+        self._compaction_thread = threading.Thread(target=self._compact_in_background, daemon=True)
+        self._compaction_thread.start()
 
     def make_new_partition(self, timestamp):
         new_dir_list = FileUtil.parse_timestamp_to_dir(timestamp=timestamp).split('/')
@@ -395,13 +1184,19 @@ class PartitionerBase(StorageBase):
                 base_name=new_dir
             )
         )
+        new_partitions = ['/'.join(new_dir_list[:index + 1]) for index in range(len(new_dir.split('/')))]
         if FileUtil.does_dir_exist(dir_name=child_node.get_node_name()):
             self.sys_log('Node [' + child_node.get_node_name() + "] exist. Don't make new partition.")
+            if new_dir not in self._partitions:
+                # the partition was made without updating the manifest.
+                self._update_manifest(dir_name=self._file_tree.get_root_name(), new_partitions=new_partitions)
+                self.initialize_from_dir(dir_name=self._file_tree.get_root_name())
             return None
         else:
             self.sys_log('Node [' + child_node.get_node_name() + "] doesn't exist. Make new partition.")
             self._logger.info('Node [' + child_node.get_node_name() + "] doesn't exist. Make new partition.")
             FileUtil.create_dir_if_not_exist(dir_name=child_node.get_node_name())
+            self._update_manifest(dir_name=self._file_tree.get_root_name(), new_partitions=new_partitions)
             self.initialize_from_dir(dir_name=self._file_tree.get_root_name())
             return child_node.get_node_name()
 
@@ -419,39 +1214,236 @@ class PartitionerBase(StorageBase):
             file_base_name = params['base_name']
             params.pop('base_name', None)
 
-        while self._reader_status != Status.IDLE:
-            self.sys_log("Waiting for reader to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+        pending_write = {
+            'data': data,
+            'params': params,
+            'file_base_name': file_base_name,
+            'make_partition': to_make_partition,
+        }
+        if self._is_group_commit():
+            self._group_commit(pending_write=pending_write)
+        else:
+            pending_write['error'] = None
+            self._flush_pending_writes(batch=[pending_write])
+            if pending_write['error'] is not None:
+                raise pending_write['error']
+
+    def write_many(self, rows, delimiter=',', params=None):
+        assert self._underlying_storage.get_storage_type() != StorageType.PROTO_TABLE_STORAGE
+        to_make_partition = True
+        if params and 'make_partition' in params:
+            to_make_partition = params['make_partition']
+            params.pop('make_partition', None)
+
+        file_base_name = 'data'
+        if params and 'base_name' in params:
+            file_base_name = params['base_name']
+            params.pop('base_name', None)
+
+        # the rows are already a batch, so they are flushed right away without group commit.
+        pending_write = {
+            'rows': rows,
+            'delimiter': delimiter,
+            'params': params,
+            'file_base_name': file_base_name,
+            'make_partition': to_make_partition,
+            'error': None,
+        }
+        self._flush_pending_writes(batch=[pending_write])
+        if pending_write['error'] is not None:
+            raise pending_write['error']
+
+    def write_batch(self, records, timestamp_fn, delimiter=',', params=None):
+        # The records are grouped by the start time of their partitions in one pass, so that the directory of each
+        # partition is only resolved and written once.
+        if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+            file_base_name = 'data.pb'
+        else:
+            file_base_name = 'data'
+        if params and 'base_name' in params:
+            file_base_name = params['base_name']
+        overwrite = params['overwrite'] if params and 'overwrite' in params else True
+
+        partition_records = {}
+        for record in records:
+            start_time = self._get_partition_start_time(timestamp=timestamp_fn(record))
+            if start_time not in partition_records:
+                partition_records[start_time] = []
+            partition_records[start_time].append(record)
 
-        self._writer_status = Status.RUNNING
+        with self._write_lock():
+            root_dir = self._file_tree.get_root_name()
+            height = self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]
+            dir_records, compacted_dir_records, new_dirs, new_partitions = {}, {}, [], set()
+            for start_time in sorted(partition_records.keys()):
+                dir_list = FileUtil.parse_timestamp_to_dir(timestamp=start_time).split('/')[:height]
+                # the records of a compacted partition go to the compacted file instead of a new partition.
+                partition = self._get_compacted_partition(partition='/'.join(dir_list)) or '/'.join(dir_list)
+                dir_name = FileUtil.join_paths_to_dir(root_dir=root_dir, base_name=partition)
+                if dir_name not in dir_records:
+                    dir_records[dir_name] = []
+                    if partition not in self._partitions:
+                        new_dirs.append(dir_name)
+                        new_partitions.update('/'.join(dir_list[:index + 1]) for index in range(height))
+                dir_records[dir_name] += partition_records[start_time]
+                if partition != '/'.join(dir_list):
+                    compacted_dir_records.setdefault(dir_name, []).append(('/'.join(dir_list),
+                                                                           partition_records[start_time]))
 
-        if to_make_partition:
-            if not params or 'timezone' not in params or params['timezone'] == 'PST':
-                self.make_new_partition(timestamp=TimezoneUtil.cur_time_in_pst())
-            elif params['timezone'] == 'UTC':
-                self.make_new_partition(timestamp=TimezoneUtil.cur_time_in_utc())
-            elif params['timezone'] == 'EST':
-                self.make_new_partition(timestamp=TimezoneUtil.cur_time_in_est())
+            if new_partitions:
+                # the missing partitions are made together with a single update of the manifest.
+                self.sys_log("Making " + str(len(new_partitions)) + " new partitions in dir [" + root_dir + '].')
+                for dir_name in new_dirs:
+                    FileUtil.create_dir_if_not_exist(dir_name=dir_name)
+                self._update_manifest(dir_name=root_dir, new_partitions=sorted(new_partitions))
+                self.initialize_from_dir(dir_name=root_dir)
 
-        self.initialize_from_dir(dir_name=self._file_tree.get_root_name())
+            for dir_name, records in dir_records.items():
+                file_name = FileUtil.join_paths_to_file(root_dir=dir_name, base_name=file_base_name)
+                try:
+                    if file_name != self._underlying_storage.get_file_name():
+                        self._underlying_storage.initialize_from_file(file_name=file_name)
+                    old_summary = self._load_partition_summary(file_name=file_name)
+                    if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+                        self._underlying_storage.write_many(data_list=[dict(records)],
+                                                            params={'overwrite': overwrite})
+                    else:
+                        self._underlying_storage.write_many(rows=records, delimiter=delimiter)
+                    self._update_partition_summary(file_name=file_name, old_summary=old_summary,
+                                                   num_new_lines=len(records))
+                    if dir_name in compacted_dir_records:
+                        self._add_compacted_entries(dir_name=dir_name, base_name=file_base_name,
+                                                    partition_records=compacted_dir_records[dir_name])
+                except Exception as err:
+                    self.sys_log("Write batch to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                    self._logger.error("Write batch to dir [" + self.get_dir_name() + "] got exception: " +
+                                       str(err) + '.')
+                    raise StorageWriteException("Write batch to dir [" + self.get_dir_name() + "] got exception: " +
+                                                str(err) + '.')
+            self._save_partition_summaries()
 
-        file_name = FileUtil.join_paths_to_file(
-            root_dir=self._file_tree.get_leftmost_leaf(),
-            base_name=file_base_name)
+    def _flush_pending_writes(self, batch):
+        with self._write_lock():
+            timezones = set()
+            for pending_write in batch:
+                if pending_write['make_partition']:
+                    params = pending_write['params']
+                    timezones.add(params['timezone'] if params and 'timezone' in params else 'PST')
+            cur_times = {}
+            for timezone in sorted(timezones):
+                if timezone == 'PST':
+                    cur_times[timezone] = TimezoneUtil.cur_time_in_pst()
+                elif timezone == 'UTC':
+                    cur_times[timezone] = TimezoneUtil.cur_time_in_utc()
+                elif timezone == 'EST':
+                    cur_times[timezone] = TimezoneUtil.cur_time_in_est()
 
-        if file_name != self._underlying_storage.get_file_name():
-            self.sys_log("Sync to the latest file to " + file_name)
-            self._underlying_storage.initialize_from_file(
-                file_name=file_name
+            # the partition of the last writes is kept together with its time boundary, so that the directory and
+            # tree work is only done when the clock moves into a new partition. The writes without making partitions
+            # always sync to the latest partition.
+            is_cached = self._write_partition_dir is not None and len(timezones) == len(cur_times) > 0 and all(
+                timezone in self._write_partition_boundaries and
+                self._write_partition_boundaries[timezone][0] <= cur_time.replace(tzinfo=None) <
+                self._write_partition_boundaries[timezone][1]
+                for timezone, cur_time in cur_times.items()
             )
+            if not is_cached:
+                for timezone in sorted(cur_times.keys()):
+                    self.make_new_partition(timestamp=cur_times[timezone])
 
-        try:
-            self._underlying_storage.write(data=data, params=params)
-            self._writer_status = Status.IDLE
-        except Exception as err:
-            self.sys_log("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
-            self._logger.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
-            raise StorageWriteException("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                self.initialize_from_dir(dir_name=self._file_tree.get_root_name())
+                for timezone, cur_time in cur_times.items():
+                    start_time = self._get_partition_start_time(timestamp=cur_time)
+                    self._write_partition_boundaries[timezone] = (
+                        start_time, self._get_partition_end_time(start_time=start_time))
+                if self._write_partition_dir != self._file_tree.get_leftmost_leaf():
+                    # the writes moved to a new partition, so older partitions might be sealed now.
+                    self._maybe_compact()
+                self._write_partition_dir = self._file_tree.get_leftmost_leaf()
+
+            file_base_names = []
+            for pending_write in batch:
+                if pending_write['file_base_name'] not in file_base_names:
+                    file_base_names.append(pending_write['file_base_name'])
+
+            for file_base_name in file_base_names:
+                file_name = FileUtil.join_paths_to_file(
+                    root_dir=self._write_partition_dir,
+                    base_name=file_base_name)
+
+                if file_name != self._underlying_storage.get_file_name():
+                    self.sys_log("Sync to the latest file to " + file_name)
+                    self._underlying_storage.initialize_from_file(
+                        file_name=file_name
+                    )
+
+                file_pending_writes = [pending_write for pending_write in batch
+                                       if pending_write['file_base_name'] == file_base_name]
+                old_summary = self._load_partition_summary(file_name=file_name)
+                if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+                    # write to the proto table in one batch for each overwrite mode. The overwriting writes go first,
+                    # which gives the same result as writing one by one.
+                    errors, overwrites = [None] * len(file_pending_writes), []
+                    for pending_write in file_pending_writes:
+                        params = pending_write['params']
+                        overwrites.append(bool(params['overwrite']) if params and 'overwrite' in params else True)
+                    for overwrite in [True, False]:
+                        indices = [index for index in range(len(file_pending_writes))
+                                   if overwrites[index] == overwrite]
+                        if not indices:
+                            continue
+                        try:
+                            self._underlying_storage.write_many(
+                                data_list=[file_pending_writes[index]['data'] for index in indices],
+                                params={'overwrite': overwrite}
+                            )
+                        except Exception as err:
+                            for index in indices:
+                                errors[index] = err
+                else:
+                    # the rows of all the writes are joined with their own delimiters first, so that the file is
+                    # written once with the lines in the order of the writes.
+                    errors, lines, indices = [None] * len(file_pending_writes), [], []
+                    for index, pending_write in enumerate(file_pending_writes):
+                        try:
+                            if 'rows' in pending_write:
+                                rows, delimiter = pending_write['rows'], pending_write['delimiter']
+                            else:
+                                rows, delimiter, params = [pending_write['data']], ',', pending_write['params']
+                                if params and not isinstance(pending_write['data'], str):
+                                    assert isinstance(params, dict) and 'delimiter' in params
+                                    delimiter = params['delimiter']
+                            lines += [row if isinstance(row, str) else delimiter.join([str(val) for val in row])
+                                      for row in rows]
+                            indices.append(index)
+                        except Exception as err:
+                            errors[index] = err
+                    if indices:
+                        try:
+                            self._underlying_storage.write_many(rows=lines)
+                        except Exception as err:
+                            for index in indices:
+                                errors[index] = err
+
+                if any(err is not None for err in errors):
+                    old_summary = None
+                self._update_partition_summary(
+                    file_name=file_name,
+                    old_summary=old_summary,
+                    num_new_lines=sum(len(pending_write['rows']) if 'rows' in pending_write else 1
+                                      for pending_write in file_pending_writes)
+                )
+
+                for pending_write, err in zip(file_pending_writes, errors):
+                    if err is None:
+                        continue
+                    # the partition might be removed, so it is found again in the next write.
+                    self._write_partition_dir = None
+                    self.sys_log("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                    self._logger.error("Write to dir [" + self.get_dir_name() + "] got exception: " +
+                                       str(err) + '.')
+                    pending_write['error'] = StorageWriteException("Write to dir [" + self.get_dir_name() +
+                                                                   "] got exception: " + str(err) + '.')
 
     def print_self(self):
         # for debug only
@@ -1,10 +1,18 @@
-import time
+import bisect
+import mmap
+import os
+import struct
+import threading
+
+from google.protobuf.any_pb2 import Any
 
 from pslx.core.exception import StorageReadException, StorageWriteException, StorageDeleteException
-from pslx.schema.enums_pb2 import StorageType, Status
-from pslx.schema.storage_pb2 import ProtoTable
+from pslx.schema.enums_pb2 import StorageType
+from pslx.schema.storage_pb2 import ProtoTable, ProtoTableLogRecord, ProtoTableIndexRecord
 from pslx.storage.storage_base import StorageBase
 from pslx.tool.filelock_tool import FileLockTool
+from pslx.tool.lru_cache_tool import LRUCacheTool
+from pslx.util.env_util import EnvUtil
 from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 from pslx.util.timezone_util import TimezoneUtil, TimeSleepObj
@@ -12,12 +20,58 @@ from pslx.util.timezone_util import TimezoneUtil, TimeSleepObj
 
 class ProtoTableStorage(StorageBase):
     STORAGE_TYPE = StorageType.PROTO_TABLE_STORAGE
+    # The append-only layout is the header, followed by the length-delimited table metadata (a ProtoTable without
+    # data), followed by length-delimited ProtoTableLogRecord entries of puts and tombstones.
+    LOG_FORMAT_HEADER = b'PSLX_PROTO_TABLE_LOG\n'
+    # The index sidecar is the header and the inode of the indexed data file, followed by length-delimited
+    # ProtoTableIndexRecord entries pointing to the records in the data file.
+    INDEX_FORMAT_HEADER = b'PSLX_PROTO_TABLE_INDEX\n'
+    INDEX_INODE_FORMAT = '>Q'
+    LOG_RECORD_LENGTH_FORMAT = '>I'
+
+    # Process-wide cache of parsed tables, keyed by the absolute file path and validated by the file stat. Cached
+    # messages are shared by all the storages reading the same file, and are copied before being modified.
+    _parse_cache = LRUCacheTool(max_capacity=EnvUtil.get_pslx_env_variable('PSLX_INTERNAL_CACHE'))
+    _parse_cache_lock = threading.Lock()
+    _parse_cache_stats = {
+        'hit': 0,
+        'miss': 0,
+    }
 
     def __init__(self, logger=None):
         super().__init__(logger=logger)
         self._file_name = None
         self._table_message = None
-        self._deleter_status = Status.IDLE
+        self._config = {
+            'append_only': False,
+            'compaction_ratio': 0.5,
+            'compaction_min_records': 100,
+            'indexed': False,
+            'mmap_threshold': 1024 * 1024,
+            'group_commit': False,
+            'group_commit_window': TimeSleepObj.ONE_THOUSANDTH_SECOND * 5,
+            'group_commit_max_pending': 100,
+            'codec': None,
+        }
+        self._is_log_format = False
+        self._num_log_records = 0
+        self._compaction_thread = None
+        self._key_index = None
+        self._data_inode = None
+        self._index_lock = threading.Lock()
+        self._is_table_message_shared = False
+        self._sorted_keys = []
+
+    def set_config(self, config):
+        # the codec is checked here, so that a bad codec is not only found when the table is written.
+        if config.get('codec', None) and config['codec'] not in FileUtil.PROTO_CODECS:
+            self.sys_log("Codec [" + str(config['codec']) + "] is not supported. Valid codecs are [" +
+                         ', '.join(sorted(FileUtil.PROTO_CODECS)) + '].')
+            self._logger.error("Codec [" + str(config['codec']) + "] is not supported. Valid codecs are [" +
+                               ', '.join(sorted(FileUtil.PROTO_CODECS)) + '].')
+            raise StorageWriteException("Codec [" + str(config['codec']) + "] is not supported. Valid codecs are [" +
+                                        ', '.join(sorted(FileUtil.PROTO_CODECS)) + '].')
+        super().set_config(config=config)
 
     def initialize_from_dir(self, dir_name):
         self.sys_log("Initialize_from_dir function is not implemented for storage type "
@@ -29,126 +83,635 @@ class ProtoTableStorage(StorageBase):
             self.sys_log("Please use .pb extension for proto files.")
 
         self._file_name = FileUtil.create_file_if_not_exist(file_name=file_name)
-        if FileUtil.is_file_empty(file_name=self._file_name):
+        self._is_log_format = False
+        self._num_log_records = 0
+        self._key_index = None
+        self._is_table_message_shared = False
+        file_stat = os.stat(self._file_name)
+        if file_stat.st_size == 0:
             self._table_message = ProtoTable()
+        elif not self._config['indexed'] and self._load_from_parse_cache(file_stat=file_stat):
+            self.sys_log("Found file [" + self._file_name + "] in parse cache.")
+            return
         else:
             with FileLockTool(self._file_name, read_mode=True):
-                self._table_message = FileUtil.read_proto_from_file(
-                    proto_type=ProtoTable,
-                    file_name=self._file_name
-                )
+                if not self._is_log_file():
+                    self._table_message = FileUtil.read_proto_from_file(
+                        proto_type=ProtoTable,
+                        file_name=self._file_name
+                    )
+                elif self._config['indexed'] or FileUtil.does_file_exist(self._get_index_file_name()):
+                    self._table_message = self._read_log_metadata()
+                    self._load_index()
+                    self._is_log_format = True
+                else:
+                    self._table_message, self._num_log_records = self._replay_log()
+                    self._is_log_format = True
         if not self._table_message.table_path:
             self._table_message.table_path = self._file_name
         if not self._table_message.table_name:
             self._table_message.table_name = FileUtil.base_name(file_name=file_name)
         if not self._table_message.created_time:
             self._table_message.created_time = str(TimezoneUtil.cur_time_in_pst())
+        self._reset_sorted_keys()
+        if file_stat.st_size > 0 and not self.is_indexed():
+            self._save_to_parse_cache(file_stat=file_stat)
+
+    @classmethod
+    def _get_parse_cache_key(cls, file_name):
+        return os.path.abspath(file_name)
+
+    @classmethod
+    def _get_stat_signature(cls, file_stat):
+        return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+    def _load_from_parse_cache(self, file_stat):
+        with self._parse_cache_lock:
+            cached_value = self._parse_cache.get(key=self._get_parse_cache_key(file_name=self._file_name))
+            if not cached_value or cached_value[0] != self._get_stat_signature(file_stat=file_stat):
+                self._parse_cache_stats['miss'] += 1
+                return False
+            self._parse_cache_stats['hit'] += 1
+
+        _, self._table_message, self._sorted_keys, self._num_log_records, self._is_log_format = cached_value
+        self._is_table_message_shared = True
+        return True
+
+    def _save_to_parse_cache(self, file_stat):
+        with self._parse_cache_lock:
+            self._parse_cache.set(
+                key=self._get_parse_cache_key(file_name=self._file_name),
+                value=(self._get_stat_signature(file_stat=file_stat), self._table_message, self._sorted_keys,
+                       self._num_log_records, self._is_log_format)
+            )
+        self._is_table_message_shared = True
+
+    def _detach_table_message(self):
+        # Copy-on-write of the table message shared through the parse cache.
+        if self._is_table_message_shared:
+            table_message = ProtoTable()
+            table_message.CopyFrom(self._table_message)
+            self._table_message = table_message
+            self._sorted_keys = list(self._sorted_keys)
+            self._is_table_message_shared = False
+
+    @classmethod
+    def get_parse_cache_stats(cls):
+        with cls._parse_cache_lock:
+            return {
+                'hit': cls._parse_cache_stats['hit'],
+                'miss': cls._parse_cache_stats['miss'],
+                'size': cls._parse_cache.get_cur_capacity(),
+            }
+
+    def _reset_sorted_keys(self):
+        # The sorted keys persisted with the table are used if they still match the entries, so that loading a table
+        # does not need to sort the keys.
+        keys = self._key_index if self.is_indexed() else self._table_message.data
+        persisted_keys = list(self._table_message.sorted_keys)
+        self._table_message.ClearField('sorted_keys')
+        if (len(persisted_keys) == len(keys) and all(key in keys for key in persisted_keys) and
+                all(persisted_keys[i] < persisted_keys[i + 1] for i in range(len(persisted_keys) - 1))):
+            self._sorted_keys = persisted_keys
+        else:
+            self._sorted_keys = sorted(keys)
+
+    def _add_sorted_key(self, key):
+        index = bisect.bisect_left(self._sorted_keys, key)
+        if index == len(self._sorted_keys) or self._sorted_keys[index] != key:
+            self._sorted_keys.insert(index, key)
+
+    def _remove_sorted_key(self, key):
+        index = bisect.bisect_left(self._sorted_keys, key)
+        if index < len(self._sorted_keys) and self._sorted_keys[index] == key:
+            del self._sorted_keys[index]
+
+    def _write_table_message(self):
+        self._table_message.sorted_keys.extend(self._sorted_keys)
+        try:
+            FileUtil.write_proto_to_file(
+                proto=self._table_message,
+                file_name=self._file_name,
+                codec=self._config['codec']
+            )
+        finally:
+            self._table_message.ClearField('sorted_keys')
 
     def get_file_name(self):
         return self._file_name
 
     def get_num_entries(self):
+        if self.is_indexed():
+            return len(self._key_index)
         return len(self._table_message.data)
 
-    def read(self, params=None):
-        assert 'key' in params
+    def is_log_format(self):
+        return self._is_log_format
+
+    def is_indexed(self):
+        return self._key_index is not None
+
+    def _has_key(self, key):
+        if self.is_indexed():
+            return key in self._key_index
+        return key in self._table_message.data
+
+    def _get_index_file_name(self):
+        return FileUtil.get_sidecar_file_name(file_name=self._file_name, suffix='idx')
+
+    def _is_log_file(self):
+        with open(self._file_name, 'rb') as infile:
+            return infile.read(len(self.LOG_FORMAT_HEADER)) == self.LOG_FORMAT_HEADER
+
+    def _encode_log_record(self, record):
+        serialized_record = record.SerializeToString()
+        return struct.pack(self.LOG_RECORD_LENGTH_FORMAT, len(serialized_record)) + serialized_record
 
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    def _iter_log_payloads(self, content, start, base_offset=0):
+        # Yields the (offset, payload) of every complete length-delimited record in content, where offset is the
+        # position of the payload in the file that content is read from at base_offset.
+        length_size = struct.calcsize(self.LOG_RECORD_LENGTH_FORMAT)
+        offset = start
+        while offset + length_size <= len(content):
+            record_size = struct.unpack_from(self.LOG_RECORD_LENGTH_FORMAT, content, offset)[0]
+            if offset + length_size + record_size > len(content):
+                # A writer died in the middle of an append. The partial tail is dropped and will be removed by the
+                # next compaction.
+                self.sys_log("Found incomplete record at the end of file [" + self._file_name + '].')
+                break
+            yield base_offset + offset + length_size, content[offset + length_size:offset + length_size + record_size]
+            offset += length_size + record_size
+
+    def _replay_log(self):
+        table_message = ProtoTable()
+        num_records = 0
+        with open(self._file_name, 'rb') as infile:
+            content = memoryview(infile.read())
+
+        for index, (_, payload) in enumerate(self._iter_log_payloads(content=content,
+                                                                     start=len(self.LOG_FORMAT_HEADER))):
+            if index == 0:
+                table_message.ParseFromString(payload.tobytes())
+                continue
+            record = ProtoTableLogRecord()
+            record.ParseFromString(payload.tobytes())
+            num_records += 1
+            if record.is_deleted:
+                if record.key in table_message.data:
+                    del table_message.data[record.key]
+            else:
+                table_message.data[record.key].CopyFrom(record.value)
+        return table_message, num_records
+
+    def _read_log_metadata(self):
+        length_size = struct.calcsize(self.LOG_RECORD_LENGTH_FORMAT)
+        table_message = ProtoTable()
+        with open(self._file_name, 'rb') as infile:
+            infile.seek(len(self.LOG_FORMAT_HEADER))
+            length_bytes = infile.read(length_size)
+            if len(length_bytes) == length_size:
+                table_message.ParseFromString(
+                    infile.read(struct.unpack(self.LOG_RECORD_LENGTH_FORMAT, length_bytes)[0])
+                )
+        return table_message
+
+    def _write_log(self, table_message):
+        metadata = ProtoTable()
+        metadata.table_name = table_message.table_name
+        metadata.table_path = table_message.table_path
+        metadata.created_time = table_message.created_time
+        metadata.updated_time = table_message.updated_time
+        records = []
+        for key, val in self._iter_table_items(table_message=table_message):
+            record = ProtoTableLogRecord()
+            record.key = key
+            record.value.CopyFrom(val)
+            records.append(record)
+        records.sort(key=lambda log_record: log_record.key)
+        metadata.sorted_keys.extend([record.key for record in records])
+
+        tmp_file_name = FileUtil.get_sidecar_file_name(file_name=self._file_name, suffix='tmp')
+        with open(tmp_file_name, 'wb') as outfile:
+            outfile.write(self.LOG_FORMAT_HEADER)
+            outfile.write(self._encode_log_record(record=metadata))
+        with self._index_lock:
+            self._append_to_file(file_name=tmp_file_name, records=records)
+            os.replace(tmp_file_name, self._file_name)
+            self._is_log_format = True
+            self._num_log_records = len(records)
+            if self._config['indexed'] or self.is_indexed():
+                self._load_index()
+                self._table_message.ClearField('data')
+                self._reset_sorted_keys()
+
+    def _iter_table_items(self, table_message):
+        if table_message is self._table_message and self.is_indexed():
+            for key, val in self._read_indexed_values(keys=list(self._key_index.keys())).items():
+                yield key, val
+        else:
+            for key, val in table_message.data.items():
+                yield key, val
+
+    def _append_to_file(self, file_name, records):
+        # Returns the (offset, length) of the payload of each appended record.
+        length_size = struct.calcsize(self.LOG_RECORD_LENGTH_FORMAT)
+        positions = []
+        encoded_records = []
+        with open(file_name, 'ab') as outfile:
+            offset = outfile.tell()
+            for record in records:
+                encoded_record = self._encode_log_record(record=record)
+                positions.append((offset + length_size, len(encoded_record) - length_size))
+                encoded_records.append(encoded_record)
+                offset += len(encoded_record)
+            outfile.write(b''.join(encoded_records))
+        return positions
+
+    def _append_log_records(self, records):
+        positions = self._append_to_file(file_name=self._file_name, records=records)
+        self._num_log_records += len(records)
+        if self.is_indexed():
+            index_records = []
+            for record, (offset, length) in zip(records, positions):
+                index_record = ProtoTableIndexRecord()
+                index_record.key = record.key
+                index_record.offset = offset
+                index_record.length = length
+                index_record.is_deleted = record.is_deleted
+                index_records.append(index_record)
+                if record.is_deleted:
+                    self._key_index.pop(record.key, None)
+                else:
+                    self._key_index[record.key] = (offset, length)
+            self._append_to_file(file_name=self._get_index_file_name(), records=index_records)
+
+    def _load_index(self):
+        # Loads the key to (offset, length) index from the sidecar. The sidecar is rebuilt if it belongs to a different
+        # data file (e.g. the data file is compacted by another process), and extended if records were appended
+        # without updating it.
+        index_file_name = self._get_index_file_name()
+        data_stat = os.stat(self._file_name)
+        inode_offset = len(self.INDEX_FORMAT_HEADER)
+        records_offset = inode_offset + struct.calcsize(self.INDEX_INODE_FORMAT)
+        key_index, indexed_size, num_records = None, 0, 0
+        if FileUtil.does_file_exist(index_file_name):
+            with open(index_file_name, 'rb') as infile:
+                content = memoryview(infile.read())
+            if (content[:inode_offset].tobytes() == self.INDEX_FORMAT_HEADER and len(content) >= records_offset and
+                    struct.unpack_from(self.INDEX_INODE_FORMAT, content, inode_offset)[0] == data_stat.st_ino):
+                key_index = {}
+                for _, payload in self._iter_log_payloads(content=content, start=records_offset):
+                    index_record = ProtoTableIndexRecord()
+                    index_record.ParseFromString(payload.tobytes())
+                    num_records += 1
+                    if index_record.is_deleted:
+                        key_index.pop(index_record.key, None)
+                    else:
+                        key_index[index_record.key] = (index_record.offset, index_record.length)
+                    indexed_size = max(indexed_size, index_record.offset + index_record.length)
+
+        if key_index is None or indexed_size > data_stat.st_size:
+            self.sys_log("Rebuilding index of file [" + self._file_name + '].')
+            key_index, indexed_size, num_records = {}, 0, 0
+            with open(index_file_name, 'wb') as outfile:
+                outfile.write(self.INDEX_FORMAT_HEADER + struct.pack(self.INDEX_INODE_FORMAT, data_stat.st_ino))
+
+        if indexed_size < data_stat.st_size:
+            with open(self._file_name, 'rb') as infile:
+                infile.seek(indexed_size)
+                content = memoryview(infile.read())
+            start = len(self.LOG_FORMAT_HEADER) if indexed_size == 0 else 0
+            index_records = []
+            for offset, payload in self._iter_log_payloads(content=content, start=start, base_offset=indexed_size):
+                if indexed_size == 0 and offset == start + struct.calcsize(self.LOG_RECORD_LENGTH_FORMAT):
+                    # The first record of the data file is the table metadata.
+                    continue
+                record = ProtoTableLogRecord()
+                record.ParseFromString(payload.tobytes())
+                index_record = ProtoTableIndexRecord()
+                index_record.key = record.key
+                index_record.offset = offset
+                index_record.length = len(payload)
+                index_record.is_deleted = record.is_deleted
+                index_records.append(index_record)
+                if record.is_deleted:
+                    key_index.pop(record.key, None)
+                else:
+                    key_index[record.key] = (offset, len(payload))
+            self._append_to_file(file_name=index_file_name, records=index_records)
+            num_records += len(index_records)
+
+        self._key_index = key_index
+        self._num_log_records = num_records
+        self._data_inode = data_stat.st_ino
+
+    def _read_indexed_values(self, keys):
+        result = {}
+        with open(self._file_name, 'rb') as infile:
+            file_stat = os.fstat(infile.fileno())
+            if file_stat.st_ino != self._data_inode:
+                self.sys_log("File [" + self._file_name + "] is compacted by others. Reloading index.")
+                infile.close()
+                self._load_index()
+                self._reset_sorted_keys()
+                return self._read_indexed_values(keys=keys)
+
+            positions = sorted([(self._key_index[key], key) for key in keys if key in self._key_index])
+            if file_stat.st_size >= self._config['mmap_threshold']:
+                with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                    for (offset, length), key in positions:
+                        record = ProtoTableLogRecord()
+                        record.ParseFromString(mapped_file[offset:offset + length])
+                        result[key] = record.value
+            else:
+                for (offset, length), key in positions:
+                    infile.seek(offset)
+                    record = ProtoTableLogRecord()
+                    record.ParseFromString(infile.read(length))
+                    result[key] = record.value
+        return result
+
+    def _persist(self, records):
+        with FileLockTool(self._file_name, read_mode=False):
+            if self._is_log_format and self._is_log_file():
+                with self._index_lock:
+                    self._append_log_records(records=records)
+            elif self._config['append_only'] or self._config['indexed']:
+                self.sys_log("Converting file [" + self._file_name + "] to the append-only layout.")
+                self._write_log(table_message=self._table_message)
+            else:
+                self._is_log_format = False
+                self._write_table_message()
+        if self._is_log_format:
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._num_log_records < self._config['compaction_min_records']:
+            return
+        dead_ratio = 1 - 1.0 * self.get_num_entries() / self._num_log_records
+        if dead_ratio < self._config['compaction_ratio']:
+            return
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+        self.sys_log("Dead record ratio " + str(dead_ratio) + " of file [" + self._file_name +
+                     "] passes the threshold. Starting background compaction.")
+        self._compaction_thread = threading.Thread(target=self._compact_in_background, daemon=True)
+        self._compaction_thread.start()
+
+    def _compact_in_background(self):
+        # nobody joins the background thread, so the exceptions are logged here instead of being raised.
+        try:
+            self.compact()
+        except Exception as err:
+            self.sys_log("Background compaction of file [" + self.get_file_name() + "] got exception: " +
+                         str(err) + '.')
+            self._logger.error("Background compaction of file [" + self.get_file_name() + "] got exception: " +
+                               str(err) + '.')
+
+    def compact(self):
+        if not self._is_log_format:
+            self.sys_log("File [" + self._file_name + "] is not in the append-only layout. No need to compact.")
+            return
+        try:
+            with self._write_lock():
+                with FileLockTool(self._file_name, read_mode=False):
+                    # Replay from disk instead of using the in-memory table so that records appended by other
+                    # processes are kept.
+                    table_message, _ = self._replay_log()
+                    self._write_log(table_message=table_message)
+        except Exception as err:
+            self.sys_log("Compact file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+            self._logger.error("Compact file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+            raise StorageWriteException("Compact file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
 
-        while self._deleter_status != Status.IDLE:
-            self.sys_log("Waiting for deleter to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    def read(self, params=None):
+        assert 'key' in params
 
-        self._reader_status = Status.RUNNING
-        if params['key'] in self._table_message.data:
+        with self._read_lock():
+            if not self._has_key(params['key']):
+                return None
             try:
+                if self.is_indexed():
+                    with self._index_lock:
+                        any_message = self._read_indexed_values(keys=[params['key']])[params['key']]
+                else:
+                    any_message = self._table_message.data[params['key']]
                 if 'message_type' in params:
-                    result = ProtoUtil.any_to_message(
+                    return ProtoUtil.any_to_message(
                         message_type=params['message_type'],
-                        any_message=self._table_message.data[params['key']]
+                        any_message=any_message
                     )
                 else:
-                    result = self._table_message.data[params['key']]
-                self._reader_status = Status.IDLE
-                return result
+                    return any_message
             except Exception as err:
                 self.sys_log("Read file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
                 self._logger.error("Read file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
                 raise StorageReadException("Read file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-        else:
-            return None
 
     def read_all(self):
+        with self._read_lock():
+            try:
+                if self.is_indexed():
+                    with self._index_lock:
+                        return self._read_indexed_values(keys=list(self._key_index.keys()))
+                else:
+                    return dict(self._table_message.data)
+            except Exception as err:
+                self.sys_log("Read all got exception: " + str(err) + '.')
+                self._logger.error("Read all Got exception: " + str(err) + '.')
+                raise StorageReadException
 
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    def first_key(self):
+        return self._sorted_keys[0] if self._sorted_keys else None
 
-        while self._deleter_status != Status.IDLE:
-            self.sys_log("Waiting for deleter to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    def last_key(self):
+        return self._sorted_keys[-1] if self._sorted_keys else None
 
-        self._reader_status = Status.RUNNING
-        try:
-            self._reader_status = Status.IDLE
-            return dict(self._table_message.data)
-        except Exception as err:
-            self.sys_log("Read all got exception: " + str(err) + '.')
-            self._logger.error("Read all Got exception: " + str(err) + '.')
-            raise StorageReadException
+    def iter_keys(self, reverse=False):
+        if reverse:
+            return reversed(self._sorted_keys)
+        else:
+            return iter(self._sorted_keys)
 
-    def delete(self, key):
-        while self._reader_status != Status.IDLE:
-            self.sys_log("Waiting for reader to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    def read_key_range(self, start_key=None, end_key=None, message_type=None):
+        return dict(self.iter_items(message_type=message_type, start_key=start_key, end_key=end_key))
 
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    def iter_items(self, message_type=None, batch_size=1000, start_key=None, end_key=None):
+        # Keys are consumed in sorted order batch by batch, and each batch continues after the last yielded key, so
+        # that the table can still be modified between two batches.
+        last_key = None
+        while True:
+            with self._read_lock():
+                if last_key is not None:
+                    start_index = bisect.bisect_right(self._sorted_keys, last_key)
+                elif start_key is not None:
+                    start_index = bisect.bisect_left(self._sorted_keys, start_key)
+                else:
+                    start_index = 0
+                end_index = start_index + batch_size
+                if end_key is not None:
+                    end_index = min(end_index, bisect.bisect_right(self._sorted_keys, end_key))
+                keys = self._sorted_keys[start_index:end_index]
+                if not keys:
+                    return
+                try:
+                    if self.is_indexed():
+                        with self._index_lock:
+                            values = self._read_indexed_values(keys=keys)
+                    else:
+                        values = {key: self._table_message.data[key] for key in keys}
+                except Exception as err:
+                    self.sys_log("Iterate items of file [" + self.get_file_name() + "] got exception: " +
+                                 str(err) + '.')
+                    self._logger.error("Iterate items of file [" + self.get_file_name() + "] got exception: " +
+                                       str(err) + '.')
+                    raise StorageReadException("Iterate items of file [" + self.get_file_name() +
+                                               "] got exception: " + str(err) + '.')
 
-        if key in self._table_message.data:
-            self._deleter_status = Status.RUNNING
-            del self._table_message.data[key]
+            for key in keys:
+                if message_type:
+                    yield key, ProtoUtil.any_to_message(
+                        message_type=message_type,
+                        any_message=values[key]
+                    )
+                else:
+                    yield key, values[key]
+            last_key = keys[-1]
+
+    def delete(self, key):
+        with self._write_lock():
+            if not self._has_key(key):
+                return
+            self._detach_table_message()
+            self._remove_sorted_key(key=key)
+            if not self.is_indexed():
+                del self._table_message.data[key]
             try:
                 self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
-                with FileLockTool(self._file_name, read_mode=False):
-                    FileUtil.write_proto_to_file(
-                        proto=self._table_message,
-                        file_name=self._file_name
-                    )
-                    self._deleter_status = Status.IDLE
+                record = ProtoTableLogRecord()
+                record.key = key
+                record.is_deleted = True
+                self._persist(records=[record])
             except Exception as err:
                 self.sys_log("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
                 self._logger.error("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
                 raise StorageDeleteException("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
 
     def delete_all(self):
-        while self._reader_status != Status.IDLE:
-            self.sys_log("Waiting for reader to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
-
-        while self._writer_status != Status.IDLE:
-            self.sys_log("Waiting for writer to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
-        self._deleter_status = Status.RUNNING
-        all_keys = list(dict(self._table_message.data).keys())
-        for key in all_keys:
-            del self._table_message.data[key]
-        try:
-            self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
-            with FileLockTool(self._file_name, read_mode=False):
-                FileUtil.write_proto_to_file(
-                    proto=self._table_message,
-                    file_name=self._file_name
-                )
-                self._deleter_status = Status.IDLE
-        except Exception as err:
-            self.sys_log("Delete all of file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            self._logger.error("Delete all of file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            raise StorageDeleteException("Delete all of file [" + self.get_file_name() +
-                                         "] got exception: " + str(err) + '.')
+        with self._write_lock():
+            self._detach_table_message()
+            all_keys = list(dict(self._table_message.data).keys())
+            for key in all_keys:
+                del self._table_message.data[key]
+            if self.is_indexed():
+                self._key_index.clear()
+            self._sorted_keys = []
+            try:
+                self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
+                with FileLockTool(self._file_name, read_mode=False):
+                    if self._is_log_format or self._config['append_only'] or self._config['indexed']:
+                        self._write_log(table_message=self._table_message)
+                    else:
+                        self._write_table_message()
+            except Exception as err:
+                self.sys_log("Delete all of file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Delete all of file [" + self.get_file_name() + "] got exception: " +
+                                   str(err) + '.')
+                raise StorageDeleteException("Delete all of file [" + self.get_file_name() +
+                                             "] got exception: " + str(err) + '.')
+
+    def _apply_write(self, data, overwrite, written_keys):
+        # Convert all the values first so that a bad value does not leave the table half updated.
+        any_messages = []
+        for key, val in data.items():
+            if not overwrite and (self._has_key(key) or key in written_keys):
+                continue
+            if isinstance(val, Any):
+                # values read from another proto table are kept as they are instead of being packed again.
+                any_messages.append((key, val))
+            else:
+                any_messages.append((key, ProtoUtil.message_to_any(message=val)))
+
+        records = []
+        for key, any_message in any_messages:
+            self._add_sorted_key(key=key)
+            if not self.is_indexed():
+                self._table_message.data[key].CopyFrom(any_message)
+            record = ProtoTableLogRecord()
+            record.key = key
+            record.value.CopyFrom(any_message)
+            records.append(record)
+            written_keys.add(key)
+        return records
+
+    def _save_write_state(self, batch):
+        # the in-memory state a write changes is saved, so that it can be rolled back if the write is not persisted.
+        previous_values = {}
+        if not self.is_indexed():
+            for pending_write in batch:
+                for key in pending_write['data']:
+                    if key not in previous_values:
+                        previous_values[key] = None
+                        if key in self._table_message.data:
+                            previous_values[key] = Any()
+                            previous_values[key].CopyFrom(self._table_message.data[key])
+        return {
+            'previous_values': previous_values,
+            'sorted_keys': list(self._sorted_keys),
+            'key_index': dict(self._key_index) if self.is_indexed() else None,
+            'num_log_records': self._num_log_records,
+            'is_log_format': self._is_log_format,
+            'data_inode': self._data_inode,
+            'updated_time': self._table_message.updated_time,
+        }
+
+    def _restore_write_state(self, state):
+        for key, val in state['previous_values'].items():
+            if val is not None:
+                self._table_message.data[key].CopyFrom(val)
+            elif key in self._table_message.data:
+                del self._table_message.data[key]
+        self._sorted_keys = state['sorted_keys']
+        self._key_index = state['key_index']
+        self._num_log_records = state['num_log_records']
+        self._is_log_format = state['is_log_format']
+        self._data_inode = state['data_inode']
+        self._table_message.updated_time = state['updated_time']
+
+    def _flush_pending_writes(self, batch):
+        with self._write_lock():
+            self._detach_table_message()
+            state = self._save_write_state(batch=batch)
+            records, committed_writes, written_keys = [], [], set()
+            for pending_write in batch:
+                try:
+                    records.extend(self._apply_write(
+                        data=pending_write['data'],
+                        overwrite=pending_write['overwrite'],
+                        written_keys=written_keys
+                    ))
+                    committed_writes.append(pending_write)
+                except Exception as err:
+                    self.sys_log("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                    self._logger.error("Write to file [" + self.get_file_name() + "] got exception: " +
+                                       str(err) + '.')
+                    pending_write['error'] = StorageWriteException("Write to file [" + self.get_file_name() +
+                                                                   "] got exception: " + str(err) + '.')
+            if not committed_writes:
+                return
+            if self.get_num_entries() > 1000:
+                self.sys_log("Warning: the table content is too large, considering using Partitioner "
+                             "combined with proto table.")
+            try:
+                self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
+                self._persist(records=records)
+            except Exception as err:
+                self.sys_log("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                self._restore_write_state(state=state)
+                for pending_write in committed_writes:
+                    pending_write['error'] = StorageWriteException("Write to file [" + self.get_file_name() +
+                                                                   "] got exception: " + str(err) + '.')
 
     def write(self, data, params=None):
         if not params:
@@ -156,33 +719,31 @@ class ProtoTableStorage(StorageBase):
         if 'overwrite' not in params:
             params['overwrite'] = True
 
-        while self._reader_status != Status.IDLE:
-            self.sys_log("Waiting for reader to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+        assert isinstance(data, dict)
+        pending_write = {
+            'data': data,
+            'overwrite': params['overwrite'],
+        }
+        if self._is_group_commit():
+            self._group_commit(pending_write=pending_write)
+        else:
+            pending_write['error'] = None
+            self._flush_pending_writes(batch=[pending_write])
+            if pending_write['error'] is not None:
+                raise pending_write['error']
 
-        while self._deleter_status != Status.IDLE:
-            self.sys_log("Waiting for deleter to finish.")
-            time.sleep(TimeSleepObj.ONE_SECOND)
+    def write_many(self, data_list, params=None):
+        # the dictionaries are merged into a single write with the same result as writing them one by one, so that
+        # the batch is applied and persisted together, and still goes through group commit.
+        if not params:
+            params = {}
+        if 'overwrite' not in params:
+            params['overwrite'] = True
 
-        self._writer_status = Status.RUNNING
-        assert isinstance(data, dict)
-        try:
-            for key, val in data.items():
-                if not params['overwrite'] and key in self._table_message.data:
-                    continue
-                any_message = ProtoUtil.message_to_any(message=val)
-                self._table_message.data[key].CopyFrom(any_message)
-            if len(self._table_message.data) > 1000:
-                self.sys_log("Warning: the table content is too large, considering using Partitioner "
-                             "combined with proto table.")
-            self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
-            with FileLockTool(self._file_name, read_mode=False):
-                FileUtil.write_proto_to_file(
-                    proto=self._table_message,
-                    file_name=self._file_name
-                )
-                self._writer_status = Status.IDLE
-        except Exception as err:
-            self.sys_log("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            self._logger.error("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            raise StorageWriteException("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+        data = {}
+        for each_data in data_list:
+            assert isinstance(each_data, dict)
+            for key, val in each_data.items():
+                if params['overwrite'] or key not in data:
+                    data[key] = val
+        self.write(data=data, params=params)
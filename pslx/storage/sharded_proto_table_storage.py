@@ -0,0 +1,178 @@
+from concurrent import futures
+import heapq
+import os
+import re
+import threading
+import zlib
+
+from pslx.schema.enums_pb2 import StorageType
+from pslx.storage.proto_table_storage import ProtoTableStorage
+from pslx.storage.storage_base import StorageBase
+from pslx.util.file_util import FileUtil
+from pslx.util.proto_util import ProtoUtil
+
+
+class ShardedProtoTableStorage(StorageBase):
+    STORAGE_TYPE = StorageType.SHARDED_PROTO_TABLE_STORAGE
+    SHARD_FILE_PATTERN = re.compile(r'^shard-(\d{5})-of-(\d{5})\.pb$')
+
+    def __init__(self, logger=None, num_shard=16):
+        super().__init__(logger=logger)
+        assert num_shard > 0
+        self._dir_name = None
+        self._num_shard = num_shard
+        self._shards = []
+        self._shard_signatures = []
+        # guards the lazy loading of the shards, which also happens under the read lock.
+        self._shards_lock = threading.Lock()
+        self._config = {
+            'num_workers': 4,
+        }
+
+    def set_config(self, config):
+        super().set_config(config=config)
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            if shard is not None:
+                shard.set_config(config=config)
+
+    def initialize_from_file(self, file_name):
+        self.sys_log("Initialize_from_file function is not implemented for storage type "
+                     + ProtoUtil.get_name_by_value(enum_type=StorageType, value=self.STORAGE_TYPE) + '.')
+        return
+
+    def initialize_from_dir(self, dir_name):
+        self._dir_name = FileUtil.create_dir_if_not_exist(dir_name=dir_name)
+        num_shards = set()
+        for file_name in FileUtil.list_files_in_dir(dir_name=self._dir_name):
+            match = self.SHARD_FILE_PATTERN.match(FileUtil.base_name(file_name=file_name))
+            if match:
+                num_shards.add(int(match.group(2)))
+        if len(num_shards) > 1:
+            self.sys_log("Dir [" + self._dir_name + "] contains shards of different sizes: " + str(num_shards) + '.')
+            self._logger.warning("Dir [" + self._dir_name + "] contains shards of different sizes: " +
+                                 str(num_shards) + '.')
+        if num_shards:
+            num_shard = max(num_shards)
+            if num_shard != self._num_shard:
+                self.sys_log("Using the existing " + str(num_shard) + " shards in dir [" + self._dir_name +
+                             "] instead of " + str(self._num_shard) + '.')
+                self._num_shard = num_shard
+        # shards are only loaded when they are accessed.
+        with self._shards_lock:
+            self._shards = [None] * self._num_shard
+            self._shard_signatures = [None] * self._num_shard
+
+    def get_dir_name(self):
+        return self._dir_name
+
+    def get_num_shards(self):
+        return self._num_shard
+
+    def _get_shard_file_name(self, index):
+        return FileUtil.join_paths_to_file(
+            root_dir=self._dir_name,
+            base_name='shard-%05d-of-%05d.pb' % (index, self._num_shard)
+        )
+
+    def _get_shard_index(self, key):
+        # crc32 is stable across processes, unlike the builtin hash of strings.
+        return zlib.crc32(key.encode('utf-8')) % self._num_shard
+
+    def _get_shard_signature(self, index):
+        try:
+            file_stat = os.stat(self._get_shard_file_name(index=index))
+        except FileNotFoundError:
+            return None
+        return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+    def _is_shard_loaded(self, index):
+        # a shard is loaded again once its file is changed by others, e.g. another process writing to the table.
+        with self._shards_lock:
+            shard, signature = self._shards[index], self._shard_signatures[index]
+        return shard is not None and signature == self._get_shard_signature(index=index)
+
+    def _load_shard(self, index):
+        # the signature is taken before loading, so a change made during the loading is seen by the next access.
+        signature = self._get_shard_signature(index=index)
+        shard = ProtoTableStorage(logger=self._logger)
+        shard.set_config(config=self._config)
+        shard.initialize_from_file(file_name=self._get_shard_file_name(index=index))
+        with self._shards_lock:
+            self._shards[index] = shard
+            self._shard_signatures[index] = signature
+        return shard
+
+    def _update_shard_signature(self, index):
+        # called after the shard itself writes to its file, so that its own change does not trigger a reload.
+        signature = self._get_shard_signature(index=index)
+        with self._shards_lock:
+            self._shard_signatures[index] = signature
+
+    def _get_shard(self, index):
+        if not self._is_shard_loaded(index=index):
+            return self._load_shard(index=index)
+        with self._shards_lock:
+            return self._shards[index]
+
+    def _get_all_shards(self):
+        indices = [index for index in range(self._num_shard) if not self._is_shard_loaded(index=index)]
+        if len(indices) > 1 and self._config['num_workers'] > 1:
+            self.sys_log("Loading " + str(len(indices)) + " shards with " + str(self._config['num_workers']) +
+                         " workers.")
+            with futures.ThreadPoolExecutor(max_workers=self._config['num_workers']) as executor:
+                list(executor.map(self._load_shard, indices))
+        else:
+            for index in indices:
+                self._load_shard(index=index)
+        with self._shards_lock:
+            return list(self._shards)
+
+    def get_num_entries(self):
+        with self._read_lock():
+            return sum(shard.get_num_entries() for shard in self._get_all_shards())
+
+    def read(self, params=None):
+        assert 'key' in params
+        with self._read_lock():
+            return self._get_shard(index=self._get_shard_index(key=params['key'])).read(params=params)
+
+    def read_all(self):
+        with self._read_lock():
+            result = {}
+            for shard in self._get_all_shards():
+                result.update(shard.read_all())
+            return result
+
+    def iter_items(self, message_type=None, batch_size=1000, start_key=None, end_key=None):
+        with self._read_lock():
+            shards = self._get_all_shards()
+        # every shard yields its items in sorted key order, so merging them keeps the order across shards.
+        return heapq.merge(
+            *[shard.iter_items(message_type=message_type, batch_size=batch_size, start_key=start_key,
+                               end_key=end_key) for shard in shards],
+            key=lambda item: item[0]
+        )
+
+    def write(self, data, params=None):
+        assert isinstance(data, dict)
+        shard_data = {}
+        for key, val in data.items():
+            shard_data.setdefault(self._get_shard_index(key=key), {})[key] = val
+        with self._write_lock():
+            for index in sorted(shard_data):
+                self._get_shard(index=index).write(data=shard_data[index], params=dict(params) if params else None)
+                self._update_shard_signature(index=index)
+
+    def delete(self, key):
+        index = self._get_shard_index(key=key)
+        with self._write_lock():
+            self._get_shard(index=index).delete(key=key)
+            self._update_shard_signature(index=index)
+
+    def delete_all(self):
+        with self._write_lock():
+            for index, shard in enumerate(self._get_all_shards()):
+                shard.delete_all()
+                self._update_shard_signature(index=index)
@@ -1,10 +1,19 @@
+import asyncio
+from concurrent import futures
+import functools
+import threading
+
 from pslx.core.base import Base
-from pslx.schema.enums_pb2 import Status
+from pslx.tool.rw_lock_tool import RWLockTool
 from pslx.util.dummy_util import DummyUtil
+from pslx.util.env_util import EnvUtil
+from pslx.util.timezone_util import TimeSleepObj
 
 
 class StorageBase(Base):
     STORAGE_TYPE = None
+    _io_executor = None
+    _io_executor_lock = threading.Lock()
 
     def __init__(self, logger=None):
         super().__init__()
@@ -13,12 +22,59 @@ class StorageBase(Base):
         else:
             self._logger = logger
 
-        self._reader_status = Status.IDLE
-        self._writer_status = Status.IDLE
+        self._rw_lock = RWLockTool()
+        self._pending_writes = []
+        self._group_commit_condition = threading.Condition()
 
     def get_storage_type(self):
         return self.STORAGE_TYPE
 
+    def _read_lock(self):
+        return self._rw_lock.read_lock(timeout=self._config.get('lock_timeout', None))
+
+    def _write_lock(self):
+        return self._rw_lock.write_lock(timeout=self._config.get('lock_timeout', None))
+
+    def _is_group_commit(self):
+        return self._config.get('group_commit', False)
+
+    def _group_commit(self, pending_write):
+        # The first writer arriving at an empty queue becomes the leader. It waits for the commit window, or until
+        # enough writes are pending, and then flushes the whole batch at once on behalf of the other writers.
+        pending_write['error'] = None
+        pending_write['is_done'] = threading.Event()
+        max_pending = self._config.get('group_commit_max_pending', 100)
+        with self._group_commit_condition:
+            self._pending_writes.append(pending_write)
+            is_leader = len(self._pending_writes) == 1
+            if len(self._pending_writes) >= max_pending:
+                self._group_commit_condition.notify_all()
+
+        if is_leader:
+            with self._group_commit_condition:
+                self._group_commit_condition.wait_for(
+                    lambda: len(self._pending_writes) >= max_pending,
+                    timeout=self._config.get('group_commit_window', TimeSleepObj.ONE_THOUSANDTH_SECOND * 5)
+                )
+                batch, self._pending_writes = self._pending_writes, []
+            self.sys_log("Flushing " + str(len(batch)) + " pending writes together.")
+            try:
+                self._flush_pending_writes(batch=batch)
+            except Exception as err:
+                for each_pending_write in batch:
+                    if each_pending_write['error'] is None:
+                        each_pending_write['error'] = err
+            finally:
+                for each_pending_write in batch:
+                    each_pending_write['is_done'].set()
+
+        pending_write['is_done'].wait()
+        if pending_write['error'] is not None:
+            raise pending_write['error']
+
+    def _flush_pending_writes(self, batch):
+        raise NotImplementedError
+
     def initialize_from_file(self, file_name):
         raise NotImplementedError
 
@@ -30,3 +86,38 @@ class StorageBase(Base):
 
     def write(self, data, params=None):
         raise NotImplementedError
+
+    def read_range(self, params):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    @classmethod
+    def _get_io_executor(cls):
+        # one executor shared by all the storages so that the number of blocking io threads stays bounded.
+        with StorageBase._io_executor_lock:
+            if StorageBase._io_executor is None:
+                StorageBase._io_executor = futures.ThreadPoolExecutor(
+                    max_workers=int(EnvUtil.get_pslx_env_variable(var='PSLX_STORAGE_IO_WORKERS')),
+                    thread_name_prefix='pslx_storage_io'
+                )
+            return StorageBase._io_executor
+
+    async def _run_in_executor(self, func, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._get_io_executor(),
+            functools.partial(func, **kwargs)
+        )
+
+    async def aread(self, params=None):
+        return await self._run_in_executor(self.read, params=params)
+
+    async def awrite(self, data, params=None):
+        return await self._run_in_executor(self.write, data=data, params=params)
+
+    async def aread_range(self, params):
+        return await self._run_in_executor(self.read_range, params=params)
+
+    async def adelete(self, key):
+        return await self._run_in_executor(self.delete, key=key)
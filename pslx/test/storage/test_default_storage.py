@@ -1,12 +1,18 @@
+import asyncio
+import os
 from shutil import copyfile
+import struct
 import unittest
+from pslx.core.exception import StoragePastLineException
 from pslx.schema.enums_pb2 import ReadRuleType, WriteRuleType
 from pslx.storage.default_storage import DefaultStorage
+from pslx.util.file_util import FileUtil
 
 
 class DefaultStorageTest(unittest.TestCase):
     TEST_DATA_1 = "pslx/test/storage/test_data/test_default_storage_data.txt"
     TEST_DATA_2 = "pslx/test/storage/test_data/test_default_storage_data_2.txt"
+    TEST_DATA_3 = "pslx/test/storage/test_data/test_default_storage_data_3.txt"
 
     def test_initialize_from_file(self):
         default_storage = DefaultStorage()
@@ -32,6 +38,16 @@ class DefaultStorageTest(unittest.TestCase):
         })
         self.assertListEqual(data, ['1,2,3', '2,3,4'])
 
+    def test_read_zero_lines(self):
+        self.addCleanup(FileUtil.remove_file, self.TEST_DATA_3)
+        # a non-empty file and an empty file.
+        for file_name in [self.TEST_DATA_1, self.TEST_DATA_3]:
+            default_storage = DefaultStorage()
+            default_storage.initialize_from_file(file_name=file_name)
+            self.assertListEqual(default_storage.read(params={'num_line': 0}), [])
+        self.assertListEqual(default_storage.read(params={'num_line': 0}), [])
+        self.assertRaises(StoragePastLineException, default_storage.read)
+
     def test_read_from_end_1(self):
         default_storage = DefaultStorage()
         default_storage.initialize_from_file(file_name=self.TEST_DATA_1)
@@ -83,3 +99,196 @@ class DefaultStorageTest(unittest.TestCase):
         data = default_storage.read()
         copyfile(self.TEST_DATA_1, self.TEST_DATA_2)
         self.assertListEqual(data, ['3,4,5'])
+
+    def test_line_index(self):
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'line_index_threshold': 0,
+            }
+        )
+        for i in range(5):
+            default_storage.write(data=[i, i + 1])
+        self.assertListEqual(default_storage.read(params={'num_line': 2}), ['0,1', '1,2'])
+        self.assertTrue(FileUtil.does_file_exist(
+            FileUtil.get_sidecar_file_name(file_name=self.TEST_DATA_3, suffix='lineidx')))
+        default_storage.write(data=[5, 6])
+        self.assertListEqual(default_storage.read(params={'num_line': 4}), ['2,3', '3,4', '4,5', '5,6'])
+        self.assertRaises(StoragePastLineException, default_storage.read)
+
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'line_index_threshold': 0,
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+            }
+        )
+        self.assertListEqual(default_storage.read(), ['0,1'])
+        default_storage.write(data=[-1, 0])
+        default_storage.start_from_first_line()
+        self.assertListEqual(default_storage.read(params={'num_line': 2}), ['-1,0', '0,1'])
+        FileUtil.remove_file(FileUtil.get_sidecar_file_name(file_name=self.TEST_DATA_3, suffix='lineidx'))
+        FileUtil.remove_file(self.TEST_DATA_3)
+
+    def test_shared_line_index(self):
+        line_index_file_name = FileUtil.get_sidecar_file_name(file_name=self.TEST_DATA_3, suffix='lineidx')
+        self.addCleanup(FileUtil.remove_file, self.TEST_DATA_3)
+        self.addCleanup(FileUtil.remove_file, line_index_file_name)
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.write_many(rows=[[i, i + 1] for i in range(5)])
+        storages = []
+        for _ in range(2):
+            storage = DefaultStorage()
+            storage.initialize_from_file(file_name=self.TEST_DATA_3)
+            storage.set_config(
+                config={
+                    'line_index_threshold': 0,
+                }
+            )
+            self.assertListEqual(storage.read(), ['0,1'])
+            storages.append(storage)
+
+        default_storage.write_many(rows=[[5, 6], [6, 7]])
+        for storage in storages:
+            self.assertListEqual(storage.read(), ['1,2'])
+        self.assertEqual(storages[0]._get_num_saved_line_ends(), 7)
+
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'line_index_threshold': 0,
+            }
+        )
+        self.assertRaises(StoragePastLineException, default_storage.read, params={'num_line': 8})
+
+        # the offsets that are not strictly increasing are not loaded.
+        with open(line_index_file_name, 'r+b') as outfile:
+            outfile.seek(-8, os.SEEK_END)
+            outfile.write(struct.pack('>Q', 4))
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'line_index_threshold': 0,
+            }
+        )
+        self.assertEqual(default_storage.read(params={'num_line': 7})[-1], '6,7')
+
+    def test_read_from_end_3(self):
+        for block_size in [1, 2, 3, 1024]:
+            default_storage = DefaultStorage()
+            default_storage.REVERSE_READ_BLOCK_SIZE = block_size
+            default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+            default_storage.set_config(
+                config={
+                    'read_rule_type': ReadRuleType.READ_FROM_END,
+                }
+            )
+            for i in range(5):
+                default_storage.write(data=[i, i + 1])
+            self.assertListEqual(default_storage.read(params={'num_line': 2}), ['4,5', '3,4'])
+            self.assertListEqual(default_storage.read(params={'num_line': 3}), ['2,3', '1,2', '0,1'])
+            self.assertRaises(StoragePastLineException, default_storage.read)
+            FileUtil.remove_file(self.TEST_DATA_3)
+
+    def test_reversed_layout(self):
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        for i in range(3):
+            default_storage.write(data=[i, i + 1])
+        default_storage.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+                'reversed_layout': True,
+            }
+        )
+        default_storage.write(data=[-1, 0])
+        self.assertTrue(default_storage.is_reversed_layout())
+        with open(self.TEST_DATA_3, 'r') as infile:
+            self.assertEqual(infile.read(), '2,3\n1,2\n0,1\n-1,0\n')
+        self.assertListEqual(default_storage.read(params={'num_line': 2}), ['-1,0', '0,1'])
+
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'read_rule_type': ReadRuleType.READ_FROM_END,
+            }
+        )
+        self.assertListEqual(default_storage.read(params={'num_line': 2}), ['2,3', '1,2'])
+        default_storage.write(data=[3, 4])
+        default_storage.migrate_layout(is_reversed=False)
+        self.assertFalse(default_storage.is_reversed_layout())
+        with open(self.TEST_DATA_3, 'r') as infile:
+            self.assertEqual(infile.read(), '-1,0\n0,1\n1,2\n2,3\n3,4\n')
+        FileUtil.remove_file(self.TEST_DATA_3)
+
+    def test_write_many(self):
+        for fsync_policy in ['none', 'per_batch', 'per_interval']:
+            default_storage = DefaultStorage()
+            default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+            default_storage.set_config(
+                config={
+                    'fsync_policy': fsync_policy,
+                }
+            )
+            default_storage.write_many(rows=[[0, 1], '1,2', [2, 3]])
+            default_storage.write_many(rows=[[3, 4]], delimiter='|')
+            self.assertListEqual(default_storage.read(params={'num_line': 4}), ['0,1', '1,2', '2,3', '3|4'])
+            FileUtil.remove_file(self.TEST_DATA_3)
+
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+            }
+        )
+        default_storage.write(data=[0, 1])
+        default_storage.write_many(rows=[[1, 2], [2, 3]])
+        self.assertListEqual(default_storage.read(params={'num_line': 3}), ['2,3', '1,2', '0,1'])
+        FileUtil.remove_file(self.TEST_DATA_3)
+
+    def test_follow(self):
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.write_many(rows=[[0, 1], [1, 2]])
+        follower = default_storage.follow(poll_interval=0.001)
+        self.assertListEqual([next(follower), next(follower)], ['0,1', '1,2'])
+        self.assertEqual(default_storage.get_follow_offset(), 8)
+        with open(self.TEST_DATA_3, 'a') as outfile:
+            outfile.write('2,')
+        default_storage.write(data='3')
+        self.assertEqual(next(follower), '2,3')
+
+        # truncation
+        with open(self.TEST_DATA_3, 'w') as outfile:
+            outfile.write('3,4\n')
+        self.assertEqual(next(follower), '3,4')
+
+        # rotation
+        with open(self.TEST_DATA_3 + '.new', 'w') as outfile:
+            outfile.write('4,5\n')
+        default_storage.write(data=[5, 6])
+        os.replace(self.TEST_DATA_3 + '.new', self.TEST_DATA_3)
+        self.assertListEqual([next(follower), next(follower)], ['5,6', '4,5'])
+        offset = default_storage.get_follow_offset()
+        follower.close()
+
+        default_storage.write(data=[6, 7])
+        follower = default_storage.follow(poll_interval=0.001, from_offset=offset)
+        self.assertEqual(next(follower), '6,7')
+        follower.close()
+
+        async def _afollow():
+            async_follower = default_storage.afollow(poll_interval=0.001)
+            result = [await async_follower.__anext__(), await async_follower.__anext__()]
+            await async_follower.aclose()
+            return result
+
+        self.assertListEqual(asyncio.run(_afollow()), ['4,5', '6,7'])
+        FileUtil.remove_file(self.TEST_DATA_3)
@@ -1,12 +1,16 @@
+import os
 from shutil import copyfile
 import unittest
+from pslx.core.exception import StorageExceedsFixedSizeException, StorageWriteException
 from pslx.schema.enums_pb2 import WriteRuleType
 from pslx.storage.fixed_size_storage import FixedSizeStorage
+from pslx.util.file_util import FileUtil
 
 
 class DefaultStorageTest(unittest.TestCase):
     TEST_DATA_1 = "pslx/test/storage/test_data/test_default_storage_data.txt"
     TEST_DATA_2 = "pslx/test/storage/test_data/test_default_storage_data_2.txt"
+    TEST_DATA_3 = "pslx/test/storage/test_data/test_fixed_size_storage_data_3.txt"
 
     def test_read_from_end_1(self):
         fixed_size_storage = FixedSizeStorage(fixed_size=1)
@@ -85,3 +89,90 @@ class DefaultStorageTest(unittest.TestCase):
         )
         copyfile(self.TEST_DATA_1, self.TEST_DATA_2)
         self.assertListEqual(data, ['3,4,5', '1,2,3'])
+
+    def test_reversed_layout(self):
+        fixed_size_storage = FixedSizeStorage(fixed_size=2)
+        fixed_size_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        fixed_size_storage.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+                'reversed_layout': True,
+            }
+        )
+        for i in range(3):
+            fixed_size_storage.write(data=[i, i + 1])
+
+        fixed_size_storage = FixedSizeStorage(fixed_size=2)
+        fixed_size_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        self.assertListEqual(fixed_size_storage.read(params={'num_line': 2, 'force_load': False}), ['2,3', '1,2'])
+        self.assertListEqual(fixed_size_storage.read(params={'num_line': 3, 'force_load': True}),
+                             ['2,3', '1,2', '0,1'])
+        FileUtil.remove_file(FileUtil.get_sidecar_file_name(file_name=self.TEST_DATA_3, suffix='reversed'))
+        FileUtil.remove_file(self.TEST_DATA_3)
+
+    def test_write_many(self):
+        fixed_size_storage = FixedSizeStorage(fixed_size=2)
+        fixed_size_storage.initialize_from_file(file_name=self.TEST_DATA_2)
+        fixed_size_storage.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+            }
+        )
+        fixed_size_storage.write_many(rows=[[3, 4, 5], [4, 5, 6]])
+        data = fixed_size_storage.read(params={'num_line': 2, 'force_load': False})
+        copyfile(self.TEST_DATA_1, self.TEST_DATA_2)
+        self.assertListEqual(data, ['4,5,6', '3,4,5'])
+
+    def test_ring_buffer(self):
+        self.addCleanup(FileUtil.remove_file, self.TEST_DATA_3)
+        copyfile(self.TEST_DATA_1, self.TEST_DATA_3)
+        fixed_size_storage = FixedSizeStorage(fixed_size=3)
+        fixed_size_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        fixed_size_storage.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+                'ring_buffer': True,
+            }
+        )
+        self.assertListEqual(fixed_size_storage.read(params={'num_line': 2, 'force_load': False}),
+                             ['1,2,3', '2,3,4'])
+        # the file is only migrated by the writes.
+        with open(self.TEST_DATA_3, 'r') as infile:
+            self.assertEqual(infile.read(), '1,2,3\n2,3,4\n')
+        fixed_size_storage.write(data=[3, 4, 5])
+        fixed_size_storage.write_many(rows=[[4, 5, 6], [5, 6, 7]])
+        self.assertListEqual(fixed_size_storage.read(params={'num_line': 3, 'force_load': False}),
+                             ['5,6,7', '4,5,6', '3,4,5'])
+        self.assertRaises(StorageExceedsFixedSizeException, fixed_size_storage.read,
+                          params={'num_line': 4, 'force_load': True})
+
+        other_fixed_size_storage = FixedSizeStorage(fixed_size=3)
+        other_fixed_size_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        other_fixed_size_storage.set_config(
+            config={
+                'ring_buffer': True,
+            }
+        )
+        other_fixed_size_storage.write(data=[6, 7, 8])
+        self.assertListEqual(other_fixed_size_storage.read(params={'num_line': 2, 'force_load': False}),
+                             ['4,5,6', '5,6,7'])
+        self.assertListEqual(fixed_size_storage.read(params={'num_line': 1, 'force_load': False}), ['6,7,8'])
+        self.assertEqual(os.path.getsize(self.TEST_DATA_3), 64 + 3 * 256)
+        self.assertRaises(StorageWriteException, fixed_size_storage.write, data='a' * 256)
+        self.assertListEqual(fixed_size_storage.read(params={'num_line': 3, 'force_load': False}),
+                             ['6,7,8', '5,6,7', '4,5,6'])
+        FileUtil.remove_file(self.TEST_DATA_3)
+
+        # the slots are made large enough for the existing lines.
+        with open(self.TEST_DATA_3, 'w') as outfile:
+            outfile.write('a' * 300 + '\n')
+        fixed_size_storage = FixedSizeStorage(fixed_size=2)
+        fixed_size_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        fixed_size_storage.set_config(
+            config={
+                'ring_buffer': True,
+            }
+        )
+        fixed_size_storage.write(data='b')
+        self.assertListEqual(fixed_size_storage.read(params={'num_line': 2, 'force_load': False}), ['a' * 300, 'b'])
+        FileUtil.remove_file(self.TEST_DATA_3)
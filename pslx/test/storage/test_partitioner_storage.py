@@ -1,12 +1,20 @@
 import datetime
+import os
+import threading
 from shutil import copytree, rmtree
 import unittest
-from pslx.schema.enums_pb2 import WriteRuleType
+from pslx.core.exception import StorageWriteException
+from pslx.schema.enums_pb2 import PartitionerStorageType, SortOrder, WriteRuleType
 from pslx.schema.snapshots_pb2 import NodeSnapshot
+from pslx.storage.default_storage import DefaultStorage
 from pslx.storage.fixed_size_storage import FixedSizeStorage
+from pslx.storage.partitioner_base import PartitionerBase
 from pslx.storage.proto_table_storage import ProtoTableStorage
-from pslx.storage.partitioner_storage import YearlyPartitionerStorage, MonthlyPartitionerStorage
+from pslx.storage.partitioner_storage import YearlyPartitionerStorage, MonthlyPartitionerStorage, \
+    MinutelyPartitionerStorage
+from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
+from pslx.util.timezone_util import TimezoneUtil
 
 
 class PartitionerStorageTest(unittest.TestCase):
@@ -14,9 +22,19 @@ class PartitionerStorageTest(unittest.TestCase):
     YEARLY_PATITIONER_TEST_DATA_2 = "pslx/test/storage/test_data/yearly_partitioner_2/"
     YEARLY_PATITIONER_TEST_DATA_3 = "pslx/test/storage/test_data/yearly_partitioner_3/"
     YEARLY_PATITIONER_TEST_DATA_4 = "pslx/test/storage/test_data/yearly_partitioner_4/"
+    YEARLY_PATITIONER_TEST_DATA_6 = "pslx/test/storage/test_data/yearly_partitioner_6/"
     MONTHLY_PATITIONER_TEST_DATA = "pslx/test/storage/test_data/monthly_partitioner_1/"
     MONTHLY_PATITIONER_TEST_DATA_2 = "pslx/test/storage/test_data/monthly_partitioner_2/"
 
+    def tearDown(self):
+        rmtree(self.YEARLY_PATITIONER_TEST_DATA_6, ignore_errors=True)
+        # the manifests made in the root directories of the test data are removed.
+        for dir_name in [self.YEARLY_PATITIONER_TEST_DATA, self.YEARLY_PATITIONER_TEST_DATA_2,
+                         self.YEARLY_PATITIONER_TEST_DATA_3, self.YEARLY_PATITIONER_TEST_DATA_4,
+                         self.MONTHLY_PATITIONER_TEST_DATA, self.MONTHLY_PATITIONER_TEST_DATA_2]:
+            FileUtil.remove_file(FileUtil.join_paths_to_file(
+                root_dir=dir_name, base_name=YearlyPartitionerStorage.PARTITION_MANIFEST_FILE_NAME))
+
     def test_initialize_from_dir(self):
         partitioner = YearlyPartitionerStorage()
         partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA)
@@ -114,6 +132,38 @@ class PartitionerStorageTest(unittest.TestCase):
             self.YEARLY_PATITIONER_TEST_DATA_4 + '2020/data.pb': {'test': val},
         })
 
+    def test_read_range_3(self):
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_4)
+        proto_table_storage = ProtoTableStorage()
+        partitioner.set_underlying_storage(storage=proto_table_storage)
+        params = {
+            'start_time': datetime.datetime(2019, 1, 5),
+            'end_time': datetime.datetime(2020, 1, 5),
+        }
+        data = partitioner.read_range(params=params)
+        params['num_workers'] = 4
+        parallel_data = partitioner.read_range(params=params)
+        self.assertDictEqual(parallel_data, data)
+        self.assertListEqual(list(parallel_data.keys()), list(data.keys()))
+
+    def test_iter_range(self):
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_4)
+        proto_table_storage = ProtoTableStorage()
+        partitioner.set_underlying_storage(storage=proto_table_storage)
+        start_time, end_time = datetime.datetime(2019, 1, 5), datetime.datetime(2020, 1, 5)
+        data = partitioner.read_range(params={'start_time': start_time, 'end_time': end_time})
+        for read_ahead in [True, False]:
+            self.assertListEqual(
+                list(partitioner.iter_range(start_time=start_time, end_time=end_time, read_ahead=read_ahead)),
+                list(data.items())
+            )
+        self.assertListEqual(
+            list(partitioner.iter_range(start_time=start_time, end_time=end_time, order=SortOrder.REVERSE)),
+            list(reversed(list(data.items())))
+        )
+
     def test_write_1(self):
         partitioner = YearlyPartitionerStorage()
         partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA)
@@ -163,6 +213,349 @@ class PartitionerStorageTest(unittest.TestCase):
         rmtree(self.YEARLY_PATITIONER_TEST_DATA)
         copytree(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA)
 
+    def test_write_many(self):
+        copytree(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.write_many(rows=[[3, 4, 5], '4,5,6'], params={'make_partition': False})
+        data = partitioner.read(
+            params={
+                'num_line': 4,
+            }
+        )
+        self.assertListEqual(data, ['1,2,3', '2,3,4', '3,4,5', '4,5,6'])
+
+    def test_group_commit(self):
+        copytree(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.set_config(
+            config={
+                'group_commit': True,
+                'group_commit_max_pending': 4,
+            }
+        )
+        errors = []
+
+        def _write(data, params):
+            try:
+                partitioner.write(data=data, params=params)
+            except StorageWriteException:
+                errors.append(data)
+
+        threads = [threading.Thread(target=_write, args=([i, i], {'delimiter': '|', 'make_partition': False}))
+                   for i in range(3)]
+        threads.append(threading.Thread(target=_write, args=('5,5', {'make_partition': False})))
+        threads.append(threading.Thread(target=_write, args=([6, 6], {'make_partition': False, 'timezone': 'UTC'})))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertListEqual(errors, [[6, 6]])
+        self.assertListEqual(sorted(partitioner.read(params={'num_line': 6})),
+                             ['0|0', '1,2,3', '1|1', '2,3,4', '2|2', '5,5'])
+
+    def test_manifest(self):
+        copytree(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        other_partitioner = YearlyPartitionerStorage()
+        other_partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        self.assertEqual(partitioner._load_manifest(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6), (1, ['2020']))
+
+        partitioner.make_new_partition(timestamp=datetime.datetime(2021, 1, 1))
+        self.assertEqual(partitioner._load_manifest(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6),
+                         (2, ['2020', '2021']))
+        self.assertEqual(other_partitioner.get_latest_dir(), self.YEARLY_PATITIONER_TEST_DATA_6 + '2021/')
+
+        rmtree(self.YEARLY_PATITIONER_TEST_DATA_6 + '2021/')
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        latest_dir = partitioner.get_latest_dir()
+        manifest = partitioner._load_manifest(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+
+        for year in [2021, 2022]:
+            partitioner.make_new_partition(timestamp=datetime.datetime(year, 1, 1))
+        rmtree(self.YEARLY_PATITIONER_TEST_DATA_6 + '2021/')
+        seek_dir = partitioner.seek_ceiling(timestamp=datetime.datetime(2021, 6, 1))
+        rescanned_manifest = partitioner._load_manifest(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        file_names = os.listdir(self.YEARLY_PATITIONER_TEST_DATA_6)
+        self.assertEqual(latest_dir, self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/')
+        self.assertEqual(manifest, (3, ['2020']))
+        self.assertEqual(seek_dir, self.YEARLY_PATITIONER_TEST_DATA_6 + '2022/')
+        self.assertEqual(rescanned_manifest[1], ['2020', '2022'])
+        self.assertIn(YearlyPartitionerStorage.PARTITION_MANIFEST_FILE_NAME, file_names)
+
+    def test_write_partition_cache(self):
+        copytree(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.write(data=[3, 4, 5], params={'timezone': 'UTC', 'delimiter': ','})
+        cur_year = TimezoneUtil.cur_time_in_utc().year
+        self.assertEqual(partitioner._write_partition_dir, self.YEARLY_PATITIONER_TEST_DATA_6 + str(cur_year) + '/')
+        self.assertEqual(partitioner._write_partition_boundaries['UTC'],
+                         (datetime.datetime(cur_year, 1, 1), datetime.datetime(cur_year + 1, 1, 1)))
+
+        # within the same partition, the writes go to the cached partition without looking at the directory.
+        partitioner._write_partition_dir = self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/'
+        partitioner.write(data=[4, 5, 6], params={'timezone': 'UTC', 'delimiter': ','})
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/data')
+        self.assertListEqual(default_storage.read(params={'num_line': 3}), ['1,2,3', '2,3,4', '4,5,6'])
+
+        # once the clock crosses the boundary, the partition is found again.
+        partitioner._write_partition_boundaries['UTC'] = (datetime.datetime(2020, 1, 1),
+                                                          datetime.datetime(2021, 1, 1))
+        partitioner.write(data=[5, 6, 7], params={'timezone': 'UTC', 'delimiter': ','})
+        self.assertEqual(partitioner._write_partition_dir, self.YEARLY_PATITIONER_TEST_DATA_6 + str(cur_year) + '/')
+        data = partitioner.read(params={'num_line': 2})
+        self.assertListEqual(data, ['3,4,5', '5,6,7'])
+
+    def test_write_batch(self):
+        copytree(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        records = [[datetime.datetime(2018, 3, 1), 1], [datetime.datetime(2020, 1, 1), 2],
+                   [datetime.datetime(2018, 1, 1), 3]]
+        partitioner.write_batch(records=records, timestamp_fn=lambda record: record[0], delimiter='|')
+        self.assertEqual(partitioner._load_manifest(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)[1], ['2018', '2020'])
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.YEARLY_PATITIONER_TEST_DATA_6 + '2018/data')
+        self.assertListEqual(default_storage.read(params={'num_line': 2}),
+                             ['2018-03-01 00:00:00|1', '2018-01-01 00:00:00|3'])
+        self.assertListEqual(partitioner.read(params={'num_line': 3}), ['1,2,3', '2,3,4', '2020-01-01 00:00:00|2'])
+        rmtree(self.YEARLY_PATITIONER_TEST_DATA_6)
+
+        partitioner = MonthlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.set_underlying_storage(storage=ProtoTableStorage())
+        records = [(str(datetime.datetime(2020, month, 1)), NodeSnapshot(node_name=str(month))) for month in [1, 2, 2]]
+        partitioner.write_batch(records=records, timestamp_fn=lambda record: datetime.datetime.fromisoformat(record[0]))
+        data = partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1),
+            'end_time': datetime.datetime(2020, 2, 1),
+        })
+        self.assertListEqual(list(data.keys()), [self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/data.pb',
+                                                 self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/02/data.pb'])
+        self.assertListEqual([len(val) for val in data.values()], [1, 1])
+
+    def test_partition_summary(self):
+        partitioner = MonthlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.set_underlying_storage(storage=ProtoTableStorage())
+        records = [(str(datetime.datetime(2020, month, day)), NodeSnapshot(node_name=str(day)))
+                   for month in [1, 2] for day in [3, 1, 2]]
+        partitioner.write_batch(records=records, timestamp_fn=lambda record: datetime.datetime.fromisoformat(record[0]))
+        summary = partitioner.get_range_summary(start_time=datetime.datetime(2020, 1, 1),
+                                                end_time=datetime.datetime(2020, 2, 1))
+        file_name = self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/data.pb'
+        self.assertEqual(summary[file_name]['min_key'], '2020-01-01 00:00:00')
+        self.assertEqual(summary[file_name]['max_key'], '2020-01-03 00:00:00')
+        self.assertEqual(summary[file_name]['num_entries'], 3)
+        self.assertEqual(summary[file_name]['byte_size'], os.path.getsize(file_name))
+        data = partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1),
+            'end_time': datetime.datetime(2020, 2, 1),
+            'start_key': '2020-01-02 12:00:00',
+            'end_key': '2020-02-01 12:00:00',
+        })
+        self.assertListEqual([list(val.keys()) for val in data.values()],
+                             [['2020-01-03 00:00:00'], ['2020-02-01 00:00:00']])
+        rmtree(self.YEARLY_PATITIONER_TEST_DATA_6)
+
+        copytree(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.write_many(rows=[[3, 4, 5], [4, 5, 6]], params={'make_partition': False})
+        partitioner.write(data=[5, 6, 7], params={'make_partition': False, 'delimiter': ','})
+        file_name = self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/data'
+        summary = partitioner.get_range_summary(start_time=datetime.datetime(2020, 1, 1),
+                                                end_time=datetime.datetime(2020, 1, 1))
+        self.assertEqual(summary[file_name]['num_entries'], 5)
+        with open(file_name, 'a') as outfile:
+            outfile.write('6,7,8\n')
+        summary = partitioner.get_range_summary(start_time=datetime.datetime(2020, 1, 1),
+                                                end_time=datetime.datetime(2020, 1, 1))
+        self.assertEqual(summary[file_name]['num_entries'], 6)
+        self.assertIsNone(summary[file_name]['min_key'])
+
+    def test_compact(self):
+        partitioner = MinutelyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.set_underlying_storage(storage=ProtoTableStorage())
+        timestamps = [datetime.datetime(2020, 1, 1, hour, minute) for hour in [0, 1] for minute in [0, 1, 30]] + \
+                     [datetime.datetime(2020, 1, 2, 0, 0)]
+        records = [(str(timestamp), NodeSnapshot(node_name=str(timestamp))) for timestamp in timestamps]
+        partitioner.write_batch(records=records, timestamp_fn=lambda record: datetime.datetime.fromisoformat(record[0]))
+        params = {
+            'start_time': datetime.datetime(2020, 1, 1, 0, 1),
+            'end_time': datetime.datetime(2020, 1, 1, 1, 1),
+            'start_key': '2020-01-01 00:01:00',
+            'end_key': '2020-01-01 01:01:00',
+        }
+        data = {}
+        for val in partitioner.read_range(params=params).values():
+            data.update(val)
+
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.HOURLY,
+                                             min_age=datetime.timedelta(hours=1)), 2)
+        self.assertListEqual(partitioner._load_manifest(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)[1],
+                             ['2020', '2020/01', '2020/01/01', '2020/01/01/00', '2020/01/01/01', '2020/01/02',
+                              '2020/01/02/00', '2020/01/02/00/00'])
+        compacted_data = {}
+        for val in partitioner.read_range(params=params).values():
+            compacted_data.update(val)
+        self.assertDictEqual(compacted_data, data)
+        self.assertEqual(len(compacted_data), 4)
+        # the compacted files are filtered by the time range without the keys.
+        compacted_data = {}
+        for val in partitioner.read_range(params={'start_time': params['start_time'],
+                                                  'end_time': params['end_time']}).values():
+            compacted_data.update(val)
+        self.assertDictEqual(compacted_data, data)
+
+        # a late record of a compacted partition goes to the compacted file.
+        partitioner.write_batch(records=[('2020-01-01 00:02:00', NodeSnapshot())],
+                                timestamp_fn=lambda record: datetime.datetime.fromisoformat(record[0]))
+        self.assertFalse(FileUtil.does_dir_exist(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/02/'))
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.DAILY,
+                                             min_age=datetime.timedelta(hours=1)), 0)
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.DAILY,
+                                             min_age=datetime.timedelta(0)), 1)
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(file_name=self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/data.pb')
+        self.assertTrue(proto_table_storage.is_indexed())
+        self.assertEqual(proto_table_storage.get_num_entries(), 7)
+        self.assertListEqual(sorted(key for val in partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1, 0, 2),
+            'end_time': datetime.datetime(2020, 1, 1, 1, 0),
+        }).values() for key in val), ['2020-01-01 00:02:00', '2020-01-01 00:30:00', '2020-01-01 01:00:00'])
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.DAILY,
+                                             min_age=datetime.timedelta(0)), 0)
+
+    def test_compact_range(self):
+        partitioner = MinutelyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        records = [[datetime.datetime(2020, 1, 1, hour, minute), minute] for hour in [0, 1] for minute in [0, 1]] + \
+                  [[datetime.datetime(2020, 1, 2, 0, 0), 0]]
+        partitioner.write_batch(records=records, timestamp_fn=lambda record: record[0])
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.HOURLY,
+                                             min_age=datetime.timedelta(hours=1)), 2)
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.DAILY,
+                                             min_age=datetime.timedelta(0)), 1)
+        partitioner.write_batch(records=[[datetime.datetime(2020, 1, 1, 0, 1), 2]],
+                                timestamp_fn=lambda record: record[0])
+
+        file_name = self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/data'
+        self.assertDictEqual(partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1, 0, 1),
+            'end_time': datetime.datetime(2020, 1, 1, 1, 0),
+        }), {file_name: ['2020-01-01 00:01:00,1', '2020-01-01 01:00:00,0', '2020-01-01 00:01:00,2']})
+        self.assertListEqual(list(partitioner.iter_range(start_time=datetime.datetime(2020, 1, 1, 1, 1),
+                                                         end_time=datetime.datetime(2020, 1, 1, 2, 0))),
+                             [(file_name, ['2020-01-01 01:01:00,1'])])
+        self.assertDictEqual(partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1, 0, 2),
+            'end_time': datetime.datetime(2020, 1, 1, 0, 59),
+        }), {file_name: []})
+
+    def test_compact_empty_dir(self):
+        partitioner = MinutelyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.write_batch(records=[[datetime.datetime(2020, 1, 1, 1, 0), 0]],
+                                timestamp_fn=lambda record: record[0])
+        # an hour left empty by the removal of its minutes is not a compacted partition.
+        FileUtil.create_dir_if_not_exist(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/')
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6, force=True)
+        self.assertIsNone(partitioner.seek_floor(timestamp=datetime.datetime(2020, 1, 1, 0, 30)))
+        self.assertEqual(partitioner.seek_ceiling(timestamp=datetime.datetime(2020, 1, 1, 0, 30)),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/01/00/')
+
+        partitioner.write_batch(records=[[datetime.datetime(2020, 1, 1, 0, 30), 1]],
+                                timestamp_fn=lambda record: record[0])
+        self.assertFalse(FileUtil.does_file_exist(file_name=self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/data'))
+        self.assertEqual(partitioner.seek_floor(timestamp=datetime.datetime(2020, 1, 1, 0, 30)),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/30/')
+
+    def test_compact_repeated_keys(self):
+        partitioner = MinutelyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.set_underlying_storage(storage=ProtoTableStorage())
+        records = [('test', NodeSnapshot(node_name=str(datetime.datetime(2020, 1, 1, 0, minute))))
+                   for minute in [0, 1]] + [('test', NodeSnapshot(node_name=str(datetime.datetime(2020, 1, 2, 0, 0))))]
+        partitioner.write_batch(records=records,
+                                timestamp_fn=lambda record: datetime.datetime.fromisoformat(record[1].node_name))
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.HOURLY,
+                                             min_age=datetime.timedelta(hours=1)), 0)
+        data = partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1, 0, 0),
+            'end_time': datetime.datetime(2020, 1, 1, 0, 1),
+        })
+        self.assertListEqual(list(data.keys()), [self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/00/data.pb',
+                                                 self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/01/data.pb'])
+        self.assertListEqual(sorted(os.listdir(self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/')), ['00', '01'])
+
+    def test_compact_recovery(self):
+        partitioner = MinutelyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        records = [[datetime.datetime(2020, 1, 1, 0, minute), minute] for minute in [0, 1]] + \
+                  [[datetime.datetime(2020, 1, 2, 0, 0), 2]]
+        partitioner.write_batch(records=records, timestamp_fn=lambda record: record[0])
+        # a compaction stopped after the merged file and the marker replaced the compacted ones, but before the
+        # partitions below were removed.
+        hour_dir_name = self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/'
+        with open(hour_dir_name + 'data', 'w') as outfile:
+            outfile.write('2020-01-01 00:00:00,0\n2020-01-01 00:01:00,1\n')
+        with open(hour_dir_name + PartitionerBase.PARTITION_COMPACTED_FILE_NAME, 'w') as outfile:
+            outfile.write(PartitionerBase.PARTITION_COMPACTED_HEADER + '\n2020/01/01/00/00\tdata\t1\n' +
+                          '2020/01/01/00/01\tdata\t1\n')
+        with open(hour_dir_name + PartitionerBase.PARTITION_COMPACTION_FILE_NAME, 'w') as outfile:
+            outfile.write('2020/01/01/00/00\n2020/01/01/00/01\n')
+
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.HOURLY,
+                                             min_age=datetime.timedelta(hours=1)), 0)
+        self.assertListEqual(sorted(os.listdir(hour_dir_name)), [PartitionerBase.PARTITION_COMPACTED_FILE_NAME,
+                                                                 'data'])
+        self.assertEqual(partitioner.seek_floor(timestamp=datetime.datetime(2020, 1, 1, 0, 30)), hour_dir_name)
+        self.assertDictEqual(partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1, 0, 1),
+            'end_time': datetime.datetime(2020, 1, 2, 0, 0),
+        }), {
+            hour_dir_name + 'data': ['2020-01-01 00:01:00,1'],
+            self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/02/00/00/data': ['2020-01-02 00:00:00,2'],
+        })
+
+    def test_seek(self):
+        partitioner = MinutelyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_6)
+        partitioner.set_underlying_storage(storage=ProtoTableStorage())
+        self.assertIsNone(partitioner.seek_floor(timestamp=datetime.datetime(2020, 1, 1)))
+        timestamps = [datetime.datetime(2020, 1, 1, 0, 0), datetime.datetime(2020, 1, 1, 0, 30),
+                      datetime.datetime(2020, 1, 3, 5, 0)]
+        records = [(str(timestamp), NodeSnapshot(node_name=str(timestamp))) for timestamp in timestamps]
+        partitioner.write_batch(records=records, timestamp_fn=lambda record: datetime.datetime.fromisoformat(record[0]))
+
+        timestamp = datetime.datetime(2020, 1, 2, 12, 0, 30)
+        self.assertEqual(partitioner.seek_floor(timestamp=timestamp),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/30/')
+        self.assertEqual(partitioner.seek_ceiling(timestamp=timestamp),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/03/05/00/')
+        self.assertEqual(partitioner.seek_floor(timestamp=datetime.datetime(2020, 1, 1, 0, 30, 10)),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/30/')
+        self.assertIsNone(partitioner.seek_floor(timestamp=datetime.datetime(2019, 12, 31)))
+        self.assertIsNone(partitioner.seek_ceiling(timestamp=datetime.datetime(2020, 1, 3, 5, 1)))
+
+        self.assertEqual(partitioner.compact(partitioner_type=PartitionerStorageType.HOURLY,
+                                             min_age=datetime.timedelta(hours=1)), 1)
+        self.assertEqual(partitioner.seek_floor(timestamp=timestamp),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/')
+        self.assertEqual(partitioner.seek_ceiling(timestamp=datetime.datetime(2019, 12, 31)),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/')
+        self.assertEqual(partitioner.seek_ceiling(timestamp=datetime.datetime(2020, 1, 1, 0, 45)),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/01/00/')
+        self.assertEqual(partitioner.seek_ceiling(timestamp=datetime.datetime(2020, 1, 1, 1, 0)),
+                         self.YEARLY_PATITIONER_TEST_DATA_6 + '2020/01/03/05/00/')
+
     def test_incremental_build(self):
         partitioner = MonthlyPartitionerStorage(max_capacity=4)
         partitioner.initialize_from_dir(dir_name=self.MONTHLY_PATITIONER_TEST_DATA)
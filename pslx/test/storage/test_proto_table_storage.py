@@ -1,8 +1,13 @@
+import asyncio
+import os
 from shutil import copyfile
+import threading
 import unittest
 
+from pslx.core.exception import StorageWriteException
 from pslx.schema.snapshots_pb2 import NodeSnapshot, OperatorSnapshot
 from pslx.storage.proto_table_storage import ProtoTableStorage
+from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 
 
@@ -45,6 +50,12 @@ class ProtoTableStorageTest(unittest.TestCase):
     TEST_DATA_2 = "pslx/test/storage/test_data/test_proto_table_data_2.pb"
     TEST_DATA_3 = "pslx/test/storage/test_data/test_proto_table_data_3.pb"
     TEST_DATA_4 = "pslx/test/storage/test_data/test_proto_table_data_4.pb"
+    TEST_DATA_5 = "pslx/test/storage/test_data/test_proto_table_data_5.pb"
+
+    def setUp(self):
+        # the tables written by the tests are removed after each test, even if it fails.
+        self.addCleanup(FileUtil.remove_file, self.TEST_DATA_5)
+        self.addCleanup(FileUtil.remove_file, FileUtil.get_sidecar_file_name(file_name=self.TEST_DATA_5, suffix='idx'))
 
     def test_read_1(self):
         proto_table_storage = ProtoTableStorage()
@@ -174,3 +185,340 @@ class ProtoTableStorageTest(unittest.TestCase):
         self.assertEqual(proto_table_storage.get_num_entries(), 2)
         copyfile(self.TEST_DATA_2, self.TEST_DATA_4)
 
+    def test_append_only_1(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.set_config(
+            config={
+                'append_only': True,
+            }
+        )
+        proto_table_storage.write(
+            data={'test': self.EXAMPLE_PROTO_1, 'test_1': self.EXAMPLE_PROTO_2}
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_3}
+        )
+        proto_table_storage.delete(key='test')
+        self.assertTrue(proto_table_storage.is_log_format())
+
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertTrue(proto_table_storage.is_log_format())
+        self.assertDictEqual(proto_table_storage.read_all(), {
+            'test_1': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_3),
+        })
+
+    def test_append_only_2(self):
+        copyfile(self.TEST_DATA_3, self.TEST_DATA_5)
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.set_config(
+            config={
+                'append_only': True,
+            }
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_2}
+        )
+        for _ in range(3):
+            proto_table_storage.write(
+                data={'test_1': self.EXAMPLE_PROTO_3}
+            )
+        proto_table_storage.compact()
+
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertDictEqual(proto_table_storage.read_all(), {
+            'test': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_1),
+            'test_1': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_3),
+        })
+
+    def test_indexed_1(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.set_config(
+            config={
+                'indexed': True,
+            }
+        )
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.write(
+            data={'test': self.EXAMPLE_PROTO_1, 'test_1': self.EXAMPLE_PROTO_2}
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_3}
+        )
+        self.assertTrue(proto_table_storage.is_indexed())
+
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertTrue(proto_table_storage.is_indexed())
+        self.assertEqual(proto_table_storage.get_num_entries(), 2)
+        result_proto = proto_table_storage.read(
+            params={
+                'key': 'test_1',
+                'message_type': OperatorSnapshot
+            }
+        )
+        self.assertEqual(result_proto, self.EXAMPLE_PROTO_3)
+        proto_table_storage.delete(key='test')
+        self.assertDictEqual(proto_table_storage.read_all(), {
+            'test_1': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_3),
+        })
+
+    def test_indexed_2(self):
+        copyfile(self.TEST_DATA_3, self.TEST_DATA_5)
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.set_config(
+            config={
+                'append_only': True,
+            }
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_2}
+        )
+
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.set_config(
+            config={
+                'indexed': True,
+            }
+        )
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertTrue(proto_table_storage.is_indexed())
+        proto_table_storage.compact()
+        self.assertDictEqual(proto_table_storage.read_all(), {
+            'test': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_1),
+            'test_1': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_2),
+        })
+
+    def test_parse_cache(self):
+        copyfile(self.TEST_DATA_3, self.TEST_DATA_5)
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        stats = ProtoTableStorage.get_parse_cache_stats()
+        proto_table_storage_2 = ProtoTableStorage()
+        proto_table_storage_2.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertEqual(ProtoTableStorage.get_parse_cache_stats()['hit'], stats['hit'] + 1)
+
+        proto_table_storage_2.write(
+            data={'test_1': self.EXAMPLE_PROTO_2}
+        )
+        self.assertEqual(proto_table_storage.get_num_entries(), 1)
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertEqual(ProtoTableStorage.get_parse_cache_stats()['miss'], stats['miss'] + 1)
+        self.assertEqual(proto_table_storage.get_num_entries(), 2)
+
+    def test_sorted_keys(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.write(
+            data={'test_2': self.EXAMPLE_PROTO_1, 'test_1': self.EXAMPLE_PROTO_2, 'test_3': self.EXAMPLE_PROTO_3}
+        )
+        self.assertEqual(proto_table_storage.first_key(), 'test_1')
+        self.assertEqual(proto_table_storage.last_key(), 'test_3')
+        self.assertListEqual(list(proto_table_storage.iter_keys(reverse=True)), ['test_3', 'test_2', 'test_1'])
+        proto_table_storage.delete(key='test_3')
+
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertEqual(proto_table_storage.last_key(), 'test_2')
+        result = proto_table_storage.read_key_range(start_key='test_0', end_key='test_1',
+                                                    message_type=OperatorSnapshot)
+        self.assertDictEqual(result, {'test_1': self.EXAMPLE_PROTO_2})
+
+    def test_iter_items(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.write(
+            data={'test_2': self.EXAMPLE_PROTO_2, 'test_1': self.EXAMPLE_PROTO_2, 'test_3': self.EXAMPLE_PROTO_3}
+        )
+        result = list(proto_table_storage.iter_items(message_type=OperatorSnapshot, batch_size=2))
+        self.assertListEqual(result, [
+            ('test_1', self.EXAMPLE_PROTO_2),
+            ('test_2', self.EXAMPLE_PROTO_2),
+            ('test_3', self.EXAMPLE_PROTO_3),
+        ])
+        result = list(proto_table_storage.iter_items(batch_size=1, start_key='test_2'))
+        self.assertListEqual(result, [
+            ('test_2', ProtoUtil.message_to_any(self.EXAMPLE_PROTO_2)),
+            ('test_3', ProtoUtil.message_to_any(self.EXAMPLE_PROTO_3)),
+        ])
+
+    def test_group_commit(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.set_config(
+            config={
+                'group_commit': True,
+                'group_commit_max_pending': 4,
+            }
+        )
+        errors = []
+
+        def _write(key, val):
+            try:
+                proto_table_storage.write(data={key: val})
+            except StorageWriteException:
+                errors.append(key)
+
+        threads = [threading.Thread(target=_write, args=('test_' + str(i), self.EXAMPLE_PROTO_1)) for i in range(3)]
+        threads.append(threading.Thread(target=_write, args=('test_bad', 'not a proto message')))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertListEqual(errors, ['test_bad'])
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertListEqual(list(proto_table_storage.iter_keys()), ['test_0', 'test_1', 'test_2'])
+
+    def test_write_many(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        proto_table_storage.set_config(
+            config={
+                'group_commit': True,
+            }
+        )
+        proto_table_storage.write_many(data_list=[{'test': self.EXAMPLE_PROTO_1}, {'test': self.EXAMPLE_PROTO_2}])
+        proto_table_storage.write_many(data_list=[{'test': self.EXAMPLE_PROTO_3, 'test_1': self.EXAMPLE_PROTO_1},
+                                                  {'test_1': self.EXAMPLE_PROTO_2}],
+                                       params={'overwrite': False})
+        with self.assertRaises(StorageWriteException):
+            proto_table_storage.write_many(data_list=[{'test_2': self.EXAMPLE_PROTO_1},
+                                                      {'test_3': 'not a proto message'}])
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        self.assertListEqual(list(proto_table_storage.iter_keys()), ['test', 'test_1'])
+        self.assertEqual(proto_table_storage.read(params={'key': 'test', 'message_type': OperatorSnapshot}),
+                         self.EXAMPLE_PROTO_2)
+        self.assertEqual(proto_table_storage.read(params={'key': 'test_1', 'message_type': NodeSnapshot}),
+                         self.EXAMPLE_PROTO_1)
+
+    def test_write_rollback(self):
+        for config in [{}, {'indexed': True}]:
+            FileUtil.remove_file(self.TEST_DATA_5)
+            proto_table_storage = ProtoTableStorage()
+            proto_table_storage.set_config(config=config)
+            proto_table_storage.initialize_from_file(
+                file_name=self.TEST_DATA_5
+            )
+            proto_table_storage.write(data={'test': self.EXAMPLE_PROTO_1})
+            # the file can no longer be written once it is replaced by a directory.
+            FileUtil.remove_file(self.TEST_DATA_5)
+            os.mkdir(self.TEST_DATA_5)
+            with self.assertRaises(StorageWriteException):
+                proto_table_storage.write(data={'test': self.EXAMPLE_PROTO_2, 'test_1': self.EXAMPLE_PROTO_3})
+            os.rmdir(self.TEST_DATA_5)
+
+            self.assertListEqual(list(proto_table_storage.iter_keys()), ['test'])
+            self.assertEqual(proto_table_storage.get_num_entries(), 1)
+            if not config:
+                self.assertEqual(proto_table_storage.read(params={'key': 'test', 'message_type': NodeSnapshot}),
+                                 self.EXAMPLE_PROTO_1)
+
+    def test_write_any(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+        # the Any values, e.g. the ones read from another proto table, are stored as they are.
+        any_message = ProtoUtil.message_to_any(message=self.EXAMPLE_PROTO_1)
+        proto_table_storage.write(data={'test': any_message, 'test_1': self.EXAMPLE_PROTO_2})
+        proto_table_storage.write(data=proto_table_storage.read_all())
+        self.assertEqual(proto_table_storage.read(params={'key': 'test'}), any_message)
+        self.assertEqual(proto_table_storage.read(params={'key': 'test', 'message_type': NodeSnapshot}),
+                         self.EXAMPLE_PROTO_1)
+        self.assertEqual(proto_table_storage.read(params={'key': 'test_1', 'message_type': OperatorSnapshot}),
+                         self.EXAMPLE_PROTO_2)
+
+    def test_codec(self):
+        for codec in ['zlib', 'bz2', 'lzma']:
+            FileUtil.remove_file(self.TEST_DATA_5)
+            proto_table_storage = ProtoTableStorage()
+            proto_table_storage.set_config(
+                config={
+                    'codec': codec,
+                }
+            )
+            proto_table_storage.initialize_from_file(
+                file_name=self.TEST_DATA_5
+            )
+            proto_table_storage.write(data={'test': self.EXAMPLE_PROTO_1})
+            with open(self.TEST_DATA_5, 'rb') as infile:
+                self.assertTrue(infile.read().startswith(FileUtil.PROTO_CODEC_HEADER + codec.encode()))
+
+            proto_table_storage = ProtoTableStorage()
+            proto_table_storage.initialize_from_file(
+                file_name=self.TEST_DATA_5
+            )
+            self.assertEqual(proto_table_storage.read(params={'key': 'test', 'message_type': NodeSnapshot}),
+                             self.EXAMPLE_PROTO_1)
+
+    def test_codec_invalid(self):
+        proto_table_storage = ProtoTableStorage()
+        with self.assertRaisesRegex(StorageWriteException, r'bz2, lzma, zlib'):
+            proto_table_storage.set_config(
+                config={
+                    'codec': 'gzip',
+                }
+            )
+        proto_table_storage.set_config(
+            config={
+                'codec': None,
+            }
+        )
+
+    def test_async(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_5
+        )
+
+        async def _run():
+            await asyncio.gather(*[proto_table_storage.awrite(data={'test_' + str(i): self.EXAMPLE_PROTO_1})
+                                   for i in range(4)])
+            await proto_table_storage.adelete(key='test_0')
+            return await proto_table_storage.aread(params={'key': 'test_1', 'message_type': NodeSnapshot})
+
+        self.assertEqual(asyncio.run(_run()), self.EXAMPLE_PROTO_1)
+        self.assertListEqual(list(proto_table_storage.iter_keys()), ['test_1', 'test_2', 'test_3'])
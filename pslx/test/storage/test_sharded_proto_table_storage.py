@@ -0,0 +1,52 @@
+from shutil import rmtree
+import unittest
+from pslx.schema.snapshots_pb2 import NodeSnapshot
+from pslx.storage.sharded_proto_table_storage import ShardedProtoTableStorage
+from pslx.util.file_util import FileUtil
+from pslx.util.proto_util import ProtoUtil
+
+
+class ShardedProtoTableStorageTest(unittest.TestCase):
+    TEST_DATA_DIR = "pslx/test/storage/test_data/sharded_proto_table_1/"
+
+    def tearDown(self):
+        if FileUtil.does_dir_exist(dir_name=self.TEST_DATA_DIR):
+            rmtree(self.TEST_DATA_DIR)
+
+    def test_write_and_read(self):
+        storage = ShardedProtoTableStorage(num_shard=4)
+        storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR)
+        data = {'test_' + str(i): NodeSnapshot(node_name='node_' + str(i)) for i in range(20)}
+        storage.write(data=data)
+        self.assertEqual(len(FileUtil.list_files_in_dir(dir_name=self.TEST_DATA_DIR)), 4)
+
+        storage = ShardedProtoTableStorage(num_shard=8)
+        storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR)
+        self.assertEqual(storage.get_num_shards(), 4)
+        self.assertEqual(storage.read(params={'key': 'test_3', 'message_type': NodeSnapshot}), data['test_3'])
+        self.assertIsNone(storage.read(params={'key': 'test_100'}))
+        self.assertDictEqual(storage.read_all(), {key: ProtoUtil.message_to_any(val) for key, val in data.items()})
+        self.assertListEqual([key for key, _ in storage.iter_items()], sorted(data.keys()))
+        storage.delete(key='test_3')
+        self.assertEqual(storage.get_num_entries(), 19)
+        storage.delete_all()
+        self.assertEqual(storage.get_num_entries(), 0)
+
+    def test_reload_changed_shards(self):
+        storage = ShardedProtoTableStorage(num_shard=4)
+        storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR)
+        self.assertIsNone(storage.read(params={'key': 'test_0'}))
+        self.assertEqual(storage.get_num_entries(), 0)
+
+        other_storage = ShardedProtoTableStorage(num_shard=4)
+        other_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR)
+        data = {'test_' + str(i): NodeSnapshot(node_name='node_' + str(i)) for i in range(8)}
+        other_storage.write(data=data)
+        self.assertEqual(storage.read(params={'key': 'test_0', 'message_type': NodeSnapshot}), data['test_0'])
+        self.assertEqual(storage.get_num_entries(), 8)
+
+        storage.write(data={'test_0': NodeSnapshot(node_name='node_8')})
+        other_storage.delete(key='test_1')
+        self.assertEqual(storage.get_num_entries(), 7)
+        self.assertEqual(other_storage.read(params={'key': 'test_0', 'message_type': NodeSnapshot}).node_name,
+                         'node_8')
@@ -0,0 +1,102 @@
+import threading
+import unittest
+from pslx.core.exception import RWLockToolException
+from pslx.tool.rw_lock_tool import RWLockTool
+
+
+class RWLockToolTest(unittest.TestCase):
+
+    def test_read_lock(self):
+        rw_lock_tool = RWLockTool()
+        with rw_lock_tool.read_lock():
+            with rw_lock_tool.read_lock():
+                self.assertEqual(rw_lock_tool.get_num_readers(), 1)
+            self.assertRaises(RWLockToolException, rw_lock_tool.acquire_write)
+        self.assertEqual(rw_lock_tool.get_num_readers(), 0)
+
+    def test_write_lock(self):
+        rw_lock_tool = RWLockTool()
+        with rw_lock_tool.write_lock():
+            with rw_lock_tool.write_lock():
+                with rw_lock_tool.read_lock():
+                    self.assertTrue(rw_lock_tool.is_write_locked())
+            self.assertTrue(rw_lock_tool.is_write_locked())
+        self.assertFalse(rw_lock_tool.is_write_locked())
+
+    def test_timeout(self):
+        rw_lock_tool = RWLockTool(timeout=0.01)
+        is_reader_blocked = []
+
+        def _read():
+            try:
+                rw_lock_tool.acquire_read()
+                rw_lock_tool.release_read()
+                is_reader_blocked.append(False)
+            except RWLockToolException:
+                is_reader_blocked.append(True)
+
+        with rw_lock_tool.write_lock():
+            thread = threading.Thread(target=_read)
+            thread.start()
+            thread.join()
+        self.assertListEqual(is_reader_blocked, [True])
+
+    def test_write_lock_released_before_read_lock(self):
+        rw_lock_tool = RWLockTool(timeout=0.01)
+        rw_lock_tool.acquire_write()
+        rw_lock_tool.acquire_read()
+        rw_lock_tool.release_write()
+        self.assertEqual(rw_lock_tool.get_num_readers(), 1)
+
+        is_writer_blocked = []
+
+        def _write():
+            try:
+                rw_lock_tool.acquire_write()
+                rw_lock_tool.release_write()
+                is_writer_blocked.append(False)
+            except RWLockToolException:
+                is_writer_blocked.append(True)
+
+        thread = threading.Thread(target=_write)
+        thread.start()
+        thread.join()
+        self.assertListEqual(is_writer_blocked, [True])
+        rw_lock_tool.release_read()
+        self.assertEqual(rw_lock_tool.get_num_readers(), 0)
+
+    def test_writer_preference(self):
+        waiting_events = {
+            'writer': threading.Event(),
+            'reader': threading.Event(),
+        }
+
+        class _RWLockTool(RWLockTool):
+            def _wait_for(self, predicate, timeout):
+                # the event is set with the condition held, so it is only seen once the thread starts waiting.
+                if threading.current_thread().name in waiting_events:
+                    waiting_events[threading.current_thread().name].set()
+                return super()._wait_for(predicate=predicate, timeout=timeout)
+
+        rw_lock_tool = _RWLockTool()
+        order = []
+        rw_lock_tool.acquire_read()
+
+        def _write():
+            with rw_lock_tool.write_lock():
+                order.append('writer')
+
+        def _read():
+            with rw_lock_tool.read_lock():
+                order.append('reader')
+
+        writer = threading.Thread(target=_write, name='writer')
+        writer.start()
+        waiting_events['writer'].wait()
+        reader = threading.Thread(target=_read, name='reader')
+        reader.start()
+        waiting_events['reader'].wait()
+        rw_lock_tool.release_read()
+        writer.join()
+        reader.join()
+        self.assertListEqual(order, ['writer', 'reader'])
@@ -24,14 +24,15 @@ class LocalPartitionerFetcher(Base):
             )
         )
         try:
-            all_data = proto_table.read_all()
-            if all_data:
+            max_key = proto_table.last_key()
+            if max_key is not None:
                 self._logger.info("Successfully get the latest data in partition dir [" +
                                   self._partitioner.get_dir_name() + '].')
-                max_key = max(all_data.keys())
-                return ProtoUtil.any_to_message(
-                    message_type=self.MESSAGE_TYPE,
-                    any_message=all_data[max_key]
+                return proto_table.read(
+                    params={
+                        'key': max_key,
+                        'message_type': self.MESSAGE_TYPE,
+                    }
                 )
             else:
                 return None
@@ -50,14 +51,15 @@ class LocalPartitionerFetcher(Base):
             )
         )
         try:
-            all_data = proto_table.read_all()
-            if all_data:
+            min_key = proto_table.first_key()
+            if min_key is not None:
                 self._logger.info("Successfully get the oldest data in partition dir [" +
                                   self._partitioner.get_dir_name() + '].')
-                min_key = min(all_data.keys())
-                return ProtoUtil.any_to_message(
-                    message_type=self.MESSAGE_TYPE,
-                    any_message=all_data[min_key]
+                return proto_table.read(
+                    params={
+                        'key': min_key,
+                        'message_type': self.MESSAGE_TYPE,
+                    }
                 )
             else:
                 return None
@@ -68,29 +70,24 @@ class LocalPartitionerFetcher(Base):
 
     def fetch_range(self, start_time, end_time):
         try:
-            data = self._partitioner.read_range(
+            data_content = {}
+            # the partitions are consumed one at a time, so only the current partition is kept as Any messages.
+            for _, val in self._partitioner.iter_range(
+                start_time=start_time,
+                end_time=end_time,
                 params={
-                    'start_time': start_time,
-                    'end_time': end_time,
+                    'start_key': str(start_time.replace(tzinfo=None)),
+                    'end_key': str(end_time.replace(tzinfo=None)),
                 }
-            )
-            start_time, end_time = str(start_time.replace(tzinfo=None)), str(end_time.replace(tzinfo=None))
-            data_content = {}
-            for val in data.values():
-                data_content.update(val)
-            result = {}
-            self._logger.info("Successfully get the range data in partition dir [" +
-                              self._partitioner.get_dir_name() + '].')
-            for key in sorted(data_content.keys()):
-                if key < start_time or key > end_time:
-                    continue
-                else:
-                    item = ProtoUtil.any_to_message(
+            ):
+                for key, any_message in val.items():
+                    data_content[key] = ProtoUtil.any_to_message(
                         message_type=self.MESSAGE_TYPE,
-                        any_message=data_content[key]
+                        any_message=any_message
                     )
-                    result[key] = item
-            return result
+            self._logger.info("Successfully get the range data in partition dir [" +
+                              self._partitioner.get_dir_name() + '].')
+            return {key: data_content[key] for key in sorted(data_content.keys())}
         except Exception as err:
             self._logger.error("Fetch range for partition [" + self._partitioner.get_dir_name() +
                                "] with error " + str(err) + '.')
@@ -160,6 +157,8 @@ class RemotePartitionerFetcher(Base):
                 'PartitionerStorageType': self.PARTITIONER_STORAGE_TYPE,
                 'start_time': start_time,
                 'end_time': end_time,
+                'start_key': str(start_time.replace(tzinfo=None)),
+                'end_key': str(end_time.replace(tzinfo=None)),
                 'is_proto_table': True,
             },
             root_certificate=self._root_certificate
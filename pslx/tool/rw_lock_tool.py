@@ -0,0 +1,122 @@
+import contextlib
+import threading
+import time
+
+from pslx.core.base import Base
+from pslx.core.exception import RWLockToolException
+
+
+class RWLockTool(Base):
+    # Writers are preferred: once a writer is waiting, new readers wait until it is done so that writers are not
+    # starved by a steady stream of readers. Both locks are reentrant for the thread that holds them, and the writer
+    # may also take the read lock. Such a read lock is not counted as a reader until the write lock is released.
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        self._timeout = timeout
+        self._condition = threading.Condition(threading.Lock())
+        self._num_readers = 0
+        self._num_waiting_writers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._local = threading.local()
+
+    def _get_read_depth(self):
+        return getattr(self._local, 'read_depth', 0)
+
+    def _is_counted_reader(self):
+        return getattr(self._local, 'is_counted_reader', False)
+
+    def _wait_for(self, predicate, timeout):
+        if timeout is None:
+            timeout = self._timeout
+        if timeout is None:
+            while not predicate():
+                self._condition.wait()
+            return True
+        end_time = time.monotonic() + timeout
+        while not predicate():
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._condition.wait(remaining)
+        return True
+
+    def acquire_read(self, timeout=None):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me and self._get_read_depth() == 0:
+                if not self._wait_for(
+                        predicate=lambda: self._writer is None and self._num_waiting_writers == 0,
+                        timeout=timeout
+                ):
+                    raise RWLockToolException("Timeout when acquiring the read lock.")
+                self._num_readers += 1
+                self._local.is_counted_reader = True
+            self._local.read_depth = self._get_read_depth() + 1
+
+    def release_read(self):
+        with self._condition:
+            read_depth = self._get_read_depth()
+            assert read_depth > 0
+            self._local.read_depth = read_depth - 1
+            if read_depth == 1 and self._is_counted_reader():
+                self._local.is_counted_reader = False
+                self._num_readers -= 1
+                if self._num_readers == 0:
+                    self._condition.notify_all()
+
+    def acquire_write(self, timeout=None):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if self._get_read_depth() > 0:
+                raise RWLockToolException("Cannot upgrade the read lock to the write lock.")
+            self._num_waiting_writers += 1
+            is_acquired = self._wait_for(
+                predicate=lambda: self._writer is None and self._num_readers == 0,
+                timeout=timeout
+            )
+            self._num_waiting_writers -= 1
+            if not is_acquired:
+                # wake up the readers that were blocked by this writer.
+                self._condition.notify_all()
+                raise RWLockToolException("Timeout when acquiring the write lock.")
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._condition:
+            assert self._writer == threading.get_ident()
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                if self._get_read_depth() > 0 and not self._is_counted_reader():
+                    # the read lock taken inside the write lock is still held, so it becomes a reader now.
+                    self._num_readers += 1
+                    self._local.is_counted_reader = True
+                self._condition.notify_all()
+
+    def is_write_locked(self):
+        return self._writer is not None
+
+    def get_num_readers(self):
+        return self._num_readers
+
+    @contextlib.contextmanager
+    def read_lock(self, timeout=None):
+        self.acquire_read(timeout=timeout)
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write_lock(self, timeout=None):
+        self.acquire_write(timeout=timeout)
+        try:
+            yield self
+        finally:
+            self.release_write()
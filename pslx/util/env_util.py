@@ -14,6 +14,7 @@ class EnvUtil(object):
         'PSLX_GRPC_TIMEOUT': 1,  # 1 second
         'PSLX_FRONTEND_CONFIG_PROTO_PATH': '',
         "PSLX_RPC_FLUSH_RATE": 1,
+        'PSLX_STORAGE_IO_WORKERS': 8,
     }
 
     @classmethod
@@ -1,7 +1,10 @@
+import bz2
 import datetime
 import glob
+import lzma
 import os
 import shutil
+import zlib
 from pslx.core.exception import FileNotExistException, DirNotExistException
 from pslx.schema.enums_pb2 import ModeType
 from pslx.util.env_util import EnvUtil
@@ -9,6 +12,13 @@ from pslx.util.proto_util import ProtoUtil
 
 
 class FileUtil(object):
+    PROTO_CODEC_HEADER = b'PSLX_PROTO_CODEC\n'
+    PROTO_CODECS = {
+        'zlib': zlib,
+        'bz2': bz2,
+        'lzma': lzma,
+    }
+
     @classmethod
     def base_name(cls, file_name):
         return os.path.basename(file_name)
@@ -35,6 +45,14 @@ class FileUtil(object):
         cls.die_if_dir_not_exist(dir_name=dir_name)
         return len(os.listdir(dir_name)) == 0
 
+    @classmethod
+    def get_sidecar_file_name(cls, file_name, suffix):
+        # Sidecar files are hidden so that they are not listed together with the data files in the same directory.
+        return cls.join_paths_to_file(
+            root_dir=cls.dir_name(file_name=file_name),
+            base_name='.' + cls.base_name(file_name=file_name) + '.' + suffix
+        )
+
     @classmethod
     def create_file_if_not_exist(cls, file_name):
         file_name = cls.normalize_file_name(file_name=file_name)
@@ -209,16 +227,31 @@ class FileUtil(object):
             return ModeType.PROD
 
     @classmethod
-    def write_proto_to_file(cls, proto, file_name):
+    def encode_proto_content(cls, content, codec=None):
+        if not codec:
+            return content
+        assert codec in cls.PROTO_CODECS
+        return cls.PROTO_CODEC_HEADER + codec.encode() + b'\n' + cls.PROTO_CODECS[codec].compress(content)
+
+    @classmethod
+    def decode_proto_content(cls, content):
+        # files without the codec header are the raw serialized protos.
+        if not content.startswith(cls.PROTO_CODEC_HEADER):
+            return content
+        codec, content = content[len(cls.PROTO_CODEC_HEADER):].split(b'\n', 1)
+        return cls.PROTO_CODECS[codec.decode()].decompress(content)
+
+    @classmethod
+    def write_proto_to_file(cls, proto, file_name, codec=None):
         with open(FileUtil.create_file_if_not_exist(file_name=file_name), 'wb') as outfile:
-            outfile.write(proto.SerializeToString())
+            outfile.write(cls.encode_proto_content(content=proto.SerializeToString(), codec=codec))
 
     @classmethod
     def read_proto_from_file(cls, proto_type, file_name):
         proto = proto_type()
         try:
             with open(FileUtil.die_if_file_not_exist(file_name=file_name), 'rb') as infile:
-                proto.ParseFromString(infile.read())
+                proto.ParseFromString(cls.decode_proto_content(content=infile.read()))
         except FileNotExistException as _:
             pass
         return proto